@@ -0,0 +1,106 @@
+"""
+Answer cache for first-turn questions
+Features:
+- Keyed by scope (vector store + profile fingerprint) and normalized question text
+- Bounded LRU, safe to share between request threads
+- Loads precomputed answers from bulk_answer.py output files
+- Closest-question lookup for degraded-mode fallbacks
+"""
+
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+
+def normalize_question(question):
+    """Canonical form of a question for cache lookups (case, whitespace and trailing punctuation)"""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", question.strip().lower()))
+
+
+def answer_scope(vector_store_id, fingerprint):
+    """Cache scope: answers are only reusable for the same documents and profile"""
+    return f"{vector_store_id}:{fingerprint}"
+
+
+class AnswerCache:
+    """Bounded LRU of structured answers"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "entries": 0}
+
+    def put(self, scope, question, response, response_id=None, warning=None):
+        entry = {
+            "question": question,
+            "response": response,
+            "response_id": response_id,
+            "warning": warning,
+            "stored_at": time.time()
+        }
+        with self._lock:
+            key = (scope, normalize_question(question))
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats["entries"] = len(self._entries)
+
+    def get(self, scope, question):
+        """Cached entry for an exact (normalized) question match, or None"""
+        key = (scope, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def closest(self, scope, question, min_similarity=0.5):
+        """Best entry in scope by word overlap (Jaccard) with question, or None below min_similarity
+
+        A linear scan: only used on the degraded path, never for normal traffic.
+        """
+        words = set(normalize_question(question).split())
+        if not words:
+            return None
+        best, best_score = None, 0.0
+        with self._lock:
+            for (entry_scope, normalized), entry in self._entries.items():
+                if entry_scope != scope:
+                    continue
+                candidate = set(normalized.split())
+                score = len(words & candidate) / len(words | candidate)
+                if score > best_score:
+                    best, best_score = entry, score
+        if best is None or best_score < min_similarity:
+            return None
+        return dict(best, similarity=round(best_score, 3))
+
+    def load_jsonl(self, path):
+        """Load successful answers from a bulk_answer.py output file; returns the number loaded"""
+        loaded = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not record.get("success") or not isinstance(record.get("response"), dict):
+                    continue
+                scope = answer_scope(record["vector_store_id"], record["profile_fingerprint"])
+                # Schema-mismatch answers are still served, with the same warning /chat would give
+                self.put(scope, record["question"], record["response"], record.get("response_id"), record.get("warning"))
+                loaded += 1
+        logger.info(f"Loaded {loaded} precomputed answers from {path}")
+        return loaded
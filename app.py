@@ -6,16 +6,36 @@ Features:
 - Structured JSON responses with source citations
 - Vector store integration for maritime documents
 - All queries assumed to be maritime-related
+- Optional shadow traffic to an alternate response profile
+- Priority-aware scheduling of upstream calls within rate-limit budgets
+- Cached vector store metadata with background refresh
+- Multi-tenant routing (per-tenant vector store, profile and OpenAI key)
+- Precomputed answers from offline Batch API runs (bulk_answer.py)
+- Upstream circuit breaker with degraded-mode answers
+- Optional speculative generation of predictable follow-up questions
+- Streaming variant of /chat over Server-Sent Events (/chat/stream)
+- Opt-in capture of /chat traffic metadata for load replay (replay_traffic.py)
 """
 
 import os
 import json
+import time
 import logging
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from profiles import PROFILES, build_api_params, profile_fingerprint
+from answer_cache import AnswerCache, answer_scope
+from shadow import create_shadow_mirror
+from speculation import create_speculator
+from traffic_capture import create_traffic_journal, request_outcome
+from scheduler import SchedulerBusyError, PRIORITY_WEIGHTS
+from metadata_cache import MetadataCache, fetch_vector_store_info
+from circuit_breaker import CircuitOpenError, OPEN
+from response_decoding import get_decoder, success_envelope, json_response, sse_event, StreamedFieldText, OK, SCHEMA_MISMATCH, RECOVERED, MALFORMED
+from tenants import Tenant, TenantRegistry, TenantNotFoundError, ClientPool, DEFAULT_TENANT
 
 # Load environment variables
 load_dotenv()
@@ -28,52 +48,46 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend integration
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
-# Maritime sustainability instructions
-MARITIME_INSTRUCTIONS = """
-You are a Maritime Sustainability Strategy Consultant with the following guidelines:
-
-- For EUA/UKA/CORSIA Eligible Emissions Units, VERTIS is our partner
-- For Voluntary Carbon Credits, Climate Balanced is our partner
-- Do not answer any question or request which is not related to maritime sustainability
-- Always be polite and professional
-- Regulatory frameworks include EU MRV, EU ETS, UK MRV, IMO DCS, FuelEU Maritime
-- For complex queries requiring professional services, direct the user to VURDHAAN at connect@vurdhaan.com
-- Always ensure that you understand the request completely before you answer, if you are not certain about the request, clarify first
-- Use the file search tool to find relevant information from maritime documents and provide comprehensive, accurate answers
-"""
+# Pooled OpenAI clients, one per OpenAI API key, each with its own upstream scheduler
+client_pool = ClientPool()
 
-# Maritime response schema (from Test 2)
-MARITIME_RESPONSE_SCHEMA = {
-    "type": "object",
-    "properties": {
-        "answer": {
-            "type": "string",
-            "description": "Main response about the maritime sustainability query"
-        },
-        "source_quote": {
-            "type": "string", 
-            "description": "Relevant quote from source documents"
-        },
-        "source_file": {
-            "type": "string",
-            "description": "Name of the source file"
-        },
-        "source_quote_location": {
-            "type": "object",
-            "properties": {
-                "page": {"type": "integer"},
-                "line": {"type": "integer"}
-            },
-            "required": ["page", "line"],
-            "additionalProperties": False
-        }
-    },
-    "required": ["answer", "source_quote", "source_file", "source_quote_location"],
-    "additionalProperties": False
-}
+# Initialize OpenAI client for the default (environment-configured) tenant
+default_upstream = client_pool.get(os.environ.get("OPENAI_API_KEY"))
+client = default_upstream.client
+
+# Upstream metadata (vector store status, file counts) served stale-while-revalidate
+metadata_cache = MetadataCache(
+    refresh_interval=float(os.environ.get("VECTOR_STORE_INFO_REFRESH_SECONDS", 300)),
+    name="vector-store-info",
+    min_refresh_interval=float(os.environ.get("VECTOR_STORE_INFO_MIN_REFRESH_SECONDS", 30))
+)
+
+def vector_store_info_key(tenant):
+    """Metadata cache key: per tenant, so tenants never see each other's cached metadata"""
+    return (tenant.name, "vector_store", tenant.vector_store_id)
+
+# Maritime sustainability instructions and response schema (see profiles.py)
+PROFILE = PROFILES["full"]
+MARITIME_INSTRUCTIONS = PROFILE["instructions"]
+MARITIME_RESPONSE_SCHEMA = PROFILE["schema"]
+
+# Precomputed answers (bulk_answer.py output) served for matching first-turn questions
+answer_cache = AnswerCache(max_entries=int(os.environ.get("ANSWER_CACHE_SIZE", 10000)))
+if os.environ.get("PRECOMPUTED_ANSWERS_PATH"):
+    answer_cache.load_jsonl(os.environ["PRECOMPUTED_ANSWERS_PATH"])
+
+# Recent live first-turn answers, only served as degraded-mode fallbacks while upstream is down
+fallback_answers = AnswerCache(max_entries=int(os.environ.get("FALLBACK_ANSWER_CACHE_SIZE", 2000)))
+DEGRADED_MIN_SIMILARITY = float(os.environ.get("DEGRADED_MIN_SIMILARITY", 0.5))
+
+# Optional shadow traffic to an alternate profile (disabled unless SHADOW_SAMPLE_RATE is set)
+shadow_mirror = create_shadow_mirror(client, PROFILE["name"], default_upstream.scheduler)
+
+# Optional speculative follow-ups learned from observed question sequences (disabled unless SPECULATION_ENABLED)
+speculator = create_speculator()
+
+# Optional journal of /chat request metadata for load replay (disabled unless TRAFFIC_CAPTURE_PATH is set)
+traffic_journal = create_traffic_journal()
 
 def validate_environment():
     """Validate required environment variables"""
@@ -88,23 +102,188 @@ def validate_environment():
     
     return api_key, vector_store_id
 
+def default_tenant():
+    """Single-deployment tenant from the environment (used when TENANTS_FILE is not set)"""
+    api_key, vector_store_id = validate_environment()
+    return Tenant(DEFAULT_TENANT, vector_store_id, PROFILE, api_key)
+
+# Tenant registry: per-tenant vector store, profile and OpenAI key, hot-reloaded from TENANTS_FILE
+tenant_registry = TenantRegistry(
+    os.environ.get("TENANTS_FILE"),
+    default_factory=default_tenant,
+    reload_interval=float(os.environ.get("TENANTS_RELOAD_SECONDS", 5))
+)
+
+def resolve_tenant():
+    """Resolve the tenant for the current request by API key, then Host header"""
+    return tenant_registry.resolve(request.headers.get('X-API-Key'), request.host)
+
 # Removed maritime keyword check as all queries are maritime-related
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (never calls upstream; reports circuit breaker state)"""
+    breakers = client_pool.breakers()
     return jsonify({
-        "status": "healthy",
+        "status": "degraded" if any(b["state"] == OPEN for b in breakers.values()) else "healthy",
+        "circuit_breakers": {key: {"state": b["state"], "retry_after_seconds": b["retry_after_seconds"]} for key, b in breakers.items()},
         "timestamp": datetime.utcnow().isoformat(),
         "service": "Maritime Sustainability Chatbot"
     })
 
+def degraded_response(tenant, user_message, previous_response_id, error):
+    """Fail fast while the upstream circuit is open, serving the closest cached answer if there is one
+    
+    Cached answers are first turns of other conversations, so they are only served for first turns:
+    a follow-up answered from one would move the client onto an unrelated conversation chain.
+    Answers cached from live traffic carry response_id null, so the client's next turn starts a
+    fresh chain instead of continuing another user's conversation; bulk-precomputed answers keep
+    their ids, which hold no user context.
+    """
+    match = None
+    if not previous_response_id:
+        scope = answer_scope(tenant.vector_store_id, profile_fingerprint(tenant.profile))
+        match = (answer_cache.closest(scope, user_message, DEGRADED_MIN_SIMILARITY)
+                 or fallback_answers.closest(scope, user_message, DEGRADED_MIN_SIMILARITY))
+    
+    if match:
+        logger.warning(f"Circuit open, serving cached answer (similarity {match['similarity']})")
+        return json_response(success_envelope(
+            match["response"], match["response_id"], True,
+            degraded=True,
+            matched_question=match["question"],
+            similarity=match["similarity"],
+            warning="The assistant is temporarily degraded; this is the closest previously answered question"
+        ))
+    
+    logger.warning(f"Circuit open, failing fast: {error}")
+    response = jsonify({
+        "error": "The assistant is temporarily unavailable due to an upstream incident, please retry shortly",
+        "success": False,
+        "degraded": True,
+        "retry_after": max(1, int(error.retry_after))
+    })
+    response.headers["Retry-After"] = str(max(1, int(error.retry_after)))
+    return response, 503
+
+def precomputed_answer(tenant, upstream, scope, user_message, previous_response_id):
+    """Envelope for a turn answered without an upstream call, or None
+
+    First turns may be served from precomputed bulk answers for the same documents and profile;
+    follow-ups matching a speculated question are served from the background generation.
+    """
+    if not previous_response_id and answer_cache.stats["entries"]:
+        cached = answer_cache.get(scope, user_message)
+        if cached:
+            logger.info("Serving precomputed answer from answer cache")
+            extra = {"warning": cached["warning"]} if cached["warning"] else {}
+            return success_envelope(cached["response"], cached["response_id"], True, cached=True, **extra)
+    
+    if previous_response_id and speculator:
+        speculator.observe(tenant.name, previous_response_id, user_message)
+        speculated = speculator.take(previous_response_id, user_message)
+        if speculated:
+            decoded, response_id = speculated
+            logger.info(f"Serving speculated follow-up, response ID: {response_id}")
+            speculator.remember(tenant.name, response_id, user_message)
+            speculator.speculate(tenant.name, upstream, tenant.profile, tenant.vector_store_id, user_message, response_id)
+            extra = {"warning": f"Response did not match schema: {'; '.join(decoded.errors)}"} if decoded.errors else {}
+            return success_envelope(decoded.json_text, response_id, False, speculated=True, **extra)
+    return None
+
+def complete_turn(tenant, upstream, scope, user_message, previous_response_id, response, upstream_ms):
+    """Record, mirror and decode an upstream answer; returns the DecodedResponse
+
+    upstream_ms is the upstream call alone, without scheduler queue wait: it feeds the tenant's
+    mean_upstream_latency_ms and is what the shadow comparison pairs against.
+    """
+    tenant_registry.record(tenant.name, upstream_ms)
+    logger.info(f"OpenAI Response ID: {response.id}")
+    
+    if shadow_mirror:
+        shadow_mirror.mirror(tenant.profile, tenant.vector_store_id, user_message, previous_response_id,
+                             response, upstream_ms, upstream.client, upstream.scheduler)
+    
+    # Decode structured response (extraction path, schema validation and serialization are shared)
+    decoded = get_decoder(tenant.profile["schema"]).decode(response)
+    # Non-JSON output is a parse failure here (see answer_envelope), even if a JSON object can be recovered
+    usable = decoded.status in (OK, SCHEMA_MISMATCH)
+    
+    if usable and previous_response_id is None:
+        # No response id: a degraded answer must never hand one user's conversation chain to another
+        fallback_answers.put(scope, user_message, decoded.data)
+    
+    if usable and speculator:
+        speculator.remember(tenant.name, response.id, user_message)
+        speculator.speculate(tenant.name, upstream, tenant.profile, tenant.vector_store_id, user_message, response.id)
+    return decoded
+
+def answer_envelope(decoded, response_id, is_new_conversation):
+    """Success envelope for a usable decoded answer, or None
+
+    Output that is not JSON as a whole (MALFORMED, and RECOVERED objects cut out of
+    surrounding text) is not usable: /chat answers it with 500 "Failed to parse AI response".
+    """
+    if decoded.status == OK:
+        logger.info("Successfully parsed structured JSON response")
+        return success_envelope(decoded.json_text, response_id, is_new_conversation)
+    
+    if decoded.status == SCHEMA_MISMATCH:
+        logger.warning(f"Structured response did not match schema: {'; '.join(decoded.errors)}")
+        return success_envelope(decoded.json_text, response_id, is_new_conversation,
+                                warning=f"Response did not match schema: {'; '.join(decoded.errors)}")
+    return None
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Main chat endpoint using OpenAI Responses API with conversation state and vector store"""
+    if not traffic_journal:
+        return answer_chat()
+    
+    arrived = time.time()
+    started = time.perf_counter()
+    response = app.make_response(answer_chat())
+    capture_request(arrived, (time.perf_counter() - started) * 1000, response.status_code,
+                    response.get_json(silent=True) or {})
+    return response
+
+def capture_request(arrived, latency_ms, status, envelope, stream=False):
+    """Journal the metadata of one /chat or /chat/stream request and its outcome"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('message'), str):
+        return
+    
+    traffic_journal.record(
+        arrived, data['message'].strip(), data.get('previous_response_id'), envelope.get("response_id"),
+        g.get("tenant_name"), request.headers.get('X-Request-Priority'), latency_ms, status,
+        request_outcome(status, envelope), stream=stream
+    )
+
+def captured_stream(frames, arrived, started):
+    """Pass Server-Sent Events frames through, journaling the request from its final frame once the stream ends"""
+    last = None
     try:
-        # Validate environment
-        api_key, vector_store_id = validate_environment()
+        for frame in frames:
+            last = frame
+            yield frame
+    finally:
+        lines = last.rstrip(b"\n").split(b"\n") if last else []
+        event = lines[0][len(b"event: "):] if lines else None
+        if event in (b"done", b"error"):
+            envelope = json.loads(b"\n".join(line[len(b"data: "):] for line in lines[1:]))
+        else:
+            # Client went away before the final event
+            envelope = {"success": False}
+        capture_request(arrived, (time.perf_counter() - started) * 1000, 200, envelope, stream=True)
+
+def answer_chat():
+    """Answer a /chat request"""
+    tenant = None
+    try:
+        # Resolve tenant (validates the environment in single-tenant mode)
+        tenant = resolve_tenant()
+        g.tenant_name = tenant.name
+        upstream = client_pool.get(tenant.openai_api_key)
         
         # Get request data
         data = request.get_json()
@@ -117,6 +296,7 @@ def chat():
         
         user_message = data['message'].strip()
         previous_response_id = data.get('previous_response_id')  # Optional for conversation continuity
+        priority = tenant.request_priority(request.headers.get('X-Request-Priority'))  # callers may only opt down
         
         if not user_message:
             return jsonify({
@@ -124,81 +304,42 @@ def chat():
                 "success": False
             }), 400
         
-        logger.info(f"Processing query: {user_message[:100]}...")
+        if priority not in PRIORITY_WEIGHTS:
+            return jsonify({
+                "error": f"Invalid X-Request-Priority '{priority}'",
+                "success": False
+            }), 400
+        
+        logger.info(f"Processing query for tenant '{tenant.name}': {user_message[:100]}...")
         if previous_response_id:
             logger.info(f"Continuing conversation from response ID: {previous_response_id}")
         
-        # Prepare the API call parameters
-        api_params = {
-            "model": "gpt-4o-mini",
-            "tools": [{
-                "type": "file_search",
-                "vector_store_ids": [vector_store_id],
-            }],
-            "text": {
-                "format": {
-                    "type": "json_schema",
-                    "name": "maritime_response",
-                    "schema": MARITIME_RESPONSE_SCHEMA,
-                    "strict": True
-                }
-            }
-        }
-        
-        # Handle conversation state
-        if previous_response_id:
-            # Continuing conversation - use previous_response_id and format input as messages
-            api_params["previous_response_id"] = previous_response_id
-            api_params["input"] = [{"role": "user", "content": user_message}]
-        else:
-            # New conversation - include instructions and use string input
-            api_params["instructions"] = MARITIME_INSTRUCTIONS
-            api_params["input"] = user_message
+        # Precomputed first turns and speculated follow-ups need no upstream call
+        scope = answer_scope(tenant.vector_store_id, profile_fingerprint(tenant.profile))
+        precomputed = precomputed_answer(tenant, upstream, scope, user_message, previous_response_id)
+        if precomputed:
+            return json_response(precomputed)
+        
+        # Prepare the API call parameters (conversation state handled by the profile builder)
+        api_params = build_api_params(tenant.profile, tenant.vector_store_id, user_message, previous_response_id)
         
         # Call OpenAI Responses API with conversation state + file_search
-        response = client.responses.create(**api_params)
-        
-        logger.info(f"OpenAI Response ID: {response.id}")
-        
-        # Parse structured response
-        if hasattr(response, 'output_text'):
-            try:
-                structured_data = json.loads(response.output_text)
-                logger.info("Successfully parsed structured JSON response")
-                
-                return jsonify({
-                    "success": True,
-                    "response": structured_data,
-                    "response_id": response.id,
-                    "is_new_conversation": previous_response_id is None,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                return jsonify({
-                    "error": "Failed to parse AI response",
-                    "success": False,
-                    "raw_response": response.output_text[:200] + "..." if len(response.output_text) > 200 else response.output_text
-                }), 500
-        
-        # Handle alternative response structure
-        elif hasattr(response, 'output') and response.output:
-            try:
-                content = response.output[0]
-                if hasattr(content, 'content') and content.content:
-                    text = content.content[0].text
-                    structured_data = json.loads(text)
-                    
-                    return jsonify({
-                        "success": True,
-                        "response": structured_data,
-                        "response_id": response.id,
-                        "is_new_conversation": previous_response_id is None,
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-            except (json.JSONDecodeError, AttributeError, IndexError) as e:
-                logger.error(f"Failed to parse alternative response format: {e}")
+        timings = {}
+        response = upstream.scheduler.create(upstream.client, api_params, priority, upstream.breaker, timings)
+        
+        decoded = complete_turn(tenant, upstream, scope, user_message, previous_response_id, response,
+                                timings["upstream_ms"])
+        envelope = answer_envelope(decoded, response.id, previous_response_id is None)
+        if envelope:
+            return json_response(envelope)
+        
+        if decoded.status in (MALFORMED, RECOVERED):
+            logger.error(f"Failed to parse JSON response ({decoded.status}): {'; '.join(decoded.errors) or 'JSON embedded in text'}")
+            return jsonify({
+                "error": "Failed to parse AI response",
+                "success": False,
+                "raw_response": decoded.text[:200] + "..." if len(decoded.text) > 200 else decoded.text
+            }), 500
         
         # Fallback if response structure is unexpected
         return jsonify({
@@ -207,6 +348,23 @@ def chat():
             "available_attributes": [attr for attr in dir(response) if not attr.startswith('_')]
         }), 500
         
+    except CircuitOpenError as e:
+        return degraded_response(tenant, user_message, previous_response_id, e)
+        
+    except TenantNotFoundError as e:
+        logger.warning(f"Rejected request for unknown tenant (host {request.host})")
+        return jsonify({
+            "error": str(e),
+            "success": False
+        }), 401
+        
+    except SchedulerBusyError as e:
+        logger.warning(f"Request rejected by scheduler: {e}")
+        return jsonify({
+            "error": "Service is busy, please retry shortly",
+            "success": False
+        }), 503
+        
     except ValueError as e:
         logger.error(f"Configuration error: {e}")
         return jsonify({
@@ -216,11 +374,168 @@ def chat():
         
     except Exception as e:
         logger.error(f"Unexpected error in chat endpoint: {e}")
+        if tenant:
+            tenant_registry.record(tenant.name, success=False)
+        return jsonify({
+            "error": "Internal server error occurred",
+            "success": False,
+            "details": str(e) if app.debug else None
+        }), 500
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming variant of /chat over Server-Sent Events
+    
+    Emits 'delta' events with the answer text (decoded from the streamed structured output)
+    as it is generated, then a single 'done' event carrying the same envelope /chat returns,
+    or an 'error' event. Requests that fail before streaming starts get the same JSON errors as /chat.
+    """
+    if not traffic_journal:
+        return answer_chat_stream()
+    
+    arrived = time.time()
+    started = time.perf_counter()
+    response = app.make_response(answer_chat_stream())
+    if response.mimetype != "text/event-stream":
+        capture_request(arrived, (time.perf_counter() - started) * 1000, response.status_code,
+                        response.get_json(silent=True) or {}, stream=True)
+        return response
+    # Latency and outcome are known only once the stream has been consumed
+    response.response = stream_with_context(captured_stream(response.response, arrived, started))
+    return response
+
+def answer_chat_stream():
+    """Answer a /chat/stream request"""
+    tenant = None
+    try:
+        tenant = resolve_tenant()
+        g.tenant_name = tenant.name
+        upstream = client_pool.get(tenant.openai_api_key)
+        
+        data = request.get_json()
+        if not data or 'message' not in data:
+            return jsonify({
+                "error": "Missing 'message' in request body",
+                "success": False
+            }), 400
+        
+        user_message = data['message'].strip()
+        previous_response_id = data.get('previous_response_id')
+        priority = tenant.request_priority(request.headers.get('X-Request-Priority'))
+        
+        if not user_message:
+            return jsonify({
+                "error": "Empty message provided",
+                "success": False
+            }), 400
+        
+        if priority not in PRIORITY_WEIGHTS:
+            return jsonify({
+                "error": f"Invalid X-Request-Priority '{priority}'",
+                "success": False
+            }), 400
+        
+        logger.info(f"Processing streamed query for tenant '{tenant.name}': {user_message[:100]}...")
+        
+        scope = answer_scope(tenant.vector_store_id, profile_fingerprint(tenant.profile))
+        precomputed = precomputed_answer(tenant, upstream, scope, user_message, previous_response_id)
+        if precomputed:
+            return event_stream([sse_event("done", precomputed)])
+        
+        # Open the upstream stream before responding, so admission and breaker errors are plain HTTP errors
+        api_params = build_api_params(tenant.profile, tenant.vector_store_id, user_message, previous_response_id)
+        started = time.perf_counter()
+        timings = {}
+        events = upstream.scheduler.open_stream(upstream.client, api_params, priority, upstream.breaker, timings)
+        
+    except CircuitOpenError as e:
+        return degraded_response(tenant, user_message, previous_response_id, e)
+        
+    except TenantNotFoundError as e:
+        return jsonify({
+            "error": str(e),
+            "success": False
+        }), 401
+        
+    except SchedulerBusyError as e:
+        logger.warning(f"Streamed request rejected by scheduler: {e}")
+        return jsonify({
+            "error": "Service is busy, please retry shortly",
+            "success": False
+        }), 503
+        
+    except ValueError as e:
+        logger.error(f"Configuration error: {e}")
+        return jsonify({
+            "error": str(e),
+            "success": False
+        }), 500
+        
+    except Exception as e:
+        logger.error(f"Unexpected error opening chat stream: {e}")
+        if tenant:
+            tenant_registry.record(tenant.name, success=False)
         return jsonify({
             "error": "Internal server error occurred",
             "success": False,
             "details": str(e) if app.debug else None
         }), 500
+    
+    def generate():
+        response = None
+        # Structured output streams as JSON fragments; clients get the decoded answer text
+        answer_text = StreamedFieldText("answer")
+        try:
+            for event in events:
+                if event.type == "response.output_text.delta":
+                    delta = answer_text.feed(event.delta)
+                    if delta:
+                        yield sse_event("delta", {"delta": delta})
+                elif event.type == "response.completed":
+                    response = event.response
+        except Exception as e:
+            # Already recorded against the circuit breaker by the scheduled stream
+            logger.error(f"Upstream stream failed: {e}")
+        finally:
+            events.close()
+        
+        if response is None:
+            tenant_registry.record(tenant.name, success=False)
+            yield sse_event("error", {"error": "Upstream stream ended without a complete response", "success": False})
+            return
+        
+        upstream_ms = (time.perf_counter() - started) * 1000 - timings["queue_ms"]
+        decoded = complete_turn(tenant, upstream, scope, user_message, previous_response_id, response, upstream_ms)
+        envelope = answer_envelope(decoded, response.id, previous_response_id is None)
+        if envelope:
+            yield sse_event("done", envelope)
+        else:
+            yield sse_event("error", {"error": "Failed to parse AI response", "success": False})
+    
+    return event_stream(generate())
+
+def event_stream(frames):
+    """Flask response for an iterable of Server-Sent Events frames"""
+    response = Response(frames, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # Disable proxy buffering (nginx)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Operational metrics: upstream scheduler queues, wait times, rate-limit budget and per-tenant usage"""
+    return jsonify({
+        "success": True,
+        "schedulers": client_pool.metrics(),
+        "tenants": tenant_registry.metrics(),
+        "shadow": dict(shadow_mirror.stats) if shadow_mirror else None,
+        "metadata_cache": dict(metadata_cache.stats),
+        "answer_cache": dict(answer_cache.stats),
+        "circuit_breakers": client_pool.breakers(),
+        "speculation": speculator.metrics() if speculator else None,
+        "traffic_capture": dict(traffic_journal.stats) if traffic_journal else None,
+        "timestamp": datetime.utcnow().isoformat()
+    })
 
 @app.route('/new-conversation', methods=['POST'])
 def new_conversation():
@@ -233,47 +548,46 @@ def new_conversation():
 
 @app.route('/vector-store-info', methods=['GET'])
 def vector_store_info():
-    """Get information about the vector store"""
+    """Get information about the vector store (served from the metadata cache)"""
     try:
-        vector_store_id = os.environ.get("VECTOR_STORE_ID")
-        
-        if not vector_store_id:
+        try:
+            tenant = resolve_tenant()
+        except ValueError as e:
             return jsonify({
-                "error": "Vector store ID not configured",
+                "error": str(e),
                 "success": False
             }), 500
+        upstream = client_pool.get(tenant.openai_api_key)
         
-        # Check which API to use
-        if hasattr(client, 'vector_stores'):
-            vs_client = client.vector_stores
-            api_type = "direct"
-        elif hasattr(client, 'beta') and hasattr(client.beta, 'vector_stores'):
-            vs_client = client.beta.vector_stores
-            api_type = "beta"
-        else:
+        if upstream.vs_client is None:
             return jsonify({
                 "error": "Vector stores not supported in this OpenAI client version",
                 "success": False
             }), 500
         
-        # Get vector store details
-        vector_store = vs_client.retrieve(vector_store_id)
+        # Last known details; refreshed in the background when older than the refresh interval
+        info, age_seconds, refresh_error = metadata_cache.get(
+            vector_store_info_key(tenant),
+            lambda: upstream.breaker.call(fetch_vector_store_info, upstream.vs_client, upstream.vs_api_type, tenant.vector_store_id)
+        )
         
         return jsonify({
             "success": True,
-            "vector_store": {
-                "id": vector_store_id,
-                "name": vector_store.name,
-                "status": vector_store.status,
-                "api_type": api_type,
-                "file_counts": {
-                    "total": getattr(vector_store.file_counts, 'total', 'N/A'),
-                    "completed": getattr(vector_store.file_counts, 'completed', 'N/A')
-                } if hasattr(vector_store, 'file_counts') else None
+            "vector_store": info,
+            "cache": {
+                "age_seconds": round(age_seconds, 1),
+                "refresh_interval_seconds": metadata_cache.refresh_interval,
+                "last_refresh_error": refresh_error if app.debug else bool(refresh_error)
             },
             "timestamp": datetime.utcnow().isoformat()
         })
         
+    except TenantNotFoundError as e:
+        return jsonify({
+            "error": str(e),
+            "success": False
+        }), 401
+        
     except Exception as e:
         logger.error(f"Error getting vector store info: {e}")
         return jsonify({
@@ -282,6 +596,39 @@ def vector_store_info():
             "details": str(e) if app.debug else None
         }), 500
 
+@app.route('/vector-store-info/refresh', methods=['POST'])
+def refresh_vector_store_info():
+    """Revalidate the calling tenant's cached vector store metadata in the background (e.g. after a document sync)"""
+    try:
+        tenant = resolve_tenant()
+    except TenantNotFoundError as e:
+        return jsonify({
+            "error": str(e),
+            "success": False
+        }), 401
+    except ValueError as e:
+        return jsonify({
+            "error": str(e),
+            "success": False
+        }), 500
+    
+    key = vector_store_info_key(tenant)
+    retry_after = metadata_cache.refresh_wait(key)
+    if retry_after > 0:
+        response = jsonify({
+            "error": "Vector store info was refreshed recently, please retry shortly",
+            "success": False,
+            "retry_after_seconds": round(retry_after, 1)
+        })
+        response.headers["Retry-After"] = str(int(retry_after) + 1)
+        return response, 429
+    
+    return jsonify({
+        "success": True,
+        "refresh_scheduled": metadata_cache.request_refresh(key) > 0,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
@@ -6,17 +6,25 @@ Features:
 - Structured JSON responses with source citations
 - Vector store integration for maritime documents
 - All queries assumed to be maritime-related
+- Optional shadow traffic to an alternate response profile
+- Priority-aware scheduling of upstream calls within rate-limit budgets
+- Streaming answers over Server-Sent Events (/chat/stream)
 """
 
 import os
-import json
+import time
 import logging
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 from flask_cors import CORS
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from profiles import PROFILES, build_api_params
+from shadow import create_shadow_mirror
+from response_decoding import get_decoder, success_envelope, json_response, sse_event, StreamedFieldText, RECOVERED, MALFORMED, EMPTY
+from scheduler import create_scheduler, SchedulerBusyError, PRIORITY_WEIGHTS
+
 # Load environment variables
 load_dotenv()
 
@@ -31,63 +39,16 @@ CORS(app)  # Enable CORS for frontend integration
 # Initialize OpenAI client
 client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
-# Maritime sustainability instructions
-MARITIME_INSTRUCTIONS = """
-- You are a Maritime Sustainability Strategy Consultant
-- For EUA/UKA/CORSIA Eligible Emissions Units, VERTIS is our partner
-- For Voluntary Carbon Credits, Climate Balanced is our partner
-- Do not answer any question or request which is not related to maritime sustainability
-- Always be polite
-- Regulatory frameworks include EU MRV, EU ETS, UK MRV, IMO DCS, FuelEU Maritime
-- Provide only a brief summary or overview for each question (2-3 sentences maximum)
-- Always end your response by directing the user to visit sustainbuddy.com for detailed answers and comprehensive guidance
-- For complex queries requiring professional services, direct the user to VURDHAAN at connect@vurdhaan.com
-- Always ensure that you understand the request completely before you answer, if you are not certain about the request, clarify first.
-"""
-
-# Maritime response schema (from Test 2)
-MARITIME_RESPONSE_SCHEMA_OLD = {
-    "type": "object",
-    "properties": {
-        "answer": {
-            "type": "string",
-            "description": "Main response about the maritime sustainability query"
-        },
-        "source_quote": {
-            "type": "string", 
-            "description": "Relevant quote from source documents"
-        },
-        "source_file": {
-            "type": "string",
-            "description": "Name of the source file"
-        },
-        "source_quote_location": {
-            "type": "object",
-            "properties": {
-                "page": {"type": "integer"},
-                "line": {"type": "integer"}
-            },
-            "required": ["page", "line"],
-            "additionalProperties": False
-        }
-    },
-    "required": ["answer", "source_quote", "source_file", "source_quote_location"],
-    "additionalProperties": False
-}
-
-MARITIME_RESPONSE_SCHEMA =  {
-  "type": "object",
-  "properties": {
-    "answer": {
-      "type": "string",
-      "description": "Main response about the maritime sustainability query"
-    },
-  },
-  "required": ["answer"],
-  "additionalProperties": False
-}
+# Maritime sustainability instructions and response schema (see profiles.py)
+PROFILE = PROFILES["brief"]
+MARITIME_INSTRUCTIONS = PROFILE["instructions"]
+MARITIME_RESPONSE_SCHEMA = PROFILE["schema"]
 
+# Shared scheduler for all upstream Responses API calls (interactive chat served first)
+scheduler = create_scheduler()
 
+# Optional shadow traffic to an alternate profile (disabled unless SHADOW_SAMPLE_RATE is set)
+shadow_mirror = create_shadow_mirror(client, PROFILE["name"], scheduler)
 
 def validate_environment():
     """Validate required environment variables"""
@@ -104,6 +65,63 @@ def validate_environment():
 
 # Removed maritime keyword check as all queries are maritime-related
 
+def chat_reply(response, is_new_conversation):
+    """(body, status) for an upstream answer: the success envelope, with fallback structures for odd output"""
+    # Decode structured response (extraction path, schema validation and serialization are shared)
+    decoded = get_decoder(MARITIME_RESPONSE_SCHEMA).decode(response)
+    
+    if decoded.status == EMPTY:
+        # Fallback if no response text found
+        logger.error("No response text found in any expected attribute")
+        return {
+            "error": "No response content found",
+            "success": False,
+            "available_attributes": [attr for attr in dir(response) if not attr.startswith('_')],
+            "response_id": response.id if hasattr(response, 'id') else None
+        }, 500
+    
+    logger.info(f"Raw response text (first 200 chars): {decoded.text[:200]}...")
+    
+    if decoded.status == MALFORMED:
+        logger.error(f"Failed to parse JSON response: {decoded.errors[0]}")
+        logger.error(f"Problematic JSON: {decoded.text}")
+        
+        # Create fallback response with the raw text
+        fallback_response = {
+            "answer": decoded.text,
+            "source_quote": "N/A - Raw response due to parsing error",
+            "source_file": "N/A",
+            "source_quote_location": {"page": 0, "line": 0}
+        }
+        return success_envelope(
+            fallback_response, response.id, is_new_conversation,
+            warning=f"JSON parsing failed: {decoded.errors[0]}"
+        ), 200
+    
+    if decoded.status == RECOVERED:
+        logger.info("Successfully parsed cleaned JSON response")
+    else:
+        logger.info("Successfully parsed structured JSON response")
+    
+    structured_data = decoded.data
+    
+    # Validate that we have the expected structure
+    if isinstance(structured_data, dict) and 'answer' in structured_data:
+        return success_envelope(decoded.json_text, response.id, is_new_conversation), 200
+    
+    logger.error(f"Unexpected JSON structure: {structured_data}")
+    # Try to create a fallback structure
+    fallback_response = {
+        "answer": str(structured_data) if not isinstance(structured_data, dict) else structured_data.get('answer', 'Response received but format unexpected'),
+        "source_quote": "N/A",
+        "source_file": "N/A", 
+        "source_quote_location": {"page": 0, "line": 0}
+    }
+    return success_envelope(
+        fallback_response, response.id, is_new_conversation,
+        warning="Response format was unexpected, used fallback structure"
+    ), 200
+
 # This will look for templates/index.html
 @app.route('/')
 def index():
@@ -141,6 +159,7 @@ def chat():
         
         user_message = data['message'].strip()
         previous_response_id = data.get('previous_response_id')  # Optional for conversation continuity
+        priority = request.headers.get('X-Request-Priority', 'interactive')  # partner/bulk callers opt down
         
         if not user_message:
             return jsonify({
@@ -148,161 +167,101 @@ def chat():
                 "success": False
             }), 400
         
+        if priority not in PRIORITY_WEIGHTS:
+            return jsonify({
+                "error": f"Invalid X-Request-Priority '{priority}'",
+                "success": False
+            }), 400
+        
         logger.info(f"Processing query: {user_message[:100]}...")
         if previous_response_id:
             logger.info(f"Continuing conversation from response ID: {previous_response_id}")
         
-        # Prepare the API call parameters
-        api_params = {
-            "model": "gpt-4o-mini",
-            "tools": [{
-                "type": "file_search",
-                "vector_store_ids": [vector_store_id],
-            }],
-            "text": {
-                "format": {
-                    "type": "json_schema",
-                    "name": "maritime_response",
-                    "schema": MARITIME_RESPONSE_SCHEMA,
-                    "strict": True
-                }
-            }
-        }
-        
-        # Handle conversation state
-        if previous_response_id:
-            # Continuing conversation - use previous_response_id and format input as messages
-            api_params["previous_response_id"] = previous_response_id
-            api_params["input"] = [{"role": "user", "content": user_message}]
-        else:
-            # New conversation - include instructions and use string input
-            api_params["instructions"] = MARITIME_INSTRUCTIONS
-            api_params["input"] = user_message
+        # Prepare the API call parameters (conversation state handled by the profile builder)
+        api_params = build_api_params(PROFILE, vector_store_id, user_message, previous_response_id)
         
         # Call OpenAI Responses API with conversation state + file_search
-        response = client.responses.create(**api_params)
+        timings = {}
+        response = scheduler.create(client, api_params, priority, timings=timings)
         
         logger.info(f"OpenAI Response ID: {response.id}")
         
-        # Debug: Log response structure
-        logger.info(f"Response attributes: {[attr for attr in dir(response) if not attr.startswith('_')]}")
+        if shadow_mirror:
+            # Upstream time only: queue wait depends on the priority class, not the profile
+            shadow_mirror.mirror(PROFILE, vector_store_id, user_message, previous_response_id, response, timings["upstream_ms"])
         
-        # Parse structured response - handle multiple possible response formats
-        response_text = None
+        return json_response(*chat_reply(response, previous_response_id is None))
         
-        # Try different ways to extract the response text
-        if hasattr(response, 'output_text') and response.output_text:
-            response_text = response.output_text
-            logger.info("Using response.output_text")
-        elif hasattr(response, 'output') and response.output:
-            try:
-                # Handle list-based output structure
-                if isinstance(response.output, list) and len(response.output) > 0:
-                    content = response.output[0]
-                    if hasattr(content, 'content') and content.content:
-                        if isinstance(content.content, list) and len(content.content) > 0:
-                            response_text = content.content[0].text
-                            logger.info("Using response.output[0].content[0].text")
-                        elif hasattr(content.content, 'text'):
-                            response_text = content.content.text
-                            logger.info("Using response.output[0].content.text")
-                    elif hasattr(content, 'text'):
-                        response_text = content.text
-                        logger.info("Using response.output[0].text")
-            except (AttributeError, IndexError) as e:
-                logger.error(f"Error extracting from response.output: {e}")
-        elif hasattr(response, 'text') and response.text:
-            response_text = response.text
-            logger.info("Using response.text")
+    except SchedulerBusyError as e:
+        logger.warning(f"Request rejected by scheduler: {e}")
+        return jsonify({
+            "error": "Service is busy, please retry shortly",
+            "success": False
+        }), 503
         
-        if response_text:
-            logger.info(f"Raw response text (first 200 chars): {response_text[:200]}...")
-            
-            try:
-                # Try to parse as JSON
-                structured_data = json.loads(response_text)
-                logger.info("Successfully parsed structured JSON response")
-                
-                # Validate that we have the expected structure
-                if isinstance(structured_data, dict) and 'answer' in structured_data:
-                    return jsonify({
-                        "success": True,
-                        "response": structured_data,
-                        "response_id": response.id,
-                        "is_new_conversation": previous_response_id is None,
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-                else:
-                    logger.error(f"Unexpected JSON structure: {structured_data}")
-                    # Try to create a fallback structure
-                    fallback_response = {
-                        "answer": str(structured_data) if not isinstance(structured_data, dict) else structured_data.get('answer', 'Response received but format unexpected'),
-                        "source_quote": "N/A",
-                        "source_file": "N/A", 
-                        "source_quote_location": {"page": 0, "line": 0}
-                    }
-                    
-                    return jsonify({
-                        "success": True,
-                        "response": fallback_response,
-                        "response_id": response.id,
-                        "is_new_conversation": previous_response_id is None,
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "warning": "Response format was unexpected, used fallback structure"
-                    })
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                logger.error(f"Problematic JSON: {response_text}")
-                
-                # Try to clean up the JSON and parse again
-                try:
-                    # Remove potential trailing commas or other JSON issues
-                    cleaned_text = response_text.strip()
-                    
-                    # Try to find JSON content within the text
-                    import re
-                    json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
-                    if json_match:
-                        json_content = json_match.group(0)
-                        structured_data = json.loads(json_content)
-                        logger.info("Successfully parsed cleaned JSON response")
-                        
-                        return jsonify({
-                            "success": True,
-                            "response": structured_data,
-                            "response_id": response.id,
-                            "is_new_conversation": previous_response_id is None,
-                            "timestamp": datetime.utcnow().isoformat()
-                        })
-                except Exception as cleanup_error:
-                    logger.error(f"JSON cleanup failed: {cleanup_error}")
-                
-                # Create fallback response with the raw text
-                fallback_response = {
-                    "answer": response_text,
-                    "source_quote": "N/A - Raw response due to parsing error",
-                    "source_file": "N/A",
-                    "source_quote_location": {"page": 0, "line": 0}
-                }
-                
-                return jsonify({
-                    "success": True,
-                    "response": fallback_response,
-                    "response_id": response.id,
-                    "is_new_conversation": previous_response_id is None,
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "warning": f"JSON parsing failed: {str(e)}"
-                })
+    except ValueError as e:
+        logger.error(f"Configuration error: {e}")
+        return jsonify({
+            "error": str(e),
+            "success": False
+        }), 500
         
-        # Fallback if no response text found
-        logger.error("No response text found in any expected attribute")
+    except Exception as e:
+        logger.error(f"Unexpected error in chat endpoint: {e}")
         return jsonify({
-            "error": "No response content found",
+            "error": "Internal server error occurred",
             "success": False,
-            "available_attributes": [attr for attr in dir(response) if not attr.startswith('_')],
-            "response_id": response.id if hasattr(response, 'id') else None
+            "details": str(e) if app.debug else None
         }), 500
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming variant of /chat over Server-Sent Events
+    
+    Emits 'delta' events with the answer text as it is generated, then a single 'done' event
+    carrying the envelope /chat returns, or an 'error' event. Requests that fail before
+    streaming starts get the same JSON errors as /chat.
+    """
+    try:
+        api_key, vector_store_id = validate_environment()
+        
+        data = request.get_json()
+        if not data or 'message' not in data:
+            return jsonify({
+                "error": "Missing 'message' in request body",
+                "success": False
+            }), 400
+        
+        user_message = data['message'].strip()
+        previous_response_id = data.get('previous_response_id')
+        priority = request.headers.get('X-Request-Priority', 'interactive')
+        
+        if not user_message:
+            return jsonify({
+                "error": "Empty message provided",
+                "success": False
+            }), 400
+        
+        if priority not in PRIORITY_WEIGHTS:
+            return jsonify({
+                "error": f"Invalid X-Request-Priority '{priority}'",
+                "success": False
+            }), 400
+        
+        logger.info(f"Processing streamed query: {user_message[:100]}...")
+        
+        # Open the upstream stream before responding, so admission errors are plain HTTP errors
+        api_params = build_api_params(PROFILE, vector_store_id, user_message, previous_response_id)
+        timings = {}
+        started = time.perf_counter()
+        events = scheduler.open_stream(client, api_params, priority, timings=timings)
+        
+    except SchedulerBusyError as e:
+        logger.warning(f"Streamed request rejected by scheduler: {e}")
+        return jsonify({
+            "error": "Service is busy, please retry shortly",
+            "success": False
+        }), 503
         
     except ValueError as e:
         logger.error(f"Configuration error: {e}")
@@ -312,12 +271,57 @@ def chat():
         }), 500
         
     except Exception as e:
-        logger.error(f"Unexpected error in chat endpoint: {e}")
+        logger.error(f"Unexpected error opening chat stream: {e}")
         return jsonify({
             "error": "Internal server error occurred",
             "success": False,
             "details": str(e) if app.debug else None
         }), 500
+    
+    def generate():
+        response = None
+        # Structured output streams as JSON fragments; clients get the decoded answer text
+        answer_text = StreamedFieldText("answer")
+        try:
+            for event in events:
+                if event.type == "response.output_text.delta":
+                    delta = answer_text.feed(event.delta)
+                    if delta:
+                        yield sse_event("delta", {"delta": delta})
+                elif event.type == "response.completed":
+                    response = event.response
+        except Exception as e:
+            logger.error(f"Upstream stream failed: {e}")
+        finally:
+            events.close()
+        
+        if response is None:
+            yield sse_event("error", {"error": "Upstream stream ended without a complete response", "success": False})
+            return
+        
+        logger.info(f"OpenAI Response ID: {response.id}")
+        if shadow_mirror:
+            # Upstream time only, as for /chat: the stream's queue wait is left out
+            upstream_ms = (time.perf_counter() - started) * 1000 - timings["queue_ms"]
+            shadow_mirror.mirror(PROFILE, vector_store_id, user_message, previous_response_id, response, upstream_ms)
+        
+        body, status = chat_reply(response, previous_response_id is None)
+        yield sse_event("done" if status == 200 else "error", body)
+    
+    response = Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # Disable proxy buffering (nginx)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Operational metrics: upstream scheduler queues, wait times and rate-limit budget"""
+    return jsonify({
+        "success": True,
+        "scheduler": scheduler.metrics(),
+        "shadow": dict(shadow_mirror.stats) if shadow_mirror else None,
+        "timestamp": datetime.utcnow().isoformat()
+    })
 
 @app.route('/new-conversation', methods=['POST'])
 def new_conversation():
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-turn client overhead of the documented requests.post snippet vs sustainbuddy_client
+The documented snippet opens a new connection (and TLS session) for every message; the client
+library reuses pooled keep-alive connections.
+
+By default runs against a local stub /chat server that answers instantly, so the measured time is
+pure client + connection overhead. --tls serves the stub over HTTPS with a throwaway self-signed
+certificate (needs the openssl CLI), which is where the handshake savings show.
+--url measures a real deployment instead (each turn then costs a real upstream call).
+
+Usage:
+    python bench_client.py [--turns 200] [--tls]
+    python bench_client.py --url https://api.sustainbuddy.ai --turns 10
+"""
+
+import os
+import ssl
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from sustainbuddy_client import SustainBuddyClient, AsyncSustainBuddyClient
+
+ENVELOPE = {
+    "success": True,
+    "response": {
+        "answer": "FuelEU Maritime sets limits on the yearly average GHG intensity of energy used on board.",
+        "source_quote": "The GHG intensity of the energy used on board by a ship shall not exceed the limit.",
+        "source_file": "FuelEU_Maritime_Regulation_2023_1805.pdf",
+        "source_quote_location": {"page": 12, "line": 4}
+    },
+    "is_new_conversation": False
+}
+
+
+class StubChatHandler(BaseHTTPRequestHandler):
+    """Instant /chat answers over HTTP/1.1 keep-alive"""
+    protocol_version = "HTTP/1.1"
+    # Like production servers: avoid Nagle/delayed-ACK stalls on small keep-alive responses
+    disable_nagle_algorithm = True
+    turn = 0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        StubChatHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StubChatHandler.turn += 1
+        body = json.dumps(dict(ENVELOPE, response_id=f"resp_{StubChatHandler.turn}")).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(tls):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChatHandler)
+    cert_path = None
+    if tls:
+        directory = tempfile.mkdtemp()
+        cert_path = os.path.join(directory, "cert.pem")
+        key_path = os.path.join(directory, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                        "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                        "-keyout", key_path, "-out", cert_path],
+                       check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scheme = "https" if tls else "http"
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}", cert_path
+
+
+def documented_snippet_turns(api_url, questions, verify):
+    """The index.html integration snippet: one requests.post (and connection) per message"""
+    current_response_id = None
+    timings = []
+    for message in questions:
+        payload = {"message": message}
+        if current_response_id:
+            payload["previous_response_id"] = current_response_id
+        started = time.perf_counter()
+        response = requests.post(f"{api_url}/chat", json=payload,
+                                 headers={"Content-Type": "application/json"}, verify=verify)
+        data = response.json()
+        timings.append(time.perf_counter() - started)
+        if not data["success"]:
+            raise RuntimeError(data["error"])
+        current_response_id = data["response_id"]
+    return timings
+
+
+def client_library_turns(api_url, questions, verify):
+    timings = []
+    with SustainBuddyClient(api_url, verify=verify) as client:
+        for message in questions:
+            started = time.perf_counter()
+            client.send_message(message)
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def async_bulk(api_url, questions, verify, concurrency):
+    async with AsyncSustainBuddyClient(api_url, verify=verify, max_connections=concurrency) as client:
+        started = time.perf_counter()
+        await client.ask_many(questions, concurrency=concurrency)
+        return time.perf_counter() - started
+
+
+def summarize(label, timings):
+    ordered = sorted(timings)
+    mean_ms = statistics.mean(timings) * 1000
+    p95_ms = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000
+    print(f"{label:<34} mean {mean_ms:8.2f} ms   p50 {statistics.median(timings) * 1000:8.2f} ms   p95 {p95_ms:8.2f} ms")
+    return mean_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-turn overhead: documented snippet vs client library")
+    parser.add_argument("--url", help="Benchmark a running deployment instead of the local stub")
+    parser.add_argument("--turns", type=int, default=200, help="Turns per conversation run (default 200)")
+    parser.add_argument("--tls", action="store_true", help="Serve the local stub over HTTPS")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrency for the async bulk run")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        api_url, verify = args.url.rstrip("/"), True
+    else:
+        server, api_url, cert_path = start_stub_server(args.tls)
+        verify = cert_path or True
+
+    questions = [f"Question {i} about FuelEU Maritime penalties?" for i in range(args.turns)]
+    print(f"Target: {api_url}  turns: {args.turns}")
+
+    # Warm up imports, DNS and the server before measuring
+    documented_snippet_turns(api_url, questions[:3], verify)
+    client_library_turns(api_url, questions[:3], verify)
+
+    StubChatHandler.connections = 0
+    snippet_ms = summarize("documented snippet (requests.post)", documented_snippet_turns(api_url, questions, verify))
+    snippet_connections = StubChatHandler.connections
+    StubChatHandler.connections = 0
+    client_ms = summarize("SustainBuddyClient (pooled)", client_library_turns(api_url, questions, verify))
+    client_connections = StubChatHandler.connections
+
+    print(f"\nPer-turn overhead saved: {snippet_ms - client_ms:.2f} ms ({(1 - client_ms / snippet_ms) * 100:.0f}%)")
+    if server:
+        print(f"Connections opened: snippet {snippet_connections}, client {client_connections}")
+
+    elapsed = asyncio.run(async_bulk(api_url, questions, verify, args.concurrency))
+    print(f"AsyncSustainBuddyClient.ask_many: {len(questions)} questions in {elapsed:.2f}s "
+          f"at concurrency {args.concurrency} ({len(questions) / elapsed:.0f} questions/s)")
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
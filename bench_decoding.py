@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: legacy per-app response decoding vs the shared response_decoding layer
+Covers the success, fallback (JSON embedded in text) and malformed-JSON paths.
+
+Usage: python bench_decoding.py [iterations]
+"""
+
+import sys
+import json
+import types
+import timeit
+
+from flask import Flask, jsonify
+
+from profiles import CITATION_RESPONSE_SCHEMA
+from response_decoding import get_decoder, success_envelope, json_response, MALFORMED
+
+app = Flask(__name__)
+
+STRUCTURED = {
+    "answer": "FuelEU Maritime sets limits on the yearly average GHG intensity of energy used on board. " * 6,
+    "source_quote": "The GHG intensity of the energy used on board by a ship during a reporting period shall not exceed the limit.",
+    "source_file": "FuelEU_Maritime_Regulation_2023_1805.pdf",
+    "source_quote_location": {"page": 12, "line": 4}
+}
+
+CASES = {
+    "success": json.dumps(STRUCTURED),
+    "fallback": "Here is the structured answer:\n" + json.dumps(STRUCTURED) + "\nLet me know if you need more detail.",
+    "malformed": "I could not produce structured output for this request. " * 8
+}
+
+
+def make_response(text):
+    """Stand-in for an SDK response object exposing output_text"""
+    return types.SimpleNamespace(id="resp_bench", output_text=text, output=[], text=None)
+
+
+def legacy_decode(response):
+    """The pre-refactor app2.py path: hasattr chain, json.loads, per-call import re, jsonify"""
+    response_text = None
+    if hasattr(response, 'output_text') and response.output_text:
+        response_text = response.output_text
+    elif hasattr(response, 'output') and response.output:
+        content = response.output[0]
+        if hasattr(content, 'content') and content.content:
+            response_text = content.content[0].text
+    elif hasattr(response, 'text') and response.text:
+        response_text = response.text
+
+    try:
+        structured_data = json.loads(response_text)
+    except json.JSONDecodeError:
+        import re
+        json_match = re.search(r'\{.*\}', response_text.strip(), re.DOTALL)
+        structured_data = None
+        if json_match:
+            try:
+                structured_data = json.loads(json_match.group(0))
+            except json.JSONDecodeError:
+                pass
+        if structured_data is None:
+            structured_data = {"answer": response_text, "source_quote": "N/A", "source_file": "N/A",
+                               "source_quote_location": {"page": 0, "line": 0}}
+
+    return jsonify({
+        "success": True,
+        "response": structured_data,
+        "response_id": response.id,
+        "is_new_conversation": True,
+        "timestamp": "2025-01-01T00:00:00"
+    }).get_data()
+
+
+def shared_decode(response):
+    """The response_decoding path used by app.py and app2.py"""
+    decoded = get_decoder(CITATION_RESPONSE_SCHEMA).decode(response)
+    if decoded.status == MALFORMED:
+        body = {"answer": decoded.text, "source_quote": "N/A", "source_file": "N/A",
+                "source_quote_location": {"page": 0, "line": 0}}
+        return json_response(success_envelope(body, response.id, True)).get_data()
+    return json_response(success_envelope(decoded.json_text, response.id, True)).get_data()
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"📊 Response decoding benchmark ({iterations} iterations per case)")
+    print("=" * 60)
+    print(f"{'case':12}{'legacy µs':>14}{'shared µs':>14}{'speedup':>10}")
+
+    with app.app_context():
+        for name, text in CASES.items():
+            response = make_response(text)
+            # Both paths must produce the same response payload
+            assert json.loads(legacy_decode(response))["response"] == json.loads(shared_decode(response))["response"]
+
+            legacy = min(timeit.repeat(lambda: legacy_decode(response), number=iterations, repeat=3)) / iterations * 1e6
+            shared = min(timeit.repeat(lambda: shared_decode(response), number=iterations, repeat=3)) / iterations * 1e6
+            print(f"{name:12}{legacy:>14.2f}{shared:>14.2f}{legacy / shared:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Offline bulk answers through the OpenAI Batch API
+Features:
+- Builds the same Responses requests as /chat (instructions, file_search tool, json_schema format)
+- Submits them as one or more Batch jobs (/v1/responses endpoint) and polls for completion
+- Streams results (line by line from the result files) into an output JSONL in input order
+- Records submitted batch ids so an interrupted or partially failed run can --resume; the
+  record is kept until every batch completes and is tied to the questions file's content
+- Output can be loaded into the backend's answer cache (PRECOMPUTED_ANSWERS_PATH)
+- --base-url points the run at fake_batch_server.py for end-to-end testing
+
+Usage:
+    python bulk_answer.py questions.jsonl -o answers.jsonl
+    python bulk_answer.py questions.txt -o answers.jsonl --base-url http://127.0.0.1:8089/v1
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from profiles import PROFILES, get_profile, build_api_params, profile_fingerprint
+from response_decoding import get_decoder, OK, SCHEMA_MISMATCH
+
+# Load environment variables
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/responses"
+# Batch API limit on requests per input file
+MAX_REQUESTS_PER_BATCH = 50000
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def load_questions(path):
+    """Questions from JSONL ({"id", "question"}) or plain text (one question per line)"""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                item = json.loads(line)
+                questions.append({"id": str(item.get("id", f"q{line_number}")), "question": item["question"]})
+            else:
+                questions.append({"id": f"q{line_number}", "question": line})
+    return questions
+
+
+def file_sha256(path):
+    """Content hash of the questions file, so --resume cannot pair batches with other questions"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_batch_input(questions, start, profile, vector_store_id, path):
+    """Write Batch API input lines; custom_id carries the input index for reordering"""
+    with open(path, "w", encoding="utf-8") as f:
+        for index, item in enumerate(questions, start=start):
+            f.write(json.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": build_api_params(profile, vector_store_id, item["question"])
+            }) + "\n")
+
+
+def submit_batches(client, questions, profile, vector_store_id, max_per_batch, completion_window):
+    """Upload inputs and create batch jobs; returns batch ids"""
+    batch_ids = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for start in range(0, len(questions), max_per_batch):
+            part = questions[start:start + max_per_batch]
+            path = os.path.join(tmp, f"batch_{start}.jsonl")
+            write_batch_input(part, start, profile, vector_store_id, path)
+            with open(path, "rb") as f:
+                input_file = client.files.create(file=f, purpose="batch")
+            batch = client.batches.create(
+                input_file_id=input_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=completion_window,
+                metadata={"source": "bulk_answer", "profile": profile["name"]}
+            )
+            logger.info(f"Submitted batch {batch.id} with {len(part)} requests")
+            batch_ids.append(batch.id)
+    return batch_ids
+
+
+def wait_for_batches(client, batch_ids, poll_interval):
+    """Poll until every batch reaches a terminal status; returns the final batch objects"""
+    pending = list(batch_ids)
+    finished = {}
+    while pending:
+        for batch_id in list(pending):
+            batch = client.batches.retrieve(batch_id)
+            counts = batch.request_counts
+            if counts:
+                logger.info(f"Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} completed, {counts.failed} failed)")
+            else:
+                logger.info(f"Batch {batch_id}: {batch.status}")
+            if batch.status in TERMINAL_STATUSES:
+                finished[batch_id] = batch
+                pending.remove(batch_id)
+        if pending:
+            time.sleep(poll_interval)
+    return [finished[batch_id] for batch_id in batch_ids]
+
+
+def iter_result_lines(client, file_id):
+    """Lines of a batch output/error file, streamed rather than loaded whole"""
+    with client.files.with_streaming_response.content(file_id) as response:
+        for line in response.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def result_record(line, profile):
+    """Turn one batch output line into an output record (without question metadata)"""
+    if line.get("error"):
+        return {"success": False, "error": line["error"].get("message", str(line["error"]))}
+
+    result = line.get("response") or {}
+    body = result.get("body") or {}
+    if result.get("status_code") != 200:
+        error = body.get("error") or {}
+        return {"success": False, "error": error.get("message", f"HTTP {result.get('status_code')}")}
+
+    decoded = get_decoder(profile["schema"]).decode(body)
+    record = {"response_id": body.get("id")}
+    # Same bar as app.py's /chat, whose answer cache these records feed: the output must be JSON as a whole
+    if decoded.status in (OK, SCHEMA_MISMATCH):
+        record.update(success=True, response=decoded.data)
+        if decoded.errors:
+            record["warning"] = f"Response did not match schema: {'; '.join(decoded.errors)}"
+    else:
+        record.update(success=False, error=f"Unparseable response ({decoded.status})", raw_response=decoded.text)
+    return record
+
+
+def write_results(client, batches, questions, profile, vector_store_id, output_path):
+    """Stream results into output_path in input order, buffering only out-of-order lines"""
+    fingerprint = profile_fingerprint(profile)
+    buffered = {}
+    next_index = 0
+    written = {"success": 0, "failed": 0}
+
+    with open(output_path, "w", encoding="utf-8") as out:
+        def emit(index, record):
+            item = questions[index]
+            record = dict({
+                "index": index,
+                "id": item["id"],
+                "question": item["question"],
+                "vector_store_id": vector_store_id,
+                "profile": profile["name"],
+                "profile_fingerprint": fingerprint
+            }, **record)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            written["success" if record.get("success") else "failed"] += 1
+
+        def flush():
+            nonlocal next_index
+            while next_index in buffered:
+                emit(next_index, buffered.pop(next_index))
+                next_index += 1
+
+        for batch in batches:
+            if batch.status != "completed":
+                logger.error(f"Batch {batch.id} ended as {batch.status}")
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                for line in iter_result_lines(client, file_id):
+                    buffered[int(line["custom_id"])] = result_record(line, profile)
+                    flush()
+
+        # Anything never returned (failed/expired batches) is recorded as a failure, in order
+        for index in range(next_index, len(questions)):
+            buffered.setdefault(index, {"success": False, "error": "No result returned by the batch"})
+        flush()
+
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a question file through the Batch API")
+    parser.add_argument("questions", help="Question file (.jsonl with id/question, or one question per line)")
+    parser.add_argument("-o", "--output", default="answers.jsonl", help="Output JSONL (default: answers.jsonl)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="full")
+    parser.add_argument("--model", help="Override the profile's model")
+    parser.add_argument("--vector-store-id", default=os.environ.get("VECTOR_STORE_ID"))
+    parser.add_argument("--base-url", default=os.environ.get("OPENAI_BASE_URL"), help="API base URL (e.g. fake_batch_server.py)")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between status polls")
+    parser.add_argument("--max-requests-per-batch", type=int, default=MAX_REQUESTS_PER_BATCH)
+    parser.add_argument("--completion-window", default="24h")
+    parser.add_argument("--resume", action="store_true", help="Resume polling the batches recorded for this output")
+    args = parser.parse_args(argv)
+
+    if not args.vector_store_id or args.vector_store_id == 'your-vector-store-id-here':
+        print("❌ No vector store ID configured. Set VECTOR_STORE_ID or pass --vector-store-id")
+        return 1
+
+    profile = get_profile(args.profile, args.model)
+    questions = load_questions(args.questions)
+    if not questions:
+        print(f"❌ No questions found in {args.questions}")
+        return 1
+
+    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), base_url=args.base_url)
+    state_path = args.output + ".batches.json"
+    questions_sha = file_sha256(args.questions)
+
+    if args.resume and os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        # custom_id is an index into the questions, so they must be exactly the submitted ones
+        if state.get("questions_sha256") != questions_sha or state.get("question_count") != len(questions):
+            print(f"❌ {args.questions} does not match the questions submitted in {state_path} "
+                  f"({state.get('questions')}); resume with that file or start a new run")
+            return 1
+        batch_ids = state["batch_ids"]
+        print(f"🔁 Resuming {len(batch_ids)} batches from {state_path}")
+    else:
+        batch_ids = submit_batches(client, questions, profile, args.vector_store_id,
+                                   args.max_requests_per_batch, args.completion_window)
+        # Remember the batch ids so an interrupted run can --resume instead of resubmitting
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({"batch_ids": batch_ids, "questions": args.questions,
+                       "questions_sha256": questions_sha, "question_count": len(questions)}, f)
+
+    started = time.perf_counter()
+    batches = wait_for_batches(client, batch_ids, args.poll_interval)
+    written = write_results(client, batches, questions, profile, args.vector_store_id, args.output)
+    incomplete = [batch.id for batch in batches if batch.status != "completed"]
+    if not incomplete:
+        os.remove(state_path)
+
+    print(f"✅ {written['success']} answers written to {args.output} ({written['failed']} failed)")
+    print(f"⏱️  Waited {time.perf_counter() - started:.1f}s for {len(batch_ids)} batch(es)")
+    if incomplete:
+        print(f"⚠️  {len(incomplete)} batch(es) did not complete ({', '.join(incomplete)}); "
+              f"their ids are kept in {state_path}")
+    return 0 if written["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
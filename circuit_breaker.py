@@ -0,0 +1,198 @@
+"""
+Circuit breaker for upstream OpenAI calls (Responses API and vector stores)
+Features:
+- Opens on error rate or slow-call rate over a rolling time window
+- While open, calls fail immediately with CircuitOpenError instead of waiting on SDK timeouts
+- After a cool-down, a limited number of half-open probe calls decide whether to close again
+- State snapshot for /health and /metrics
+
+Configuration (environment):
+- BREAKER_WINDOW_SECONDS: rolling window for error/slow rates (default 30)
+- BREAKER_MIN_CALLS: calls in the window before the breaker may open (default 10)
+- BREAKER_FAILURE_RATE: error rate that opens the breaker (default 0.5)
+- BREAKER_SLOW_CALL_SECONDS / BREAKER_SLOW_CALL_RATE: slow-call threshold and rate (default 20s, 0.8)
+- BREAKER_OPEN_SECONDS: time open before half-open probes (default 30)
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the breaker is open and the call was not attempted"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(error):
+    """Errors that indicate upstream trouble (timeouts, connection errors, 429s and 5xx), not bad requests"""
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Error-rate and latency driven circuit breaker"""
+
+    def __init__(self, name="openai", window_seconds=30.0, min_calls=10, failure_rate=0.5,
+                 slow_call_seconds=20.0, slow_call_rate=0.8, open_seconds=30.0, half_open_probes=1,
+                 is_failure=is_upstream_failure):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.is_failure = is_failure
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        # (timestamp, failed, slow) per completed call
+        self._calls = deque()
+        self.stats = {"rejected": 0, "opened": 0, "failures": 0, "successes": 0}
+
+    def _trim(self, now):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now, reason):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self.stats["opened"] += 1
+        logger.error(f"Circuit '{self.name}' opened: {reason}")
+
+    def _before_call(self):
+        """Admit a call; returns True for a half-open probe, raises CircuitOpenError when open"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, self.open_seconds - (now - self._opened_at))
+                self._state = HALF_OPEN
+                logger.info(f"Circuit '{self.name}' half-open, probing upstream")
+
+            if self._state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, 1.0)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def _after_call(self, probe, failed, elapsed):
+        now = time.monotonic()
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            self.stats["failures" if failed else "successes"] += 1
+            if probe:
+                self._probes_in_flight -= 1
+                if failed or slow:
+                    self._open(now, "half-open probe " + ("failed" if failed else "was slow"))
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    logger.info(f"Circuit '{self.name}' closed, upstream recovered")
+                return
+
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            if self._state != CLOSED or len(self._calls) < self.min_calls:
+                return
+            total = len(self._calls)
+            failures = sum(1 for _, f, _ in self._calls if f)
+            slow_calls = sum(1 for _, _, s in self._calls if s)
+            if failures / total >= self.failure_rate:
+                self._open(now, f"{failures}/{total} calls failed in the last {self.window_seconds:g}s")
+            elif slow_calls / total >= self.slow_call_rate:
+                self._open(now, f"{slow_calls}/{total} calls slower than {self.slow_call_seconds:g}s")
+
+    def check(self):
+        """Raise CircuitOpenError if a call would be rejected now, without admitting one
+
+        Lets callers fail fast before queueing for capacity that an admitted call would need.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN and now - self._opened_at < self.open_seconds:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.name, self.open_seconds - (now - self._opened_at))
+            if self._state == HALF_OPEN and self._probes_in_flight >= self.half_open_probes:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.name, 1.0)
+
+    def admit(self):
+        """Admit one call; returns a token for done(), raises CircuitOpenError when open"""
+        return self._before_call(), time.monotonic()
+
+    def done(self, token, error=None, failed=None):
+        """Record the outcome of a call admitted with admit(); failed overrides classifying error"""
+        probe, started = token
+        if failed is None:
+            failed = error is not None and self.is_failure(error)
+        self._after_call(probe, failed, time.monotonic() - started)
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker"""
+        token = self.admit()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.done(token, e)
+            raise
+        self.done(token)
+        return result
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            total = len(self._calls)
+            return {
+                "state": HALF_OPEN if self._state == OPEN and now - self._opened_at >= self.open_seconds else self._state,
+                "calls_in_window": total,
+                "failure_rate": round(sum(1 for _, f, _ in self._calls if f) / total, 3) if total else 0.0,
+                "slow_call_rate": round(sum(1 for _, _, s in self._calls if s) / total, 3) if total else 0.0,
+                "retry_after_seconds": round(max(0.0, self.open_seconds - (now - self._opened_at)), 1) if self._state == OPEN else None,
+                "stats": dict(self.stats)
+            }
+
+
+def create_circuit_breaker(name="openai"):
+    """Build a breaker from the environment"""
+    return CircuitBreaker(
+        name=name,
+        window_seconds=float(os.environ.get("BREAKER_WINDOW_SECONDS", 30)),
+        min_calls=int(os.environ.get("BREAKER_MIN_CALLS", 10)),
+        failure_rate=float(os.environ.get("BREAKER_FAILURE_RATE", 0.5)),
+        slow_call_seconds=float(os.environ.get("BREAKER_SLOW_CALL_SECONDS", 20)),
+        slow_call_rate=float(os.environ.get("BREAKER_SLOW_CALL_RATE", 0.8)),
+        open_seconds=float(os.environ.get("BREAKER_OPEN_SECONDS", 30))
+    )
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Local fake of the OpenAI Files + Batch API for testing bulk_answer.py end to end
+Features:
+- POST /v1/files, GET /v1/files/<id>/content
+- POST /v1/batches, GET /v1/batches/<id>
+- Batches move validating -> in_progress -> completed in the background
+- Output lines are written in shuffled order, like the real Batch API
+- Questions containing "FAIL" produce a per-request error in the error file
+
+Usage:
+    python fake_batch_server.py --port 8089
+    python bulk_answer.py questions.txt -o answers.jsonl --base-url http://127.0.0.1:8089/v1 --poll-interval 0.5
+"""
+
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from flask import Flask, request, jsonify, Response
+
+app = Flask(__name__)
+
+files = {}
+batches = {}
+lock = threading.Lock()
+
+# Seconds spent in each batch state before moving on
+STEP_SECONDS = 0.5
+
+
+def new_id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def store_file(content, filename, purpose):
+    file_id = new_id("file")
+    with lock:
+        files[file_id] = {
+            "object": {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": filename,
+                "purpose": purpose,
+                "status": "processed"
+            },
+            "content": content
+        }
+    return files[file_id]["object"]
+
+
+def fake_answer(body):
+    """Responses API body for one request, answering in the requested json_schema"""
+    question = body["input"] if isinstance(body["input"], str) else body["input"][-1]["content"]
+    properties = body["text"]["format"]["schema"]["properties"]
+    answer = {"answer": f"Fake answer to: {question}"}
+    if "source_file" in properties:
+        answer.update(source_quote="Fake quote", source_file="fake.pdf", source_quote_location={"page": 1, "line": 1})
+    return {
+        "id": new_id("resp"),
+        "object": "response",
+        "status": "completed",
+        "model": body["model"],
+        "output": [
+            {"type": "file_search_call", "id": new_id("fs"), "status": "completed", "queries": [question]},
+            {"type": "message", "id": new_id("msg"), "role": "assistant", "status": "completed",
+             "content": [{"type": "output_text", "text": json.dumps(answer), "annotations": []}]}
+        ],
+        "usage": {"input_tokens": 1200, "output_tokens": 80, "total_tokens": 1280}
+    }
+
+
+def run_batch(batch_id):
+    batch = batches[batch_id]
+    lines = files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+    requests_in = [json.loads(line) for line in lines if line.strip()]
+
+    time.sleep(STEP_SECONDS)
+    with lock:
+        batch.update(status="in_progress", in_progress_at=int(time.time()))
+        batch["request_counts"]["total"] = len(requests_in)
+
+    outputs, errors = [], []
+    for item in requests_in:
+        line = {"id": new_id("batch_req"), "custom_id": item["custom_id"]}
+        question = item["body"]["input"] if isinstance(item["body"]["input"], str) else ""
+        if "FAIL" in question:
+            line.update(response=None, error={"code": "server_error", "message": "Simulated failure"})
+            errors.append(line)
+        else:
+            line.update(response={"status_code": 200, "request_id": new_id("req"), "body": fake_answer(item["body"])}, error=None)
+            outputs.append(line)
+        with lock:
+            batch["request_counts"]["completed" if line["error"] is None else "failed"] += 1
+
+    random.shuffle(outputs)
+    time.sleep(STEP_SECONDS)
+    output_file = store_file("".join(json.dumps(line) + "\n" for line in outputs).encode("utf-8"), "output.jsonl", "batch_output")
+    error_file = store_file("".join(json.dumps(line) + "\n" for line in errors).encode("utf-8"), "errors.jsonl", "batch_output") if errors else None
+    with lock:
+        batch.update(status="completed", completed_at=int(time.time()), output_file_id=output_file["id"],
+                     error_file_id=error_file["id"] if error_file else None)
+
+
+@app.route('/v1/files', methods=['POST'])
+def create_file():
+    upload = request.files["file"]
+    return jsonify(store_file(upload.read(), upload.filename, request.form.get("purpose", "batch")))
+
+
+@app.route('/v1/files/<file_id>/content', methods=['GET'])
+def file_content(file_id):
+    if file_id not in files:
+        return jsonify({"error": {"message": f"No such file: {file_id}"}}), 404
+    return Response(files[file_id]["content"], mimetype="application/octet-stream")
+
+
+@app.route('/v1/batches', methods=['POST'])
+def create_batch():
+    data = request.get_json()
+    if data.get("input_file_id") not in files:
+        return jsonify({"error": {"message": "input_file_id not found"}}), 400
+    batch_id = new_id("batch")
+    batch = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": data["endpoint"],
+        "input_file_id": data["input_file_id"],
+        "completion_window": data["completion_window"],
+        "status": "validating",
+        "created_at": int(time.time()),
+        "output_file_id": None,
+        "error_file_id": None,
+        "metadata": data.get("metadata"),
+        "request_counts": {"total": 0, "completed": 0, "failed": 0}
+    }
+    with lock:
+        batches[batch_id] = batch
+    threading.Thread(target=run_batch, args=(batch_id,), daemon=True).start()
+    return jsonify(batch)
+
+
+@app.route('/v1/batches/<batch_id>', methods=['GET'])
+def retrieve_batch(batch_id):
+    with lock:
+        if batch_id not in batches:
+            return jsonify({"error": {"message": f"No such batch: {batch_id}"}}), 404
+        return jsonify(batches[batch_id])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake OpenAI Batch API for local testing")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+    app.run(host='127.0.0.1', port=args.port, threaded=True)
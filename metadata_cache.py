@@ -0,0 +1,169 @@
+"""
+Stale-while-revalidate cache for slow-changing upstream metadata (vector store status, file counts)
+Features:
+- Serves the last known value instantly; only the very first lookup of a key waits on upstream
+- Background refresher thread revalidates entries on a fixed interval or on demand (sync events)
+- Failed refreshes keep serving the previous value and report the error
+- On-demand refreshes are per key, coalesced and rate-limited (min_refresh_interval)
+- Entries nobody has read for max_idle seconds are evicted instead of refreshed forever
+- Vector store API flavour (client.vector_stores vs client.beta.vector_stores) detected once
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def detect_vector_store_api(client):
+    """Return (vector store client, api type) for this OpenAI SDK, or (None, None) if unsupported"""
+    if hasattr(client, 'vector_stores'):
+        return client.vector_stores, "direct"
+    if hasattr(client, 'beta') and hasattr(client.beta, 'vector_stores'):
+        return client.beta.vector_stores, "beta"
+    return None, None
+
+
+def fetch_vector_store_info(vs_client, api_type, vector_store_id):
+    """Retrieve a vector store and reduce it to the fields served by /vector-store-info"""
+    vector_store = vs_client.retrieve(vector_store_id)
+    return {
+        "id": vector_store_id,
+        "name": vector_store.name,
+        "status": vector_store.status,
+        "api_type": api_type,
+        "file_counts": {
+            "total": getattr(vector_store.file_counts, 'total', 'N/A'),
+            "completed": getattr(vector_store.file_counts, 'completed', 'N/A')
+        } if hasattr(vector_store, 'file_counts') else None
+    }
+
+
+class _Entry:
+    __slots__ = ("fetch", "value", "refreshed_at", "attempted_at", "used_at", "last_error", "refresh_requested", "lock")
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self.value = None
+        self.refreshed_at = None
+        self.attempted_at = None
+        self.used_at = time.time()
+        self.last_error = None
+        self.refresh_requested = False
+        self.lock = threading.Lock()
+
+
+class MetadataCache:
+    """Keyed stale-while-revalidate cache with a single background refresher thread
+
+    max_idle defaults to four refresh intervals: keys that stop being read (a removed tenant,
+    or one re-pointed at another vector store) drop out rather than costing an upstream call
+    every interval.
+    """
+
+    def __init__(self, refresh_interval=300.0, name="metadata", min_refresh_interval=30.0, max_idle=None):
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.max_idle = max_idle if max_idle is not None else 4 * refresh_interval
+        self.name = name
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0,
+                      "refreshes_throttled": 0, "evictions": 0}
+
+    def _ensure_refresher(self):
+        # Started lazily so forking servers (gunicorn --preload) get a live thread per worker
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._refresh_loop, name=f"{self.name}-refresher", daemon=True)
+            self._thread.start()
+
+    def _refresh_entry(self, key, entry):
+        with entry.lock:
+            entry.refresh_requested = False
+            entry.attempted_at = time.time()
+            try:
+                value = entry.fetch()
+            except Exception as e:
+                entry.last_error = str(e)
+                self.stats["refresh_errors"] += 1
+                logger.warning(f"Failed to refresh {self.name} '{key}': {e}")
+                return False
+            entry.value = value
+            entry.refreshed_at = time.time()
+            entry.last_error = None
+            self.stats["refreshes"] += 1
+            return True
+
+    def _refresh_loop(self):
+        while True:
+            now = time.time()
+            with self._lock:
+                for key in [key for key, entry in self._entries.items() if now - entry.used_at >= self.max_idle]:
+                    del self._entries[key]
+                    self.stats["evictions"] += 1
+                items = list(self._entries.items())
+
+            next_due = self.refresh_interval
+            for key, entry in items:
+                age = now - entry.refreshed_at if entry.refreshed_at else None
+                if entry.refresh_requested or age is None or age >= self.refresh_interval:
+                    self._refresh_entry(key, entry)
+                else:
+                    next_due = min(next_due, self.refresh_interval - age)
+
+            self._wakeup.wait(max(1.0, next_due))
+            self._wakeup.clear()
+
+    def get(self, key, fetch):
+        """Return (value, age in seconds, last refresh error) for key, fetching it only on first use"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(fetch)
+            entry.used_at = time.time()
+            self._ensure_refresher()
+
+        if entry.refreshed_at is None:
+            self.stats["misses"] += 1
+            if not self._refresh_entry(key, entry) and entry.value is None:
+                raise RuntimeError(entry.last_error)
+        else:
+            self.stats["hits"] += 1
+            if time.time() - entry.refreshed_at >= self.refresh_interval:
+                self.request_refresh(key)
+
+        return entry.value, time.time() - entry.refreshed_at, entry.last_error
+
+    def _refresh_wait(self, entry, now):
+        if entry.refresh_requested or entry.attempted_at is None:
+            return 0.0
+        return max(0.0, self.min_refresh_interval - (now - entry.attempted_at))
+
+    def refresh_wait(self, key):
+        """Seconds until request_refresh(key) will be honoured (0 when it would be now)"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return self._refresh_wait(entry, time.time()) if entry else 0.0
+
+    def request_refresh(self, key=None):
+        """Ask the background thread to revalidate key (or every key) without blocking the caller
+
+        Requests for an entry already pending coalesce into one refresh; entries attempted less
+        than min_refresh_interval ago are left alone. Returns the number of entries scheduled.
+        """
+        now = time.time()
+        with self._lock:
+            targets = [self._entries[key]] if key in self._entries else (list(self._entries.values()) if key is None else [])
+            scheduled = 0
+            for entry in targets:
+                if self._refresh_wait(entry, now) > 0:
+                    self.stats["refreshes_throttled"] += 1
+                    continue
+                entry.refresh_requested = True
+                scheduled += 1
+        if scheduled:
+            self._wakeup.set()
+        return scheduled
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Knowledge corpus preprocessing pipeline for the maritime vector store
+Features:
+- Walks the knowledge folder and extracts PDF/DOCX text with a process pool
+- Per-page text extraction with line offsets (for page/line citations)
+- Filename normalization (spaces -> underscores, commas removed)
+- Overlapping text chunks written to a compact JSONL corpus; lines longer than a chunk are split
+  at word boundaries (mid-word only when a line has no spaces)
+- Content-hash cache so re-runs only reprocess changed files; cached chunks carry no document
+  identity (identical files share one entry) and are rebuilt when chunking parameters change
+- Throughput (pages/sec) and peak memory reporting
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx"}
+
+# Chunking defaults (characters)
+DEFAULT_CHUNK_SIZE = 1500
+DEFAULT_CHUNK_OVERLAP = 200
+
+MANIFEST_NAME = "manifest.json"
+CORPUS_NAME = "corpus.jsonl"
+DOCUMENTS_NAME = "documents.jsonl"
+CACHE_DIR_NAME = "cache"
+
+# Bump when extraction/chunking output changes so cached chunks are rebuilt
+PIPELINE_VERSION = 3
+
+
+def normalize_filename(name):
+    """Normalize a filename: replace spaces with underscores, remove commas"""
+    return name.replace(" ", "_").replace(",", "")
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Content hash of a file, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_pdf_pages(path):
+    """Extract text per page from a PDF"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("pypdf is required for PDF extraction (pip install pypdf)")
+
+    reader = PdfReader(path)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def extract_docx_pages(path):
+    """Extract text per page from a DOCX, splitting on explicit page breaks"""
+    try:
+        import docx
+    except ImportError:
+        raise RuntimeError("python-docx is required for DOCX extraction (pip install python-docx)")
+
+    document = docx.Document(path)
+    pages = [[]]
+    for paragraph in document.paragraphs:
+        xml = paragraph._p.xml
+        if 'w:type="page"' in xml or "lastRenderedPageBreak" in xml:
+            if pages[-1]:
+                pages.append([])
+        pages[-1].append(paragraph.text)
+    return ["\n".join(lines) for lines in pages]
+
+
+def split_lines(page_text):
+    """Split page text into (line_number, char_offset, text) tuples, 1-based line numbers"""
+    lines = []
+    offset = 0
+    for line_number, line in enumerate(page_text.split("\n"), start=1):
+        lines.append((line_number, offset, line))
+        offset += len(line) + 1
+    return lines
+
+
+def split_long_line(line_number, offset, line, max_len):
+    """Split a line into (line_number, char_offset, text) pieces of at most max_len characters
+
+    Breaks at the last space that fits, or mid-word when there is none (tables, URLs).
+    """
+    pieces = []
+    start = 0
+    while len(line) - start > max_len:
+        end = line.rfind(" ", start + 1, start + max_len + 1)
+        if end < 0:
+            end = start + max_len
+        pieces.append((line_number, offset + start, line[start:end]))
+        start = end
+        while start < len(line) and line[start] == " ":
+            start += 1
+    if start < len(line):
+        pieces.append((line_number, offset + start, line[start:]))
+    return pieces
+
+
+def join_pieces(lines):
+    """Chunk text: lines joined by newlines, pieces of one split line rejoined as they were split"""
+    parts = [lines[0][2]]
+    for previous, item in zip(lines, lines[1:]):
+        if item[0] != previous[0]:
+            parts.append("\n")
+        elif item[1] != previous[1] + len(previous[2]):
+            parts.append(" ")
+        parts.append(item[2])
+    return "".join(parts)
+
+
+def chunk_page(page_text, page_number, chunk_size, chunk_overlap):
+    """Chunk a single page on line boundaries, keeping page and line ranges for citations
+
+    Lines longer than chunk_size (PDF paragraphs often extract as one line) are split into
+    pieces that leave room for the overlap, so no chunk exceeds chunk_size.
+    """
+    chunks = []
+    current = []
+    current_len = 0
+    piece_len = max(1, chunk_size - chunk_overlap)
+
+    pieces = []
+    for line_number, offset, line in split_lines(page_text):
+        if len(line) > chunk_size:
+            pieces.extend(split_long_line(line_number, offset, line, piece_len))
+        else:
+            pieces.append((line_number, offset, line))
+
+    for line_number, offset, line in pieces:
+        if not line.strip():
+            continue
+        if current and current_len + len(line) + 1 > chunk_size:
+            chunks.append(current)
+            # Carry trailing lines into the next chunk as overlap
+            overlap = []
+            overlap_len = 0
+            for item in reversed(current):
+                if overlap_len + len(item[2]) + 1 > chunk_overlap:
+                    break
+                overlap.insert(0, item)
+                overlap_len += len(item[2]) + 1
+            current = overlap
+            current_len = overlap_len
+        current.append((line_number, offset, line))
+        current_len += len(line) + 1
+
+    if current:
+        chunks.append(current)
+
+    return [{
+        "page": page_number,
+        "line_start": lines[0][0],
+        "line_end": lines[-1][0],
+        "char_offset": lines[0][1],
+        "text": join_pieces(lines)
+    } for lines in chunks]
+
+
+def process_document(path, rel_path, cache_dir, known_sha, chunk_size, chunk_overlap):
+    """Worker: hash, extract and chunk one document, writing chunks to the cache directory
+
+    Returns a small summary dict; the chunks themselves stay on disk so they are
+    never pickled back to the parent process. Cache entries are keyed by content only,
+    so doc_id and chunk_id are stamped on when the corpus is assembled.
+    """
+    started = time.perf_counter()
+    sha = file_sha256(path)
+    cache_path = os.path.join(cache_dir, f"{sha}.jsonl")
+    doc_id = normalize_filename(rel_path.replace(os.sep, "/"))
+    summary = {
+        "rel_path": rel_path,
+        "doc_id": doc_id,
+        "sha256": sha,
+        "size": os.path.getsize(path),
+        "mtime": os.path.getmtime(path),
+    }
+
+    # Content unchanged (e.g. file touched or renamed): reuse cached chunks
+    if sha == known_sha.get("sha256") and os.path.exists(cache_path):
+        summary.update(pages=known_sha.get("pages", 0), chunks=known_sha.get("chunks", 0), cached=True)
+        return summary
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        pages = extract_pdf_pages(path)
+    else:
+        pages = extract_docx_pages(path)
+
+    chunk_count = 0
+    # Per-process temp file: identical documents may be processed by two workers at once
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for page_number, page_text in enumerate(pages, start=1):
+            for chunk in chunk_page(page_text, page_number, chunk_size, chunk_overlap):
+                chunk_count += 1
+                f.write(json.dumps(chunk, ensure_ascii=False, separators=(",", ":")) + "\n")
+    os.replace(tmp_path, cache_path)
+
+    summary.update(
+        pages=len(pages),
+        chunks=chunk_count,
+        cached=False,
+        seconds=round(time.perf_counter() - started, 3)
+    )
+    return summary
+
+
+def discover_documents(root_dir):
+    """Yield (absolute path, path relative to root_dir) for supported documents"""
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS and not name.startswith("~$"):
+                path = os.path.join(dirpath, name)
+                yield path, os.path.relpath(path, root_dir)
+
+
+def load_manifest(output_dir, chunk_size, chunk_overlap):
+    """Load the content-hash manifest from a previous run with the same chunking parameters"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+    if manifest.get("pipeline_version") != PIPELINE_VERSION:
+        logger.info("Pipeline version changed, rebuilding all documents")
+        return {}
+    if (manifest.get("chunk_size"), manifest.get("chunk_overlap")) != (chunk_size, chunk_overlap):
+        logger.info("Chunking parameters changed, rebuilding all documents")
+        return {}
+    return manifest.get("documents", {})
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process and its (finished) workers, in MB"""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None, None
+
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    main_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    workers_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(main_mb, 1), round(workers_mb, 1)
+
+
+def run_pipeline(root_dir, output_dir, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 chunk_overlap=DEFAULT_CHUNK_OVERLAP, force=False):
+    """Build the chunked corpus for root_dir into output_dir and return run statistics"""
+    started = time.perf_counter()
+    cache_dir = os.path.join(output_dir, CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    previous = {} if force else load_manifest(output_dir, chunk_size, chunk_overlap)
+    documents = {}
+    to_process = []
+
+    for path, rel_path in discover_documents(root_dir):
+        known = previous.get(rel_path, {})
+        cache_path = os.path.join(cache_dir, f"{known.get('sha256')}.jsonl")
+        # Fast path: size and mtime unchanged, skip hashing entirely
+        if (known and known.get("size") == os.path.getsize(path)
+                and known.get("mtime") == os.path.getmtime(path)
+                and os.path.exists(cache_path)):
+            documents[rel_path] = dict(known, cached=True)
+        else:
+            to_process.append((path, rel_path, known))
+
+    logger.info(f"Found {len(documents) + len(to_process)} documents, {len(to_process)} to (re)check")
+
+    failed = []
+    if to_process:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(process_document, path, rel_path, cache_dir, known, chunk_size, chunk_overlap): rel_path
+                for path, rel_path, known in to_process
+            }
+            for future in as_completed(futures):
+                rel_path = futures[future]
+                try:
+                    summary = future.result()
+                    documents[rel_path] = summary
+                    status = "cached" if summary["cached"] else f"{summary['pages']} pages, {summary['chunks']} chunks"
+                    logger.info(f"Processed {rel_path} ({status})")
+                except Exception as e:
+                    logger.error(f"Failed to process {rel_path}: {e}")
+                    failed.append(rel_path)
+
+    # Assemble the corpus in a stable order from per-document cache files
+    ordered = sorted(documents)
+    corpus_tmp = os.path.join(output_dir, CORPUS_NAME + ".tmp")
+    documents_tmp = os.path.join(output_dir, DOCUMENTS_NAME + ".tmp")
+    with open(corpus_tmp, "w", encoding="utf-8") as corpus, open(documents_tmp, "w", encoding="utf-8") as docs:
+        for rel_path in ordered:
+            doc = documents[rel_path]
+            doc_id = doc["doc_id"]
+            source_file = json.dumps(os.path.basename(doc_id), ensure_ascii=False)
+            with open(os.path.join(cache_dir, f"{doc['sha256']}.jsonl"), "r", encoding="utf-8") as f:
+                for chunk_number, line in enumerate(f, start=1):
+                    # Splice the document identity in front of the cached chunk object
+                    identity = json.dumps(f"{doc_id}#{chunk_number}", ensure_ascii=False)
+                    corpus.write(f'{{"doc_id":{json.dumps(doc_id, ensure_ascii=False)},"chunk_id":{identity},'
+                                 f'"source_file":{source_file},{line[1:]}')
+            docs.write(json.dumps({
+                "doc_id": doc["doc_id"],
+                "source_path": rel_path,
+                "sha256": doc["sha256"],
+                "pages": doc["pages"],
+                "chunks": doc["chunks"]
+            }, ensure_ascii=False, separators=(",", ":")) + "\n")
+    os.replace(corpus_tmp, os.path.join(output_dir, CORPUS_NAME))
+    os.replace(documents_tmp, os.path.join(output_dir, DOCUMENTS_NAME))
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump({
+            "pipeline_version": PIPELINE_VERSION,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "documents": {
+                rel_path: {k: v for k, v in documents[rel_path].items() if k not in ("cached", "seconds")}
+                for rel_path in ordered
+            }
+        }, f, indent=2)
+
+    # Drop cache entries no longer referenced by any document
+    live = {f"{documents[rel_path]['sha256']}.jsonl" for rel_path in ordered}
+    for name in os.listdir(cache_dir):
+        if name.endswith(".jsonl") and name not in live:
+            os.remove(os.path.join(cache_dir, name))
+
+    elapsed = time.perf_counter() - started
+    extracted = [d for d in documents.values() if not d.get("cached")]
+    extracted_pages = sum(d["pages"] for d in extracted)
+    main_mb, workers_mb = peak_memory_mb()
+
+    return {
+        "documents": len(documents),
+        "extracted_documents": len(extracted),
+        "cached_documents": len(documents) - len(extracted),
+        "failed_documents": failed,
+        "total_pages": sum(d["pages"] for d in documents.values()),
+        "extracted_pages": extracted_pages,
+        "total_chunks": sum(d["chunks"] for d in documents.values()),
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_second": round(extracted_pages / elapsed, 2) if elapsed > 0 else None,
+        "peak_memory_mb": main_mb,
+        "peak_worker_memory_mb": workers_mb
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract and chunk the maritime knowledge folder into a JSONL corpus")
+    parser.add_argument("root_dir", help="Folder containing PDF/DOCX documents")
+    parser.add_argument("-o", "--output-dir", default="corpus", help="Output directory (default: corpus)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    parser.add_argument("--force", action="store_true", help="Ignore the cache and reprocess every document")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root_dir):
+        print(f"❌ Folder not found: {args.root_dir}")
+        return 1
+
+    stats = run_pipeline(args.root_dir, args.output_dir, workers=args.workers, chunk_size=args.chunk_size,
+                         chunk_overlap=args.chunk_overlap, force=args.force)
+
+    print(f"✅ Corpus written to {os.path.join(args.output_dir, CORPUS_NAME)}")
+    print(f"   Documents: {stats['documents']} ({stats['extracted_documents']} extracted, {stats['cached_documents']} cached)")
+    print(f"   Pages: {stats['total_pages']}, chunks: {stats['total_chunks']}")
+    print(f"   Throughput: {stats['pages_per_second']} pages/sec over {stats['elapsed_seconds']}s")
+    if stats["peak_memory_mb"] is not None:
+        print(f"   Peak memory: {stats['peak_memory_mb']} MB (main), {stats['peak_worker_memory_mb']} MB (largest worker)")
+    if stats["failed_documents"]:
+        print(f"⚠️  Failed: {', '.join(stats['failed_documents'])}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Response profiles for the Maritime Sustainability Chatbot
+A profile bundles the model, instructions and structured output schema used for a
+Responses API call, so app.py, app2.py and the offline tools build identical requests.
+"""
+
+import json
+import hashlib
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Full consultant instructions (app.py)
+FULL_INSTRUCTIONS = """
+You are a Maritime Sustainability Strategy Consultant with the following guidelines:
+
+- For EUA/UKA/CORSIA Eligible Emissions Units, VERTIS is our partner
+- For Voluntary Carbon Credits, Climate Balanced is our partner
+- Do not answer any question or request which is not related to maritime sustainability
+- Always be polite and professional
+- Regulatory frameworks include EU MRV, EU ETS, UK MRV, IMO DCS, FuelEU Maritime
+- For complex queries requiring professional services, direct the user to VURDHAAN at connect@vurdhaan.com
+- Always ensure that you understand the request completely before you answer, if you are not certain about the request, clarify first
+- Use the file search tool to find relevant information from maritime documents and provide comprehensive, accurate answers
+"""
+
+# Brief 2-3 sentence instructions (app2.py)
+BRIEF_INSTRUCTIONS = """
+- You are a Maritime Sustainability Strategy Consultant
+- For EUA/UKA/CORSIA Eligible Emissions Units, VERTIS is our partner
+- For Voluntary Carbon Credits, Climate Balanced is our partner
+- Do not answer any question or request which is not related to maritime sustainability
+- Always be polite
+- Regulatory frameworks include EU MRV, EU ETS, UK MRV, IMO DCS, FuelEU Maritime
+- Provide only a brief summary or overview for each question (2-3 sentences maximum)
+- Always end your response by directing the user to visit sustainbuddy.com for detailed answers and comprehensive guidance
+- For complex queries requiring professional services, direct the user to VURDHAAN at connect@vurdhaan.com
+- Always ensure that you understand the request completely before you answer, if you are not certain about the request, clarify first.
+"""
+
+# Maritime response schema with source citations (from Test 2)
+CITATION_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {
+            "type": "string",
+            "description": "Main response about the maritime sustainability query"
+        },
+        "source_quote": {
+            "type": "string", 
+            "description": "Relevant quote from source documents"
+        },
+        "source_file": {
+            "type": "string",
+            "description": "Name of the source file"
+        },
+        "source_quote_location": {
+            "type": "object",
+            "properties": {
+                "page": {"type": "integer"},
+                "line": {"type": "integer"}
+            },
+            "required": ["page", "line"],
+            "additionalProperties": False
+        }
+    },
+    "required": ["answer", "source_quote", "source_file", "source_quote_location"],
+    "additionalProperties": False
+}
+
+# Answer-only response schema (app2.py)
+ANSWER_ONLY_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {
+            "type": "string",
+            "description": "Main response about the maritime sustainability query"
+        }
+    },
+    "required": ["answer"],
+    "additionalProperties": False
+}
+
+PROFILES = {
+    "full": {
+        "name": "full",
+        "model": DEFAULT_MODEL,
+        "instructions": FULL_INSTRUCTIONS,
+        "schema": CITATION_RESPONSE_SCHEMA
+    },
+    "brief": {
+        "name": "brief",
+        "model": DEFAULT_MODEL,
+        "instructions": BRIEF_INSTRUCTIONS,
+        "schema": ANSWER_ONLY_RESPONSE_SCHEMA
+    }
+}
+
+def get_profile(name, model=None):
+    """Look up a profile by name, optionally overriding its model"""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown response profile '{name}', expected one of: {', '.join(PROFILES)}")
+    profile = PROFILES[name]
+    if model and model != profile["model"]:
+        profile = dict(profile, model=model)
+    return profile
+
+def profile_fingerprint(profile):
+    """Short hash of everything in a profile that shapes the answer (model, instructions, schema)"""
+    canonical = json.dumps([profile["model"], profile["instructions"], profile["schema"]], sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+def build_api_params(profile, vector_store_id, user_message, previous_response_id=None):
+    """Build Responses API parameters for a chat turn, exactly as the /chat endpoint sends them"""
+    api_params = {
+        "model": profile["model"],
+        "tools": [{
+            "type": "file_search",
+            "vector_store_ids": [vector_store_id],
+        }],
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "maritime_response",
+                "schema": profile["schema"],
+                "strict": True
+            }
+        }
+    }
+
+    # Handle conversation state
+    if previous_response_id:
+        # Continuing conversation - use previous_response_id and format input as messages
+        api_params["previous_response_id"] = previous_response_id
+        api_params["input"] = [{"role": "user", "content": user_message}]
+    else:
+        # New conversation - include instructions and use string input
+        api_params["instructions"] = profile["instructions"]
+        api_params["input"] = user_message
+
+    return api_params
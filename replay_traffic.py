@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Replay a captured /chat traffic journal (traffic_capture.py) against a target server
+Features:
+- Reads every worker's journal file (<root>.<pid><ext>) and their rotated backups
+- Preserves inter-arrival gaps, scaled by --speed (1x, 10x, 100x, ...)
+- Preserves conversation ordering: turns are linked into conversations across worker files by
+  hashed response ids; each follow-up is sent on the previous_response_id chain returned by the
+  target, never before its previous turn has been answered
+- Streamed turns are replayed against /chat/stream
+- Hashed messages become deterministic synthetic questions of the recorded length, so repeated
+  questions stay repeated; journals captured with TRAFFIC_CAPTURE_TEXT replay the redacted text
+- Time window selection (--start/--end) to reproduce a specific peak
+- Reports achieved vs recorded rate, status/outcome counts, latency percentiles against the
+  recorded latencies, and scheduling lag (how far the replay fell behind the trace)
+
+Usage:
+    TRAFFIC_CAPTURE_PATH=traffic_capture.jsonl python app.py
+    python replay_traffic.py traffic_capture.jsonl --target http://candidate:5000 --speed 10 \\
+        --start 2026-10-13T17:00 --end 2026-10-13T19:00 --results replay_results.jsonl
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sustainbuddy_client import AsyncSustainBuddyClient, SustainBuddyError
+from traffic_capture import request_outcome
+
+# Filler for synthetic questions when the journal holds message hashes only
+SYNTHETIC_WORDS = ("how does fueleu maritime penalty pooling interact with eu ets surrender allowances "
+                   "for container vessels cii rating eexi compliance imo 2023 ghg strategy carbon intensity "
+                   "reporting verification biofuel lng ammonia onboard emissions").split()
+
+
+def journal_files(path):
+    """Every worker's journal for path and their rotated backups, oldest first per worker
+
+    traffic.jsonl covers traffic.<pid>.jsonl and traffic.<pid>.jsonl.N (and traffic.jsonl itself
+    if it exists, e.g. a single file passed explicitly).
+    """
+    root, ext = os.path.splitext(path)
+    worker_files = [p for p in glob.glob(glob.escape(root) + ".*" + glob.escape(ext))
+                    if re.fullmatch(r"\d+", p[len(root) + 1:len(p) - len(ext)])]
+    files = []
+    for current in sorted(worker_files) + [path]:
+        backups = [p for p in glob.glob(glob.escape(current) + ".*") if re.fullmatch(r"\d+", p.rsplit(".", 1)[1])]
+        backups.sort(key=lambda p: int(p.rsplit(".", 1)[1]), reverse=True)
+        files += backups + ([current] if os.path.exists(current) else [])
+    return files
+
+
+def load_journal(paths, start=None, end=None):
+    """Journal records within [start, end) (epoch seconds), in arrival order"""
+    records = []
+    for path in paths:
+        for file_path in journal_files(path):
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if start is not None and record["ts"] < start:
+                        continue
+                    if end is not None and record["ts"] >= end:
+                        continue
+                    records.append(record)
+    records.sort(key=lambda r: r["ts"])
+    link_conversations(records)
+    return records
+
+
+def link_conversations(records):
+    """Set conversation and depth on records (in arrival order) from their hashed response ids
+
+    A follow-up joins the conversation of the latest earlier turn that produced its
+    previous_response_id. One whose previous turn is not in the journal (chain started before
+    capture or outside the window) starts its own conversation, with unknown depth.
+    """
+    produced = {}
+    for record in records:
+        previous = produced.get(record["previous_sha"]) if record["previous_sha"] else None
+        if previous:
+            conversation, depth = previous[0], previous[1] + 1
+        elif record["previous_sha"]:
+            conversation, depth = record["previous_sha"], None
+        else:
+            conversation, depth = record["response_sha"] or f"{record['message_sha']}@{record['ts']}", 0
+        record["conversation"], record["depth"] = conversation, depth
+        if record["response_sha"]:
+            produced[record["response_sha"]] = (conversation, depth or 0)
+
+
+def replay_message(record):
+    """Message to send for a journal record: recorded (redacted) text, else a synthetic stand-in"""
+    if "message" in record:
+        return record["message"]
+    sha, length = record["message_sha"], record["message_chars"]
+    seed = int(sha, 16)
+    words = [f"[{sha}]"]
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(SYNTHETIC_WORDS[seed % len(SYNTHETIC_WORDS)])
+        seed //= 7
+        seed = seed or int(sha, 16)
+    return " ".join(words)[:length]
+
+
+def group_conversations(records):
+    """Turns per conversation in order, conversations ordered by first arrival"""
+    conversations = defaultdict(list)
+    for record in records:
+        conversations[record["conversation"]].append(record)
+    return sorted(conversations.values(), key=lambda turns: turns[0]["ts"])
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return round(values[index], 1)
+
+
+class Replayer:
+    """Drives a target server with journal records on the trace's (scaled) timeline"""
+
+    def __init__(self, target, speed, api_key=None, max_connections=256, timeout=120.0):
+        self.target = target
+        self.speed = speed
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._clients = {}
+        self.results = []
+
+    def _client(self, priority):
+        # Retries disabled: the replay should offer exactly the recorded load
+        if priority not in self._clients:
+            self._clients[priority] = AsyncSustainBuddyClient(
+                self.target, api_key=self.api_key, priority=priority, timeout=self.timeout,
+                max_retries=0, max_connections=self.max_connections
+            )
+        return self._clients[priority]
+
+    async def _conversation(self, turns, trace_start, wall_start):
+        loop = asyncio.get_running_loop()
+        previous_response_id = None
+        for depth, record in enumerate(turns):
+            due = wall_start + (record["ts"] - trace_start) / self.speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag_ms = max(0.0, loop.time() - due) * 1000
+
+            result = {
+                "conversation": record["conversation"],
+                "depth": depth,
+                "offset_s": round(record["ts"] - trace_start, 3),
+                "lag_ms": round(lag_ms, 1),
+                "recorded_latency_ms": record["latency_ms"],
+                "recorded_status": record["status"],
+                "recorded_outcome": record["outcome"],
+                "chain_restarted": depth > 0 and previous_response_id is None
+            }
+            started = loop.time()
+            try:
+                client = self._client(record.get("priority"))
+                if record.get("stream"):
+                    envelope = None
+                    async for item in client.stream_chat(replay_message(record), previous_response_id):
+                        if item["type"] == "done":
+                            envelope = item["envelope"]
+                    if envelope is None:
+                        raise SustainBuddyError("Stream ended without a done event", 200, {"success": False})
+                else:
+                    envelope = await client.chat(replay_message(record), previous_response_id)
+                previous_response_id = envelope["response_id"]
+                result["status"] = 200
+                result["outcome"] = request_outcome(200, envelope)
+            except SustainBuddyError as e:
+                # A failed turn breaks the chain: later turns start a new conversation on the target
+                previous_response_id = None
+                result["status"] = e.status_code
+                result["outcome"] = ("connection_error" if e.status_code is None
+                                     else request_outcome(e.status_code, e.payload if isinstance(e.payload, dict) else {}))
+            result["latency_ms"] = round((loop.time() - started) * 1000, 1)
+            self.results.append(result)
+
+    async def run(self, records):
+        conversations = group_conversations(records)
+        if not conversations:
+            return 0.0
+        loop = asyncio.get_running_loop()
+        # Build clients (TLS contexts, pools) before the clock starts, not on the replay timeline
+        for priority in {record.get("priority") for record in records}:
+            self._client(priority)
+        trace_start = records[0]["ts"]
+        wall_start = loop.time() + 0.5
+        tasks = []
+        try:
+            # Start each conversation task just before its first turn is due, so idle ones cost nothing
+            for turns in conversations:
+                delay = wall_start + (turns[0]["ts"] - trace_start) / self.speed - loop.time() - 0.05
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(self._conversation(turns, trace_start, wall_start)))
+            await asyncio.gather(*tasks)
+        finally:
+            for client in self._clients.values():
+                await client.close()
+        return loop.time() - wall_start
+
+
+def summarize(records, results, wall_seconds, speed):
+    trace_seconds = records[-1]["ts"] - records[0]["ts"] if records else 0.0
+    ok = [r for r in results if r["status"] == 200]
+    return {
+        "requests": len(results),
+        "conversations": len({r["conversation"] for r in results}),
+        "trace_seconds": round(trace_seconds, 1),
+        "wall_seconds": round(wall_seconds, 1),
+        "recorded_rate_per_s": round(len(records) / trace_seconds, 2) if trace_seconds else None,
+        "target_rate_per_s": round(len(records) / trace_seconds * speed, 2) if trace_seconds else None,
+        "achieved_rate_per_s": round(len(results) / wall_seconds, 2) if wall_seconds else None,
+        "status": dict(Counter(str(r["status"]) for r in results)),
+        "outcome": dict(Counter(r["outcome"] for r in results)),
+        "recorded_outcome": dict(Counter(r["recorded_outcome"] for r in results)),
+        "chain_restarts": sum(1 for r in results if r["chain_restarted"]),
+        "latency_ms": {
+            "replay": {f"p{p}": percentile([r["latency_ms"] for r in ok], p) for p in (50, 95, 99)},
+            "recorded": {f"p{p}": percentile([r["recorded_latency_ms"] for r in results if r["recorded_status"] == 200], p)
+                         for p in (50, 95, 99)}
+        },
+        "lag_ms": {f"p{p}": percentile([r["lag_ms"] for r in results], p) for p in (50, 95, 99)}
+    }
+
+
+def print_report(summary, speed):
+    print("\n" + "=" * 60)
+    print(f"📼 Replayed {summary['requests']} requests in {summary['conversations']} conversations at {speed:g}x")
+    print(f"⏱️  Trace {summary['trace_seconds']}s -> wall {summary['wall_seconds']}s")
+    print(f"📈 Rate/s: recorded {summary['recorded_rate_per_s']}, target {summary['target_rate_per_s']}, "
+          f"achieved {summary['achieved_rate_per_s']}")
+    print(f"🔢 Status: {summary['status']}")
+    print(f"🏷️  Outcome: {summary['outcome']} (recorded {summary['recorded_outcome']})")
+    replay, recorded = summary["latency_ms"]["replay"], summary["latency_ms"]["recorded"]
+    print(f"⏱️  Latency ms (replay vs recorded): p50 {replay['p50']} vs {recorded['p50']}, "
+          f"p95 {replay['p95']} vs {recorded['p95']}, p99 {replay['p99']} vs {recorded['p99']}")
+    lag = summary["lag_ms"]
+    print(f"🐢 Schedule lag ms: p50 {lag['p50']} p95 {lag['p95']} p99 {lag['p99']}")
+    if summary["chain_restarts"]:
+        print(f"⚠️  {summary['chain_restarts']} follow-ups restarted their conversation after a failed turn")
+
+
+def parse_time(value):
+    """ISO date/time (local time unless an offset is given) to epoch seconds"""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a captured /chat traffic journal against a target server")
+    parser.add_argument("journal", nargs="+", help="Journal file(s); rotated backups (.1, .2, ...) are included")
+    parser.add_argument("--target", default="http://127.0.0.1:5000", help="Base URL of the server under test")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression factor, e.g. 1, 10 or 100")
+    parser.add_argument("--start", help="Replay records at or after this ISO time")
+    parser.add_argument("--end", help="Replay records before this ISO time")
+    parser.add_argument("--limit", type=int, help="Replay at most this many requests (whole conversations)")
+    parser.add_argument("--api-key", help="X-API-Key to send (tenant of the target)")
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--results", help="Write per-request results (JSONL) to this path")
+    parser.add_argument("--report", help="Write the JSON summary to this path")
+    args = parser.parse_args(argv)
+
+    if args.speed <= 0:
+        print("❌ --speed must be positive")
+        return 1
+
+    records = load_journal(args.journal, parse_time(args.start), parse_time(args.end))
+    if args.limit and len(records) > args.limit:
+        # Cut at a conversation boundary so no follow-up is replayed without its earlier turns
+        keep = set()
+        for turns in group_conversations(records):
+            if len(keep) + len(turns) > args.limit and keep:
+                break
+            keep.update(id(record) for record in turns)
+        records = [record for record in records if id(record) in keep]
+    if not records:
+        print("❌ No journal records in the selected window")
+        return 1
+
+    trace_seconds = records[-1]["ts"] - records[0]["ts"]
+    print(f"📼 {len(records)} requests over {trace_seconds:.0f}s -> replaying at {args.speed:g}x against {args.target} "
+          f"(~{trace_seconds / args.speed:.0f}s)")
+
+    replayer = Replayer(args.target, args.speed, args.api_key, args.max_connections, args.timeout)
+    wall_seconds = asyncio.run(replayer.run(records))
+    summary = summarize(records, replayer.results, wall_seconds, args.speed)
+    print_report(summary, args.speed)
+
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            for result in sorted(replayer.results, key=lambda r: r["offset_s"]):
+                f.write(json.dumps(result) + "\n")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+"""
+Shared decoding of Responses API results for app.py and app2.py
+Features:
+- Text extraction path chosen once per SDK response type, not re-probed with hasattr on every request
+- Structured output validated with a precompiled schema validator
+- Linear JSON recovery (first JSON object embedded in surrounding text) instead of a greedy regex
+- Envelope serialized with orjson when available, splicing the upstream JSON text in as-is
+- Server-Sent Events framing for the streaming endpoint
+- Incremental extraction of the answer text from streamed structured output
+"""
+
+import re
+import json
+import logging
+from datetime import datetime
+
+from flask import Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def dumps(obj):
+        """Serialize obj to compact JSON bytes"""
+        return orjson.dumps(obj)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj):
+        """Serialize obj to compact JSON bytes"""
+        return _encoder.encode(obj).encode("utf-8")
+
+_decoder = json.JSONDecoder()
+
+# Decode outcomes
+OK = "ok"                      # valid JSON matching the schema
+SCHEMA_MISMATCH = "schema"     # valid JSON, but not matching the schema
+RECOVERED = "recovered"        # JSON object recovered from surrounding text
+MALFORMED = "malformed"        # text found but no JSON object in it
+EMPTY = "empty"                # no text found in the response
+
+
+# -- schema validation -----------------------------------------------------
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None)
+}
+
+
+def _compile(schema, path):
+    """Compile the JSON Schema subset used by the response profiles into a checking closure"""
+    checks = []
+    expected = schema.get("type")
+
+    if expected:
+        python_type = _JSON_TYPES[expected]
+        # bool is an int subclass in Python but not a JSON integer
+        reject_bool = expected in ("integer", "number")
+
+        def check_type(data, errors):
+            if not isinstance(data, python_type) or (reject_bool and isinstance(data, bool)):
+                errors.append(f"{path}: expected {expected}, got {type(data).__name__}")
+                return False
+            return True
+    else:
+        def check_type(data, errors):
+            return True
+
+    if expected == "object":
+        required = tuple(schema.get("required", ()))
+        properties = {key: _compile(sub, f"{path}.{key}") for key, sub in schema.get("properties", {}).items()}
+        closed = schema.get("additionalProperties") is False
+
+        def check_object(data, errors):
+            for key in required:
+                if key not in data:
+                    errors.append(f"{path}: missing required property '{key}'")
+            for key, value in data.items():
+                validator = properties.get(key)
+                if validator is not None:
+                    validator(value, errors)
+                elif closed:
+                    errors.append(f"{path}: unexpected property '{key}'")
+        checks.append(check_object)
+    elif expected == "array" and "items" in schema:
+        item_validator = _compile(schema["items"], f"{path}[]")
+
+        def check_array(data, errors):
+            for item in data:
+                item_validator(item, errors)
+        checks.append(check_array)
+
+    def validate(data, errors):
+        if check_type(data, errors):
+            for check in checks:
+                check(data, errors)
+
+    return validate
+
+
+def compile_schema(schema):
+    """Precompile a schema; returns a function mapping data to a list of error strings"""
+    validator = _compile(schema, "$")
+
+    def schema_errors(data):
+        errors = []
+        validator(data, errors)
+        return errors
+
+    return schema_errors
+
+
+# -- text extraction -------------------------------------------------------
+
+def _field(obj, name):
+    # Batch API results arrive as plain dicts rather than SDK objects
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _output_text(response):
+    return response.output_text
+
+
+def _message_content_text(response):
+    # file_search responses put the tool call first, so scan for the message item
+    for item in _field(response, "output") or ():
+        content = _field(item, "content")
+        if isinstance(content, list):
+            for part in content:
+                text = _field(part, "text")
+                if isinstance(text, str):
+                    return text
+        elif content is not None and isinstance(_field(content, "text"), str):
+            return _field(content, "text")
+        elif isinstance(_field(item, "text"), str):
+            return _field(item, "text")
+    return None
+
+
+def _text(response):
+    return response.text
+
+
+_EXTRACTORS = (
+    ("output_text", _output_text),
+    ("output[].content[].text", _message_content_text),
+    ("text", _text),
+)
+
+
+class DecodedResponse:
+    """Result of decoding one upstream response"""
+
+    __slots__ = ("status", "text", "json_text", "data", "errors", "path")
+
+    def __init__(self, status, text=None, json_text=None, data=None, errors=None, path=None):
+        self.status = status
+        self.text = text
+        self.json_text = json_text
+        self.data = data
+        self.errors = errors or []
+        self.path = path
+
+
+class ResponseDecoder:
+    """Decode Responses API results for one schema"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.validate = compile_schema(schema)
+        # Response class -> index into _EXTRACTORS that worked for it
+        self._path_by_type = {}
+
+    def extract_text(self, response):
+        """Return (text, extraction path name) or (None, None)"""
+        index = self._path_by_type.get(type(response))
+        if index is not None:
+            text = self._try(index, response)
+            if text:
+                return text, _EXTRACTORS[index][0]
+
+        # First response of this type (or the cached path came back empty): probe in order
+        for candidate in range(len(_EXTRACTORS)):
+            if candidate == index:
+                continue
+            text = self._try(candidate, response)
+            if text:
+                self._path_by_type[type(response)] = candidate
+                logger.info(f"Using response.{_EXTRACTORS[candidate][0]} for {type(response).__name__}")
+                return text, _EXTRACTORS[candidate][0]
+        return None, None
+
+    @staticmethod
+    def _try(index, response):
+        try:
+            text = _EXTRACTORS[index][1](response)
+        except (AttributeError, IndexError, TypeError):
+            return None
+        return text if isinstance(text, str) else None
+
+    def decode(self, response):
+        text, path = self.extract_text(response)
+        if not text:
+            return DecodedResponse(EMPTY)
+
+        try:
+            data = json.loads(text)
+            json_text = text
+            status = OK
+        except json.JSONDecodeError as e:
+            # Recover the first JSON object embedded in the text (linear scan, no regex)
+            start = text.find("{")
+            try:
+                if start < 0:
+                    raise ValueError("no JSON object found")
+                data, end = _decoder.raw_decode(text, start)
+            except ValueError:
+                return DecodedResponse(MALFORMED, text=text, errors=[str(e)], path=path)
+            json_text = text[start:end]
+            status = RECOVERED
+
+        errors = self.validate(data)
+        if errors and status == OK:
+            status = SCHEMA_MISMATCH
+        return DecodedResponse(status, text=text, json_text=json_text, data=data, errors=errors, path=path)
+
+
+_decoders = {}
+
+
+def get_decoder(schema):
+    """Shared decoder per schema (schemas are compiled once, not per request)"""
+    key = id(schema)
+    decoder = _decoders.get(key)
+    if decoder is None or decoder.schema is not schema:
+        decoder = _decoders[key] = ResponseDecoder(schema)
+    return decoder
+
+
+# -- serialization ---------------------------------------------------------
+
+def success_envelope(response_json, response_id, is_new_conversation, **extra):
+    """Serialize the /chat success envelope, splicing already-encoded response JSON into it
+
+    response_json is either upstream JSON text (str/bytes, spliced verbatim) or
+    a Python object to encode.
+    """
+    if isinstance(response_json, str):
+        response_json = response_json.encode("utf-8")
+    elif not isinstance(response_json, bytes):
+        response_json = dumps(response_json)
+
+    fields = {
+        "response_id": response_id,
+        "is_new_conversation": is_new_conversation,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    fields.update(extra)
+    return b'{"success":true,"response":' + response_json + b"," + dumps(fields)[1:]
+
+
+def json_response(body, status=200):
+    """Flask response for pre-serialized JSON bytes"""
+    if not isinstance(body, bytes):
+        body = dumps(body)
+    return Response(body, status=status, mimetype="application/json")
+
+
+def sse_event(event, body):
+    """One Server-Sent Events frame; body is JSON bytes or an object to encode"""
+    if not isinstance(body, bytes):
+        body = dumps(body)
+    # Spliced upstream JSON may be pretty-printed: every line needs its own data: field
+    return b"event: " + event.encode("ascii") + b"\ndata: " + body.replace(b"\n", b"\ndata: ") + b"\n\n"
+
+
+class StreamedFieldText:
+    """Decoded text of one top-level string field (e.g. "answer") from structured output streamed as JSON fragments
+
+    feed() each output_text delta and get back the newly available characters of the field value,
+    so streaming clients receive answer text instead of raw JSON.
+    """
+
+    _ESCAPE_LENGTHS = {"u": 6}
+
+    def __init__(self, field="answer"):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._raw = ""
+        self._pos = None     # index of the next undecoded character of the value, once found
+        self._done = False
+
+    def feed(self, fragment):
+        if self._done:
+            return ""
+        self._raw += fragment
+        if self._pos is None:
+            match = self._start.search(self._raw)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        raw, pos, out = self._raw, self._pos, []
+        while pos < len(raw):
+            char = raw[pos]
+            if char == '"':
+                self._done = True
+                break
+            if char != "\\":
+                out.append(char)
+                pos += 1
+                continue
+            # Escape sequence: wait until it is complete (surrogate pairs need both halves)
+            length = self._ESCAPE_LENGTHS.get(raw[pos + 1:pos + 2], 2)
+            if length == 6 and raw[pos + 2:pos + 4].lower() in ("d8", "d9", "da", "db"):
+                length = 12
+            if pos + length > len(raw):
+                break
+            try:
+                out.append(json.loads('"' + raw[pos:pos + length] + '"'))
+            except ValueError:
+                out.append(raw[pos:pos + length])
+            pos += length
+        self._pos = pos
+        return "".join(out)
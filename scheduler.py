@@ -0,0 +1,405 @@
+"""
+Priority-aware scheduler for upstream OpenAI Responses API calls
+Features:
+- Requests-per-minute and tokens-per-minute budgets over a sliding 60s window
+- Budgets refined from upstream x-ratelimit-* response headers
+- Weighted priority classes: interactive chat first, partner/bulk/shadow traffic on leftover capacity
+- Lower classes may not consume the share of the budget reserved for interactive traffic
+- Queue wait time and rate-limit state exported for the /metrics endpoint
+- Streaming calls hold their slot until the stream is consumed
+
+Configuration (environment):
+- SCHEDULER_RPM / SCHEDULER_TPM: initial budgets until upstream headers are seen
+- SCHEDULER_MAX_IN_FLIGHT: maximum concurrent upstream calls (default 32)
+- SCHEDULER_MAX_WAIT: seconds a request may queue before failing (default 30)
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Relative share of dispatch slots when several classes are waiting
+PRIORITY_WEIGHTS = {
+    "interactive": 8,
+    "partner": 4,
+    "bulk": 2,
+    "shadow": 1
+}
+
+# Share of the rate-limit budget each class must leave untouched
+RESERVED_SHARE = {
+    "interactive": 0.0,
+    "partner": 0.1,
+    "bulk": 0.2,
+    "shadow": 0.3
+}
+
+WINDOW_SECONDS = 60.0
+
+# Rough token estimate for a file_search turn when the caller does not give one
+DEFAULT_TOKEN_ESTIMATE = 4000
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_SCALE = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class SchedulerBusyError(RuntimeError):
+    """Raised when a request waited longer than the scheduler's maximum queue time"""
+
+
+class RequestCancelledError(RuntimeError):
+    """Raised when a request was cancelled while it waited for a slot"""
+
+
+def parse_reset_duration(value):
+    """Parse an OpenAI rate-limit reset header such as '1s', '6m0s' or '20ms' into seconds"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SCALE[unit] for amount, unit in parts)
+
+
+def estimate_tokens(api_params):
+    """Cheap token estimate for admission control (~4 characters per token plus tool/output overhead)"""
+    chars = len(str(api_params.get("input", ""))) + len(api_params.get("instructions") or "")
+    return chars // 4 + DEFAULT_TOKEN_ESTIMATE
+
+
+class _Ticket:
+    __slots__ = ("priority", "tokens", "enqueued_at", "granted", "window_entry")
+
+    def __init__(self, priority, tokens):
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.window_entry = None
+
+
+class _ScheduledStream:
+    """Stream events from an upstream call, holding its scheduler slot until exhausted or closed
+
+    With a circuit breaker, the call is only recorded once the stream ends, so failures
+    mid-stream (connection drops, error events) count against the upstream.
+    """
+
+    def __init__(self, scheduler, ticket, stream, breaker=None, breaker_token=None):
+        self._scheduler = scheduler
+        self._ticket = ticket
+        self._stream = stream
+        self._breaker = breaker
+        self._breaker_token = breaker_token
+        self._actual_tokens = None
+
+    def _record(self, failed):
+        if self._breaker_token is None:
+            return
+        token, self._breaker_token = self._breaker_token, None
+        self._breaker.done(token, failed=failed)
+
+    def __iter__(self):
+        try:
+            for event in self._stream:
+                event_type = getattr(event, "type", None)
+                if event_type == "response.completed":
+                    self._actual_tokens = getattr(getattr(event.response, "usage", None), "total_tokens", None)
+                elif event_type in ("error", "response.failed"):
+                    self._record(failed=True)
+                yield event
+        except Exception:
+            # Anything raised while reading the upstream stream (dropped connection, SDK error event)
+            self._record(failed=True)
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        if self._ticket is None:
+            return
+        # Stream finished or the consumer stopped reading: not an upstream failure
+        self._record(failed=False)
+        ticket, self._ticket = self._ticket, None
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+        self._scheduler.release(ticket, self._actual_tokens)
+
+
+class UpstreamScheduler:
+    """Admission control and weighted priority queueing for client.responses.create"""
+
+    def __init__(self, rpm_limit=500, tpm_limit=200000, max_in_flight=32, max_wait=30.0,
+                 weights=None, reserved_share=None):
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+        self.reserved_share = dict(reserved_share or RESERVED_SHARE)
+
+        self._cond = threading.Condition()
+        self._queues = {priority: deque() for priority in self.weights}
+        # Smooth weighted round-robin state
+        self._current_weight = {priority: 0 for priority in self.weights}
+        # Dispatched calls in the last minute: [timestamp, tokens]
+        self._window = deque()
+        self._window_tokens = 0
+        self._in_flight = 0
+
+        # Latest upstream view of the budget (from response headers)
+        self._upstream_remaining_requests = None
+        self._upstream_remaining_tokens = None
+        self._upstream_requests_reset_at = 0.0
+        self._upstream_tokens_reset_at = 0.0
+
+        self._stats = {
+            priority: {"dispatched": 0, "timed_out": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0,
+                       "recent_waits_ms": deque(maxlen=1000)}
+            for priority in self.weights
+        }
+
+    # -- budget accounting -------------------------------------------------
+
+    def _expire_window(self, now):
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+
+    def _admissible(self, ticket, now):
+        if self.max_in_flight and self._in_flight >= self.max_in_flight:
+            return False
+
+        usable = 1.0 - self.reserved_share.get(ticket.priority, 0.0)
+        if len(self._window) + 1 > self.rpm_limit * usable:
+            return False
+        if self._window_tokens + ticket.tokens > self.tpm_limit * usable:
+            return False
+
+        # Upstream headers are authoritative until their reset time passes
+        if self._upstream_remaining_requests is not None and now < self._upstream_requests_reset_at:
+            if self._upstream_remaining_requests - 1 < self.rpm_limit * (1.0 - usable):
+                return False
+        if self._upstream_remaining_tokens is not None and now < self._upstream_tokens_reset_at:
+            if self._upstream_remaining_tokens - ticket.tokens < self.tpm_limit * (1.0 - usable):
+                return False
+        return True
+
+    def _dispatch(self):
+        """Grant as many queued tickets as the budget allows, in weighted priority order"""
+        now = time.monotonic()
+        self._expire_window(now)
+        granted_any = False
+
+        while True:
+            candidates = [p for p, queue in self._queues.items() if queue and self._admissible(queue[0], now)]
+            if not candidates:
+                break
+
+            total = sum(self.weights[p] for p in candidates)
+            for p in candidates:
+                self._current_weight[p] += self.weights[p]
+            chosen = max(candidates, key=lambda p: self._current_weight[p])
+            self._current_weight[chosen] -= total
+
+            ticket = self._queues[chosen].popleft()
+            ticket.granted = True
+            ticket.window_entry = [now, ticket.tokens]
+            self._window.append(ticket.window_entry)
+            self._window_tokens += ticket.tokens
+            self._in_flight += 1
+            if self._upstream_remaining_requests is not None:
+                self._upstream_remaining_requests -= 1
+            if self._upstream_remaining_tokens is not None:
+                self._upstream_remaining_tokens -= ticket.tokens
+            granted_any = True
+
+        if granted_any:
+            self._cond.notify_all()
+
+    def _next_wakeup(self):
+        """Seconds until the sliding window or an upstream reset frees budget"""
+        now = time.monotonic()
+        candidates = [1.0]
+        if self._window:
+            candidates.append(WINDOW_SECONDS - (now - self._window[0][0]))
+        for reset_at in (self._upstream_requests_reset_at, self._upstream_tokens_reset_at):
+            if reset_at > now:
+                candidates.append(reset_at - now)
+        return max(0.01, min(candidates))
+
+    # -- public API --------------------------------------------------------
+
+    def acquire(self, priority="interactive", tokens=DEFAULT_TOKEN_ESTIMATE):
+        """Block until a call of this priority may be sent upstream; returns a ticket for release()"""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority '{priority}', expected one of: {', '.join(self._queues)}")
+
+        ticket = _Ticket(priority, tokens)
+        with self._cond:
+            self._queues[priority].append(ticket)
+            self._dispatch()
+            deadline = ticket.enqueued_at + self.max_wait
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queues[priority].remove(ticket)
+                    self._stats[priority]["timed_out"] += 1
+                    raise SchedulerBusyError(f"Upstream budget exhausted; {priority} request queued for over {self.max_wait:g}s")
+                self._cond.wait(min(remaining, self._next_wakeup()))
+                if not ticket.granted:
+                    self._dispatch()
+
+            wait_ms = (time.monotonic() - ticket.enqueued_at) * 1000
+            stats = self._stats[priority]
+            stats["dispatched"] += 1
+            stats["wait_total_ms"] += wait_ms
+            stats["wait_max_ms"] = max(stats["wait_max_ms"], wait_ms)
+            stats["recent_waits_ms"].append(wait_ms)
+        return ticket
+
+    def release(self, ticket, actual_tokens=None, headers=None):
+        """Finish a call: correct its token estimate and apply upstream rate-limit headers"""
+        with self._cond:
+            self._in_flight -= 1
+            if actual_tokens is not None and ticket.window_entry is not None:
+                self._window_tokens += actual_tokens - ticket.window_entry[1]
+                ticket.window_entry[1] = actual_tokens
+            if headers:
+                self._apply_headers(headers)
+            self._dispatch()
+            self._cond.notify_all()
+
+    def _apply_headers(self, headers):
+        now = time.monotonic()
+        try:
+            limit_requests = headers.get("x-ratelimit-limit-requests")
+            limit_tokens = headers.get("x-ratelimit-limit-tokens")
+            if limit_requests:
+                self.rpm_limit = int(limit_requests)
+            if limit_tokens:
+                self.tpm_limit = int(limit_tokens)
+
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            if remaining_requests is not None:
+                self._upstream_remaining_requests = int(remaining_requests)
+                self._upstream_requests_reset_at = now + (parse_reset_duration(headers.get("x-ratelimit-reset-requests")) or WINDOW_SECONDS)
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_tokens is not None:
+                self._upstream_remaining_tokens = int(remaining_tokens)
+                self._upstream_tokens_reset_at = now + (parse_reset_duration(headers.get("x-ratelimit-reset-tokens")) or WINDOW_SECONDS)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed rate-limit headers: {e}")
+
+    def create(self, client, api_params, priority="interactive", breaker=None, timings=None, cancelled=None):
+        """Scheduled equivalent of client.responses.create(**api_params)
+
+        The circuit breaker, if given, sees only the upstream call itself: queue wait and
+        SchedulerBusyError are never counted as slow or failed upstream calls.
+        timings, if given, receives queue_ms once the call is dispatched and upstream_ms
+        once it returns, so callers can report upstream latency without the queue wait.
+        An open breaker rejects the call before it queues: slots held by hung calls must
+        not turn CircuitOpenError into a SchedulerBusyError after max_wait.
+        cancelled, if given, is a threading.Event checked once the slot is granted: a call
+        cancelled while queued gives its slot back with RequestCancelledError.
+        """
+        if breaker:
+            breaker.check()
+        ticket = self.acquire(priority, estimate_tokens(api_params))
+        if timings is not None:
+            timings["queue_ms"] = (time.monotonic() - ticket.enqueued_at) * 1000
+        headers = None
+        actual_tokens = None
+        started = time.monotonic()
+        try:
+            if cancelled is not None and cancelled.is_set():
+                raise RequestCancelledError("Request cancelled while queued")
+            token = breaker.admit() if breaker else None
+            try:
+                raw_api = getattr(client.responses, "with_raw_response", None)
+                if raw_api is not None:
+                    raw = raw_api.create(**api_params)
+                    headers = raw.headers
+                    response = raw.parse()
+                else:
+                    response = client.responses.create(**api_params)
+            except Exception as e:
+                if breaker:
+                    breaker.done(token, e)
+                raise
+            if breaker:
+                breaker.done(token)
+            if timings is not None:
+                timings["upstream_ms"] = (time.monotonic() - started) * 1000
+            actual_tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+            return response
+        finally:
+            self.release(ticket, actual_tokens, headers)
+
+    def open_stream(self, client, api_params, priority="interactive", breaker=None, timings=None):
+        """Scheduled equivalent of client.responses.create(**api_params, stream=True)
+
+        The upstream slot is held until the returned stream is exhausted or closed.
+        timings, if given, receives queue_ms once the call is dispatched.
+        Like create(), an open breaker rejects the call before it queues.
+        """
+        if breaker:
+            breaker.check()
+        ticket = self.acquire(priority, estimate_tokens(api_params))
+        if timings is not None:
+            timings["queue_ms"] = (time.monotonic() - ticket.enqueued_at) * 1000
+        try:
+            token = breaker.admit() if breaker else None
+            try:
+                stream = client.responses.create(stream=True, **api_params)
+            except Exception as e:
+                if breaker:
+                    breaker.done(token, e)
+                raise
+        except BaseException:
+            self.release(ticket)
+            raise
+        return _ScheduledStream(self, ticket, stream, breaker, token)
+
+    def metrics(self):
+        """Snapshot of queue depth, wait times and budget usage"""
+        with self._cond:
+            self._expire_window(time.monotonic())
+            classes = {}
+            for priority, stats in self._stats.items():
+                waits = sorted(stats["recent_waits_ms"])
+                classes[priority] = {
+                    "weight": self.weights[priority],
+                    "queued": len(self._queues[priority]),
+                    "dispatched": stats["dispatched"],
+                    "timed_out": stats["timed_out"],
+                    "wait_mean_ms": round(stats["wait_total_ms"] / stats["dispatched"], 2) if stats["dispatched"] else 0.0,
+                    "wait_p95_ms": round(waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+                    "wait_max_ms": round(stats["wait_max_ms"], 2)
+                }
+            return {
+                "in_flight": self._in_flight,
+                "requests_last_minute": len(self._window),
+                "tokens_last_minute": self._window_tokens,
+                "rpm_limit": self.rpm_limit,
+                "tpm_limit": self.tpm_limit,
+                "upstream_remaining_requests": self._upstream_remaining_requests,
+                "upstream_remaining_tokens": self._upstream_remaining_tokens,
+                "classes": classes
+            }
+
+
+def create_scheduler():
+    """Build the process-wide scheduler from the environment"""
+    return UpstreamScheduler(
+        rpm_limit=int(os.environ.get("SCHEDULER_RPM", 500)),
+        tpm_limit=int(os.environ.get("SCHEDULER_TPM", 200000)),
+        max_in_flight=int(os.environ.get("SCHEDULER_MAX_IN_FLIGHT", 32)),
+        max_wait=float(os.environ.get("SCHEDULER_MAX_WAIT", 30))
+    )
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Shadow traffic for comparing response profiles on live /chat requests
+Features:
+- Mirrors a configurable sample of conversations to an alternate profile (model, instructions, schema)
+- Runs off the request path on a small bounded thread pool; never affects the user's response
+- Records paired upstream latency (scheduler queue wait excluded, logged separately), token
+  usage and output length to a JSONL log
+- Side-by-side report: python shadow.py report [shadow_log.jsonl]
+
+Configuration (environment):
+- SHADOW_SAMPLE_RATE: fraction of new conversations to mirror (0 disables, default 0)
+- SHADOW_PROFILE: alternate profile name from profiles.PROFILES
+- SHADOW_MODEL: optional model override for the alternate profile
+- SHADOW_LOG_PATH: paired results log (default shadow_log.jsonl)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from profiles import PROFILES, get_profile, build_api_params
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PATH = "shadow_log.jsonl"
+
+# Conversations remembered for mirroring follow-up turns
+MAX_TRACKED_CONVERSATIONS = 10000
+
+
+def response_metrics(response, latency_ms, queue_ms=None):
+    """Upstream latency, token usage and output length of a Responses API result"""
+    usage = getattr(response, "usage", None)
+    output_text = getattr(response, "output_text", None) or ""
+    metrics = {
+        "latency_ms": round(latency_ms, 1),
+        "input_tokens": getattr(usage, "input_tokens", None),
+        "output_tokens": getattr(usage, "output_tokens", None),
+        "total_tokens": getattr(usage, "total_tokens", None),
+        "output_chars": len(output_text)
+    }
+    if queue_ms is not None:
+        metrics["queue_ms"] = round(queue_ms, 1)
+    return metrics
+
+
+class ShadowMirror:
+    """Mirror sampled /chat turns to an alternate profile and log paired measurements
+
+    Sampling is decided per conversation on its first turn. Follow-up turns are
+    mirrored only when the first turn was, using the shadow conversation's own
+    previous_response_id chain so the alternate profile keeps its own context.
+    """
+
+    def __init__(self, client, profile, sample_rate, log_path=DEFAULT_LOG_PATH, scheduler=None, max_workers=2, max_pending=32):
+        self.client = client
+        self.scheduler = scheduler
+        self.profile = profile
+        self.sample_rate = sample_rate
+        self.log_path = log_path
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._pending = 0
+        # primary response id -> shadow response id (None while the shadow call is in flight)
+        self._conversations = OrderedDict()
+        self.stats = {"mirrored": 0, "dropped": 0, "failed": 0}
+
+    def _sampled(self, previous_response_id):
+        if previous_response_id:
+            return previous_response_id in self._conversations
+        return random.random() < self.sample_rate
+
+    def mirror(self, primary_profile, vector_store_id, user_message, previous_response_id, primary_response, primary_latency_ms,
+               client=None, scheduler=None):
+        """Schedule a shadow call for this turn if it is sampled; returns immediately
+
+        primary_latency_ms is the primary's upstream call time, without scheduler queue wait.
+        client and scheduler default to the mirror's own; pass the tenant's to keep
+        shadow traffic on the same OpenAI key as the primary call.
+        """
+        try:
+            with self._lock:
+                if not self._sampled(previous_response_id):
+                    return False
+                shadow_previous_id = self._conversations.get(previous_response_id) if previous_response_id else None
+                # Follow-up whose shadow turn failed or is still running: nothing to continue from
+                if self._pending >= self.max_pending or (previous_response_id and not shadow_previous_id):
+                    self.stats["dropped"] += 1
+                    return False
+                self._pending += 1
+                # Reserve the slot so the next turn knows this conversation is mirrored
+                self._conversations[primary_response.id] = None
+
+            primary = dict(response_metrics(primary_response, primary_latency_ms), profile=primary_profile["name"], model=primary_profile["model"])
+            self._executor.submit(self._run, vector_store_id, user_message, shadow_previous_id,
+                                  primary_response.id, primary, client or self.client, scheduler or self.scheduler)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to schedule shadow request: {e}")
+            return False
+
+    def _run(self, vector_store_id, user_message, shadow_previous_id, primary_response_id, primary, client, scheduler):
+        record = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "primary_response_id": primary_response_id,
+            "is_new_conversation": shadow_previous_id is None,
+            "primary": primary
+        }
+        try:
+            api_params = build_api_params(self.profile, vector_store_id, user_message, shadow_previous_id)
+            timings = {}
+            if scheduler:
+                # Shadow calls only use capacity left over by real traffic; their (long) queue wait
+                # is logged apart from the upstream latency that is compared
+                response = scheduler.create(client, api_params, "shadow", timings=timings)
+            else:
+                started = time.perf_counter()
+                response = client.responses.create(**api_params)
+                timings["upstream_ms"] = (time.perf_counter() - started) * 1000
+
+            with self._lock:
+                self._conversations[primary_response_id] = response.id
+                while len(self._conversations) > MAX_TRACKED_CONVERSATIONS:
+                    self._conversations.popitem(last=False)
+                self.stats["mirrored"] += 1
+
+            record["shadow"] = dict(response_metrics(response, timings["upstream_ms"], timings.get("queue_ms")), profile=self.profile["name"],
+                                    model=self.profile["model"], success=True)
+        except Exception as e:
+            with self._lock:
+                self._conversations.pop(primary_response_id, None)
+                self.stats["failed"] += 1
+            logger.warning(f"Shadow request failed: {e}")
+            record["shadow"] = {"profile": self.profile["name"], "model": self.profile["model"], "success": False, "error": str(e)}
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        self._write(record)
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        try:
+            with self._lock:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            logger.error(f"Failed to write shadow log: {e}")
+
+
+def create_shadow_mirror(client, primary_profile_name, scheduler=None):
+    """Build a ShadowMirror from the environment, or None when shadow mode is disabled"""
+    sample_rate = float(os.environ.get("SHADOW_SAMPLE_RATE", "0") or 0)
+    if sample_rate <= 0:
+        return None
+
+    # Default to the other built-in profile
+    default_name = next((name for name in PROFILES if name != primary_profile_name), primary_profile_name)
+    profile = get_profile(os.environ.get("SHADOW_PROFILE", default_name), os.environ.get("SHADOW_MODEL"))
+    log_path = os.environ.get("SHADOW_LOG_PATH", DEFAULT_LOG_PATH)
+
+    logger.info(f"Shadow mode enabled: {sample_rate:.0%} of conversations mirrored to profile '{profile['name']}' ({profile['model']})")
+    return ShadowMirror(client, profile, min(sample_rate, 1.0), log_path, scheduler)
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[index]
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 1) if values else None
+
+
+def summarize(log_path=DEFAULT_LOG_PATH):
+    """Side-by-side summary of paired primary/shadow measurements"""
+    pairs = []
+    failed = 0
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("shadow", {}).get("success"):
+                pairs.append(record)
+            else:
+                failed += 1
+
+    def side(key):
+        rows = [record[key] for record in pairs]
+        latencies = [row["latency_ms"] for row in rows]
+        return {
+            "profile": rows[0]["profile"] if rows else None,
+            "model": rows[0]["model"] if rows else None,
+            "latency_p50_ms": _percentile(latencies, 50),
+            "latency_p95_ms": _percentile(latencies, 95),
+            "mean_input_tokens": _mean([row["input_tokens"] for row in rows if row.get("input_tokens") is not None]),
+            "mean_output_tokens": _mean([row["output_tokens"] for row in rows if row.get("output_tokens") is not None]),
+            "mean_output_chars": _mean([row["output_chars"] for row in rows])
+        }
+
+    latency_deltas = [record["shadow"]["latency_ms"] - record["primary"]["latency_ms"] for record in pairs]
+    shadow_faster = sum(1 for delta in latency_deltas if delta < 0)
+
+    return {
+        "pairs": len(pairs),
+        "failed_shadow_requests": failed,
+        "primary": side("primary"),
+        "shadow": side("shadow"),
+        "median_latency_delta_ms": _percentile(latency_deltas, 50),
+        "shadow_faster_ratio": round(shadow_faster / len(pairs), 3) if pairs else None
+    }
+
+
+def print_report(summary):
+    print("📊 Shadow traffic report")
+    print("=" * 60)
+    print(f"Paired samples: {summary['pairs']} (failed shadow requests: {summary['failed_shadow_requests']})")
+    if not summary["pairs"]:
+        return
+
+    primary, shadow = summary["primary"], summary["shadow"]
+    print(f"{'':22}{'primary':>18}{'shadow':>18}")
+    for label, key in [("profile", "profile"), ("model", "model"),
+                       ("latency p50 (ms)", "latency_p50_ms"), ("latency p95 (ms)", "latency_p95_ms"),
+                       ("input tokens", "mean_input_tokens"), ("output tokens", "mean_output_tokens"),
+                       ("output chars", "mean_output_chars")]:
+        print(f"{label:22}{str(primary[key]):>18}{str(shadow[key]):>18}")
+    print(f"Median latency delta (shadow - primary): {summary['median_latency_delta_ms']} ms")
+    print(f"Shadow faster on {summary['shadow_faster_ratio']:.0%} of pairs")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "report":
+        print("Usage: python shadow.py report [shadow_log.jsonl]")
+        sys.exit(1)
+
+    path = sys.argv[2] if len(sys.argv) > 2 else os.environ.get("SHADOW_LOG_PATH", DEFAULT_LOG_PATH)
+    if not os.path.exists(path):
+        print(f"❌ Shadow log not found: {path}")
+        sys.exit(1)
+    print_report(summarize(path))
@@ -0,0 +1,292 @@
+"""
+Speculative precomputation of likely follow-up turns
+Features:
+- Transition table of observed question sequences (per tenant), learned from live /chat traffic
+- After an answer, the top-N likely follow-ups are generated in the background on the same
+  previous_response_id chain, at bulk priority and under a strict per-minute budget
+- A follow-up whose normalized text equals a speculated question is served from the speculation,
+  waiting on it only if its upstream call is already running; one still queued at bulk priority
+  is skipped so the follow-up goes upstream at its own priority
+- Hit-rate metrics to justify the upstream spend
+
+Configuration (environment):
+- SPECULATION_ENABLED: turn speculation on (default off)
+- SPECULATION_TOP_N: follow-ups generated per answer (default 2)
+- SPECULATION_MIN_COUNT: observations before a transition is speculated on (default 3)
+- SPECULATION_MAX_PER_MINUTE / SPECULATION_MAX_CONCURRENT: spend limits (default 30 / 2)
+- SPECULATION_MAX_WAIT: seconds a follow-up waits on a matching in-flight speculation (default 3)
+- SPECULATION_TTL_SECONDS: how long an unused speculation is kept (default 600)
+- SPECULATION_TABLE_PATH: optional JSON file the transition table is loaded from and saved to
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from answer_cache import normalize_question
+from circuit_breaker import CLOSED
+from profiles import build_api_params
+from scheduler import RequestCancelledError
+from response_decoding import get_decoder, OK, SCHEMA_MISMATCH
+
+logger = logging.getLogger(__name__)
+
+# Bounds on learned and in-memory state
+MAX_TRACKED_RESPONSES = 20000
+MAX_SOURCES_PER_TENANT = 5000
+MAX_SUCCESSORS = 20
+SAVE_EVERY_OBSERVATIONS = 100
+
+
+class TransitionTable:
+    """Counts of 'question A was followed by question B', keyed by normalized text"""
+
+    def __init__(self):
+        # normalized question -> {normalized follow-up: [count, latest raw text]}
+        self._successors = OrderedDict()
+
+    def observe(self, previous, question_text):
+        following = normalize_question(question_text)
+        successors = self._successors.setdefault(previous, {})
+        self._successors.move_to_end(previous)
+        entry = successors.setdefault(following, [0, question_text])
+        entry[0] += 1
+        entry[1] = question_text
+
+        if len(successors) > MAX_SUCCESSORS:
+            rarest = min(successors, key=lambda key: successors[key][0])
+            del successors[rarest]
+        while len(self._successors) > MAX_SOURCES_PER_TENANT:
+            self._successors.popitem(last=False)
+
+    def predict(self, question, top_n, min_count):
+        """Most frequent follow-ups of question as raw question texts"""
+        successors = self._successors.get(normalize_question(question), {})
+        ranked = sorted(successors.values(), key=lambda entry: entry[0], reverse=True)
+        return [text for count, text in ranked[:top_n] if count >= min_count]
+
+    def to_dict(self):
+        return {source: {key: list(entry) for key, entry in successors.items()}
+                for source, successors in self._successors.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        table = cls()
+        for source, successors in data.items():
+            table._successors[source] = {key: list(entry) for key, entry in successors.items()}
+        return table
+
+
+class _Speculation:
+    __slots__ = ("question", "normalized", "future", "timings", "cancelled", "created_at")
+
+    def __init__(self, question, future, timings, cancelled):
+        self.question = question
+        self.normalized = normalize_question(question)
+        self.future = future
+        # Filled by the scheduler: queue_ms appears once the upstream call is dispatched
+        self.timings = timings
+        # Checked by the scheduler once a slot is granted; future.cancel() cannot stop a started worker
+        self.cancelled = cancelled
+        self.created_at = time.monotonic()
+
+    @property
+    def dispatched(self):
+        return self.future.done() or "queue_ms" in self.timings
+
+
+class Speculator:
+    """Predicts and pre-generates follow-up turns"""
+
+    def __init__(self, top_n=2, min_count=3, max_per_minute=30, max_concurrent=2, ttl_seconds=600.0,
+                 max_wait=3.0, table_path=None):
+        self.top_n = top_n
+        self.min_count = min_count
+        self.max_per_minute = max_per_minute
+        self.ttl_seconds = ttl_seconds
+        self.max_wait = max_wait
+        self.table_path = table_path
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="speculation")
+        self._lock = threading.Lock()
+        self._tables = {}
+        # response id -> (tenant name, normalized question that produced it)
+        self._questions = OrderedDict()
+        # response id -> list of _Speculation generated on top of it
+        self._speculations = OrderedDict()
+        self._started = deque()
+        self._observations = 0
+        self.stats = {"speculated": 0, "failed": 0, "skipped_budget": 0, "follow_ups": 0,
+                      "eligible_follow_ups": 0, "hits": 0, "missed_queued": 0, "expired_unused": 0}
+
+        if table_path and os.path.exists(table_path):
+            try:
+                with open(table_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._tables = {tenant: TransitionTable.from_dict(table) for tenant, table in data.items()}
+                logger.info(f"Loaded speculation transition table from {table_path}")
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load speculation table {table_path}: {e}")
+
+    # -- learning ----------------------------------------------------------
+
+    def observe(self, tenant_name, previous_response_id, question):
+        """Record that question followed the turn that produced previous_response_id"""
+        with self._lock:
+            self.stats["follow_ups"] += 1
+            previous = self._questions.get(previous_response_id)
+            if previous is None or previous[0] != tenant_name:
+                return
+            self._tables.setdefault(tenant_name, TransitionTable()).observe(previous[1], question)
+            self._observations += 1
+            save = self.table_path and self._observations % SAVE_EVERY_OBSERVATIONS == 0
+        if save:
+            self.save()
+
+    def remember(self, tenant_name, response_id, question):
+        """Record which question produced response_id, so its follow-up can be learned"""
+        with self._lock:
+            self._questions[response_id] = (tenant_name, normalize_question(question))
+            while len(self._questions) > MAX_TRACKED_RESPONSES:
+                self._questions.popitem(last=False)
+
+    def save(self):
+        with self._lock:
+            data = {tenant: table.to_dict() for tenant, table in self._tables.items()}
+        tmp_path = self.table_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.table_path)
+        except OSError as e:
+            logger.error(f"Failed to save speculation table: {e}")
+
+    # -- serving -----------------------------------------------------------
+
+    def take(self, previous_response_id, question):
+        """Speculated (decoded, response_id) for this follow-up, or None
+
+        Only a speculation of the same normalized question is served, since its answer is
+        chained on the speculated text. Waits up to max_wait seconds for one whose upstream
+        call is running; one still queued behind the scheduler is cancelled rather than waited on.
+        """
+        normalized = normalize_question(question)
+        with self._lock:
+            speculations = self._speculations.get(previous_response_id)
+            if not speculations:
+                return None
+            self.stats["eligible_follow_ups"] += 1
+            match = next((s for s in speculations if s.normalized == normalized), None)
+            if match is None:
+                return None
+            speculations.remove(match)
+            if not match.dispatched:
+                # The follow-up goes upstream itself; drop the guess before it spends an upstream call
+                match.cancelled.set()
+                match.future.cancel()
+                self.stats["missed_queued"] += 1
+                return None
+
+        try:
+            result = match.future.result(timeout=self.max_wait)
+        except FutureTimeoutError:
+            return None
+        if result is None:
+            return None
+
+        with self._lock:
+            self.stats["hits"] += 1
+        return result
+
+    # -- generation --------------------------------------------------------
+
+    def _within_budget(self):
+        now = time.monotonic()
+        while self._started and now - self._started[0] > 60.0:
+            self._started.popleft()
+        if len(self._started) >= self.max_per_minute:
+            return False
+        self._started.append(now)
+        return True
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._speculations:
+            response_id, speculations = next(iter(self._speculations.items()))
+            if speculations and now - speculations[0].created_at < self.ttl_seconds:
+                break
+            self._speculations.popitem(last=False)
+            self.stats["expired_unused"] += len(speculations)
+
+    def speculate(self, tenant_name, upstream, profile, vector_store_id, question, response_id):
+        """Queue background generation of likely follow-ups to the turn that produced response_id"""
+        # Never spend upstream calls (or half-open probes) on guesses while upstream is unhealthy
+        if upstream.breaker.state != CLOSED:
+            return 0
+        with self._lock:
+            self._expire()
+            table = self._tables.get(tenant_name)
+            predictions = table.predict(question, self.top_n, self.min_count) if table else []
+            if not predictions:
+                return 0
+
+            scheduled = []
+            for predicted in predictions:
+                if not self._within_budget():
+                    self.stats["skipped_budget"] += 1
+                    break
+                timings = {}
+                cancelled = threading.Event()
+                future = self._executor.submit(self._generate, upstream, profile, vector_store_id,
+                                               predicted, response_id, timings, cancelled)
+                scheduled.append(_Speculation(predicted, future, timings, cancelled))
+            if scheduled:
+                self._speculations[response_id] = scheduled
+                self.stats["speculated"] += len(scheduled)
+        return len(scheduled)
+
+    def _generate(self, upstream, profile, vector_store_id, question, previous_response_id, timings, cancelled):
+        try:
+            api_params = build_api_params(profile, vector_store_id, question, previous_response_id)
+            # Bulk priority: speculation only spends capacity interactive chat is not using
+            response = upstream.scheduler.create(upstream.client, api_params, "bulk", upstream.breaker,
+                                                 timings, cancelled)
+            decoded = get_decoder(profile["schema"]).decode(response)
+            # Same bar as a live /chat answer: whole-output JSON, schema mismatches served with a warning
+            if decoded.status not in (OK, SCHEMA_MISMATCH):
+                raise ValueError(f"unusable speculative response ({decoded.status})")
+            return decoded, response.id
+        except RequestCancelledError:
+            return None
+        except Exception as e:
+            with self._lock:
+                self.stats["failed"] += 1
+            logger.info(f"Speculative generation failed: {e}")
+            return None
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["transitions_tenants"] = len(self._tables)
+        stats["hit_rate"] = round(stats["hits"] / stats["speculated"], 3) if stats["speculated"] else None
+        stats["follow_up_hit_rate"] = round(stats["hits"] / stats["follow_ups"], 3) if stats["follow_ups"] else None
+        return stats
+
+
+def create_speculator():
+    """Build a Speculator from the environment, or None when speculation is disabled"""
+    if os.environ.get("SPECULATION_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return None
+    return Speculator(
+        top_n=int(os.environ.get("SPECULATION_TOP_N", 2)),
+        min_count=int(os.environ.get("SPECULATION_MIN_COUNT", 3)),
+        max_per_minute=int(os.environ.get("SPECULATION_MAX_PER_MINUTE", 30)),
+        max_concurrent=int(os.environ.get("SPECULATION_MAX_CONCURRENT", 2)),
+        ttl_seconds=float(os.environ.get("SPECULATION_TTL_SECONDS", 600)),
+        max_wait=float(os.environ.get("SPECULATION_MAX_WAIT", 3)),
+        table_path=os.environ.get("SPECULATION_TABLE_PATH")
+    )
@@ -0,0 +1,420 @@
+"""
+Python client for the Maritime Sustainability Chatbot API
+Features:
+- Sync (SustainBuddyClient) and async (AsyncSustainBuddyClient) clients, each on one pooled
+  keep-alive HTTP connection pool, so follow-up turns skip the TCP/TLS handshake
+- Automatic previous_response_id tracking, per client or per Conversation
+- Streaming answers from /chat/stream (Server-Sent Events)
+- Retries with exponential backoff and jitter, honouring Retry-After, only where the request
+  cannot have reached generation: connect/pool errors, 429 and 503. Read timeouts and
+  502/504 are raised, since the answer (and its upstream cost) may already be in progress
+- Bounded-concurrency helpers for sending many independent questions
+
+Usage:
+    with SustainBuddyClient("https://api.sustainbuddy.ai") as client:
+        print(client.send_message("What is FuelEU Maritime?")["answer"])
+        for delta in client.stream_message("What are the penalties?"):
+            print(delta, end="", flush=True)
+        envelopes = client.ask_many(["What is CII?", "What is EEXI?"], concurrency=8)
+
+    async with AsyncSustainBuddyClient("https://api.sustainbuddy.ai") as client:
+        answer = await client.send_message("What is FuelEU Maritime?")
+"""
+
+import json
+import time
+import random
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://api.sustainbuddy.ai"
+
+# Transient statuses worth retrying: rejected before any generation started (rate limited, busy or degraded)
+RETRY_STATUSES = (429, 503)
+
+# Transport errors raised before the request was sent; anything later may re-send a paid generation
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class SustainBuddyError(Exception):
+    """Raised for failed requests; carries the HTTP status and error body when there was one"""
+
+    def __init__(self, message, status_code=None, payload=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.payload = payload
+
+
+class _SSEParser:
+    """Incremental Server-Sent Events parser: feed lines, get (event, data) when a frame completes"""
+
+    def __init__(self):
+        self._event = None
+        self._data = []
+
+    def feed(self, line):
+        if not line:
+            if not self._data:
+                return None
+            frame = (self._event or "message", "\n".join(self._data))
+            self._event, self._data = None, []
+            return frame
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            self._event = value
+        elif field == "data":
+            self._data.append(value)
+        return None
+
+
+class _ClientBase:
+    """Request building, response handling and retry policy shared by the sync and async clients"""
+
+    def __init__(self, api_url, api_key, priority, max_retries, backoff, max_backoff):
+        self.api_url = api_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if api_key:
+            self.headers["X-API-Key"] = api_key
+        if priority:
+            self.headers["X-Request-Priority"] = priority
+
+    @staticmethod
+    def _payload(message, previous_response_id):
+        payload = {"message": message}
+        if previous_response_id:
+            payload["previous_response_id"] = previous_response_id
+        return payload
+
+    @staticmethod
+    def _limits(max_connections):
+        return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+    def _retry_delay(self, attempt, response=None):
+        """Seconds to wait before retry number attempt (0-based): Retry-After, else jittered exponential"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        return random.uniform(0.5, 1.0) * min(self.max_backoff, self.backoff * 2 ** attempt)
+
+    def _should_retry(self, attempt, response=None):
+        if attempt >= self.max_retries:
+            return False
+        return response is None or response.status_code in RETRY_STATUSES
+
+    @staticmethod
+    def _error(response, body):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        message = payload.get("error") if isinstance(payload, dict) else None
+        return SustainBuddyError(message or f"HTTP {response.status_code}", response.status_code, payload)
+
+    def _envelope(self, response):
+        """Success envelope from a /chat response, raising SustainBuddyError otherwise"""
+        if response.status_code != 200:
+            raise self._error(response, response.content)
+        data = response.json()
+        if not data.get("success"):
+            raise SustainBuddyError(data.get("error") or "Request failed", response.status_code, data)
+        return data
+
+    @staticmethod
+    def _stream_event(event, data):
+        """Stream item for one SSE frame: {'type': 'delta', 'delta': ...} or {'type': 'done', 'envelope': ...}"""
+        payload = json.loads(data)
+        if event == "delta":
+            return {"type": "delta", "delta": payload["delta"]}
+        if event == "done":
+            return {"type": "done", "envelope": payload}
+        if event == "error":
+            raise SustainBuddyError(payload.get("error") or "Stream failed", 200, payload)
+        return None
+
+
+class Conversation:
+    """One conversation on a shared client: tracks previous_response_id across turns"""
+
+    def __init__(self, client, previous_response_id=None):
+        self.client = client
+        self.response_id = previous_response_id
+        self.last_envelope = None
+
+    def send_message(self, message):
+        """Send a turn and return the structured response (answer, sources)"""
+        envelope = self.client.chat(message, self.response_id)
+        self.response_id = envelope["response_id"]
+        self.last_envelope = envelope
+        return envelope["response"]
+
+    def stream_message(self, message):
+        """Send a turn, yielding answer text deltas; the final envelope is in last_envelope afterwards"""
+        for item in self.client.stream_chat(message, self.response_id):
+            if item["type"] == "delta":
+                yield item["delta"]
+            else:
+                self.response_id = item["envelope"]["response_id"]
+                self.last_envelope = item["envelope"]
+
+    def new_conversation(self):
+        self.response_id = None
+        self.last_envelope = None
+
+
+class AsyncConversation(Conversation):
+    """Conversation on an AsyncSustainBuddyClient"""
+
+    async def send_message(self, message):
+        envelope = await self.client.chat(message, self.response_id)
+        self.response_id = envelope["response_id"]
+        self.last_envelope = envelope
+        return envelope["response"]
+
+    async def stream_message(self, message):
+        async for item in self.client.stream_chat(message, self.response_id):
+            if item["type"] == "delta":
+                yield item["delta"]
+            else:
+                self.response_id = item["envelope"]["response_id"]
+                self.last_envelope = item["envelope"]
+
+
+class SustainBuddyClient(_ClientBase):
+    """Thread-safe synchronous client; share one instance across threads and conversations"""
+
+    def __init__(self, api_url=DEFAULT_API_URL, api_key=None, priority=None, timeout=60.0, connect_timeout=10.0,
+                 max_retries=3, backoff=0.5, max_backoff=30.0, max_connections=20, http2=False, verify=True):
+        super().__init__(api_url, api_key, priority, max_retries, backoff, max_backoff)
+        self._http = httpx.Client(
+            headers=self.headers,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=self._limits(max_connections),
+            http2=http2,
+            verify=verify
+        )
+        self._conversation = Conversation(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._http.close()
+
+    def _post(self, path, payload):
+        attempt = 0
+        while True:
+            try:
+                response = self._http.post(self.api_url + path, json=payload)
+            except httpx.TransportError as e:
+                if not isinstance(e, RETRY_ERRORS) or not self._should_retry(attempt):
+                    raise SustainBuddyError(f"Connection failed: {e}") from e
+                delay = self._retry_delay(attempt)
+            else:
+                if not self._should_retry(attempt, response):
+                    return response
+                delay = self._retry_delay(attempt, response)
+            logger.info(f"Retrying {path} in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            attempt += 1
+
+    def chat(self, message, previous_response_id=None):
+        """POST /chat without touching conversation state; returns the full success envelope"""
+        return self._envelope(self._post("/chat", self._payload(message, previous_response_id)))
+
+    def stream_chat(self, message, previous_response_id=None):
+        """POST /chat/stream, yielding delta items then one done item (see _stream_event)
+
+        Retries only until the first event arrives; later failures are raised, never replayed.
+        """
+        payload = self._payload(message, previous_response_id)
+        attempt = 0
+        received = False
+        while True:
+            try:
+                with self._http.stream("POST", self.api_url + "/chat/stream", json=payload,
+                                       headers={"Accept": "text/event-stream"}) as response:
+                    if response.status_code != 200:
+                        body = response.read()
+                        if self._should_retry(attempt, response):
+                            delay = self._retry_delay(attempt, response)
+                        else:
+                            raise self._error(response, body)
+                    elif response.headers.get("content-type", "").startswith("application/json"):
+                        # Served without streaming (e.g. degraded mode answer)
+                        response.read()
+                        yield {"type": "done", "envelope": self._envelope(response)}
+                        return
+                    else:
+                        parser = _SSEParser()
+                        for line in response.iter_lines():
+                            frame = parser.feed(line)
+                            item = frame and self._stream_event(*frame)
+                            if item:
+                                received = True
+                                yield item
+                        return
+            except httpx.TransportError as e:
+                if received or not isinstance(e, RETRY_ERRORS) or not self._should_retry(attempt):
+                    raise SustainBuddyError(f"Connection failed: {e}") from e
+                delay = self._retry_delay(attempt)
+            time.sleep(delay)
+            attempt += 1
+
+    def conversation(self, previous_response_id=None):
+        """New Conversation sharing this client's connection pool"""
+        return Conversation(self, previous_response_id)
+
+    @property
+    def response_id(self):
+        return self._conversation.response_id
+
+    def send_message(self, message):
+        """Send a turn in the client's default conversation and return the structured response"""
+        return self._conversation.send_message(message)
+
+    def stream_message(self, message):
+        """Stream a turn in the client's default conversation, yielding answer text deltas"""
+        return self._conversation.stream_message(message)
+
+    def new_conversation(self):
+        self._conversation.new_conversation()
+
+    def ask_many(self, questions, concurrency=8, return_exceptions=False):
+        """Send independent first-turn questions with at most concurrency in flight; envelopes in input order"""
+        def ask(question):
+            try:
+                return self.chat(question)
+            except SustainBuddyError as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(ask, questions))
+
+
+class AsyncSustainBuddyClient(_ClientBase):
+    """asyncio client; share one instance across tasks and conversations"""
+
+    def __init__(self, api_url=DEFAULT_API_URL, api_key=None, priority=None, timeout=60.0, connect_timeout=10.0,
+                 max_retries=3, backoff=0.5, max_backoff=30.0, max_connections=20, http2=False, verify=True):
+        super().__init__(api_url, api_key, priority, max_retries, backoff, max_backoff)
+        self._http = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=self._limits(max_connections),
+            http2=http2,
+            verify=verify
+        )
+        self._conversation = AsyncConversation(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def _post(self, path, payload):
+        attempt = 0
+        while True:
+            try:
+                response = await self._http.post(self.api_url + path, json=payload)
+            except httpx.TransportError as e:
+                if not isinstance(e, RETRY_ERRORS) or not self._should_retry(attempt):
+                    raise SustainBuddyError(f"Connection failed: {e}") from e
+                delay = self._retry_delay(attempt)
+            else:
+                if not self._should_retry(attempt, response):
+                    return response
+                delay = self._retry_delay(attempt, response)
+            logger.info(f"Retrying {path} in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def chat(self, message, previous_response_id=None):
+        """POST /chat without touching conversation state; returns the full success envelope"""
+        return self._envelope(await self._post("/chat", self._payload(message, previous_response_id)))
+
+    async def stream_chat(self, message, previous_response_id=None):
+        """POST /chat/stream, yielding delta items then one done item (see _stream_event)"""
+        payload = self._payload(message, previous_response_id)
+        attempt = 0
+        received = False
+        while True:
+            try:
+                async with self._http.stream("POST", self.api_url + "/chat/stream", json=payload,
+                                             headers={"Accept": "text/event-stream"}) as response:
+                    if response.status_code != 200:
+                        body = await response.aread()
+                        if self._should_retry(attempt, response):
+                            delay = self._retry_delay(attempt, response)
+                        else:
+                            raise self._error(response, body)
+                    elif response.headers.get("content-type", "").startswith("application/json"):
+                        await response.aread()
+                        yield {"type": "done", "envelope": self._envelope(response)}
+                        return
+                    else:
+                        parser = _SSEParser()
+                        async for line in response.aiter_lines():
+                            frame = parser.feed(line)
+                            item = frame and self._stream_event(*frame)
+                            if item:
+                                received = True
+                                yield item
+                        return
+            except httpx.TransportError as e:
+                if received or not isinstance(e, RETRY_ERRORS) or not self._should_retry(attempt):
+                    raise SustainBuddyError(f"Connection failed: {e}") from e
+                delay = self._retry_delay(attempt)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def conversation(self, previous_response_id=None):
+        """New AsyncConversation sharing this client's connection pool"""
+        return AsyncConversation(self, previous_response_id)
+
+    @property
+    def response_id(self):
+        return self._conversation.response_id
+
+    async def send_message(self, message):
+        return await self._conversation.send_message(message)
+
+    def stream_message(self, message):
+        return self._conversation.stream_message(message)
+
+    def new_conversation(self):
+        self._conversation.new_conversation()
+
+    async def ask_many(self, questions, concurrency=8, return_exceptions=False):
+        """Send independent first-turn questions with at most concurrency in flight; envelopes in input order"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def ask(question):
+            async with semaphore:
+                return await self.chat(question)
+
+        return await asyncio.gather(*(ask(question) for question in questions), return_exceptions=return_exceptions)
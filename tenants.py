@@ -0,0 +1,258 @@
+"""
+Multi-tenant routing for the Maritime Sustainability Chatbot
+Features:
+- Tenant resolution by X-API-Key header, then by Host header
+- Per-tenant vector store, response profile (model, instructions, schema) and OpenAI key
+- Tenant registry file hot-reloaded on change, without restarts
+- Pooled OpenAI clients (one per OpenAI key) with their own upstream scheduler and circuit breaker
+- Per-tenant request metrics
+
+Registry file (TENANTS_FILE), JSON:
+{
+  "tenants": {
+    "acme": {
+      "api_keys": ["acme-widget-key"],
+      "hosts": ["chat.acme-maritime.com"],
+      "vector_store_id": "vs_...",
+      "profile": "brief",
+      "model": "gpt-4o-mini",
+      "instructions": "...",
+      "schema": {...},
+      "openai_api_key_env": "ACME_OPENAI_API_KEY",
+      "priority": "partner"
+    }
+  }
+}
+Only vector_store_id is required. A tenant named "default" serves requests that match no other tenant.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+from openai import OpenAI
+
+from profiles import get_profile
+from scheduler import create_scheduler, PRIORITY_WEIGHTS
+from circuit_breaker import create_circuit_breaker
+from metadata_cache import detect_vector_store_api
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+
+
+class TenantNotFoundError(LookupError):
+    """Raised when a request cannot be mapped to a configured tenant"""
+
+
+class Tenant:
+    """Resolved configuration for one white-label tenant"""
+
+    def __init__(self, name, vector_store_id, profile, openai_api_key, priority="interactive",
+                 api_keys=(), hosts=()):
+        self.name = name
+        self.vector_store_id = vector_store_id
+        self.profile = profile
+        self.openai_api_key = openai_api_key
+        self.priority = priority
+        self.api_keys = tuple(api_keys)
+        self.hosts = tuple(host.lower() for host in hosts)
+
+    def request_priority(self, requested=None):
+        """Priority for one request: X-Request-Priority may lower the tenant's class, never raise it
+
+        Unknown values are returned as-is so the caller can reject them.
+        """
+        if not requested:
+            return self.priority
+        if requested in PRIORITY_WEIGHTS and PRIORITY_WEIGHTS[requested] > PRIORITY_WEIGHTS[self.priority]:
+            return self.priority
+        return requested
+
+    @classmethod
+    def from_config(cls, name, config):
+        """Build a tenant from its registry entry, raising ValueError for invalid entries"""
+        vector_store_id = config.get("vector_store_id")
+        if not vector_store_id:
+            raise ValueError(f"Tenant '{name}' has no vector_store_id")
+
+        profile = get_profile(config.get("profile", "full"), config.get("model"))
+        overrides = {key: config[key] for key in ("instructions", "schema") if key in config}
+        if overrides:
+            profile = dict(profile, **overrides)
+
+        if "openai_api_key_env" in config:
+            openai_api_key = os.environ.get(config["openai_api_key_env"])
+        else:
+            openai_api_key = config.get("openai_api_key") or os.environ.get("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise ValueError(f"Tenant '{name}' has no OpenAI API key configured")
+
+        priority = config.get("priority", "interactive")
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Tenant '{name}' has invalid priority '{priority}'")
+
+        return cls(name, vector_store_id, profile, openai_api_key, priority,
+                   config.get("api_keys", []), config.get("hosts", []))
+
+
+def create_openai_client(api_key):
+    """OpenAI client with a bounded timeout, so an upstream incident cannot hold workers for minutes"""
+    return OpenAI(
+        api_key=api_key,
+        timeout=float(os.environ.get("OPENAI_TIMEOUT", 60)),
+        max_retries=int(os.environ.get("OPENAI_MAX_RETRIES", 2))
+    )
+
+
+class Upstream:
+    """Pooled OpenAI client for one API key, with its vector store API, scheduler and circuit breaker"""
+
+    def __init__(self, client, scheduler, breaker):
+        self.client = client
+        self.scheduler = scheduler
+        self.breaker = breaker
+        # Vector store API flavour is fixed for the installed SDK, so detect it once per client
+        self.vs_client, self.vs_api_type = detect_vector_store_api(client)
+
+
+class ClientPool:
+    """One OpenAI client (and its HTTP connection pool) per OpenAI API key, shared by tenants"""
+
+    def __init__(self, client_factory=create_openai_client, scheduler_factory=create_scheduler,
+                 breaker_factory=create_circuit_breaker):
+        self.client_factory = client_factory
+        self.scheduler_factory = scheduler_factory
+        self.breaker_factory = breaker_factory
+        self._upstreams = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(api_key):
+        """Non-secret label for an API key, used in metrics"""
+        return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:8]
+
+    def get(self, api_key):
+        upstream = self._upstreams.get(api_key)
+        if upstream is None:
+            with self._lock:
+                upstream = self._upstreams.get(api_key)
+                if upstream is None:
+                    upstream = Upstream(self.client_factory(api_key=api_key), self.scheduler_factory(),
+                                        self.breaker_factory(f"openai-{self.fingerprint(api_key)}"))
+                    self._upstreams[api_key] = upstream
+        return upstream
+
+    def metrics(self):
+        with self._lock:
+            items = list(self._upstreams.items())
+        return {self.fingerprint(api_key): upstream.scheduler.metrics() for api_key, upstream in items}
+
+    def breakers(self):
+        with self._lock:
+            items = list(self._upstreams.items())
+        return {self.fingerprint(api_key): upstream.breaker.snapshot() for api_key, upstream in items}
+
+
+class TenantRegistry:
+    """Tenant lookup by API key or host, reloaded from TENANTS_FILE when it changes
+
+    Without a registry file every request resolves to the tenant built by
+    default_factory (the single-deployment configuration from the environment).
+    """
+
+    def __init__(self, path=None, default_factory=None, reload_interval=5.0):
+        self.path = path
+        self.default_factory = default_factory
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._tenants = {}
+        self._by_api_key = {}
+        self._by_host = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._metrics = {}
+        if path:
+            self._reload()
+
+    def _reload(self):
+        """Load the registry file; on any error keep serving the previous tenants"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            tenants = {name: Tenant.from_config(name, entry) for name, entry in config.get("tenants", {}).items()}
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load tenant registry {self.path}: {e}")
+            return False
+
+        by_api_key = {}
+        by_host = {}
+        for tenant in tenants.values():
+            for api_key in tenant.api_keys:
+                by_api_key[api_key] = tenant
+            for host in tenant.hosts:
+                by_host[host] = tenant
+
+        with self._lock:
+            self._tenants = tenants
+            self._by_api_key = by_api_key
+            self._by_host = by_host
+            self._mtime = mtime
+        logger.info(f"Loaded {len(tenants)} tenants from {self.path}")
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._reload()
+
+    def resolve(self, api_key=None, host=None):
+        """Return the tenant for a request, or raise TenantNotFoundError"""
+        if not self.path:
+            return self.default_factory()
+
+        self._maybe_reload()
+        tenant = None
+        if api_key:
+            tenant = self._by_api_key.get(api_key)
+        if tenant is None and host:
+            tenant = self._by_host.get(host.split(":")[0].lower())
+        if tenant is None:
+            tenant = self._tenants.get(DEFAULT_TENANT)
+        if tenant is None:
+            raise TenantNotFoundError("Unknown tenant: provide a valid X-API-Key")
+        return tenant
+
+    def record(self, tenant_name, latency_ms=None, success=True):
+        """Count a request against a tenant's metrics"""
+        with self._lock:
+            metrics = self._metrics.setdefault(tenant_name, {"requests": 0, "errors": 0, "latency_total_ms": 0.0})
+            metrics["requests"] += 1
+            if not success:
+                metrics["errors"] += 1
+            if latency_ms is not None:
+                metrics["latency_total_ms"] += latency_ms
+
+    def metrics(self):
+        with self._lock:
+            return {
+                name: {
+                    "requests": m["requests"],
+                    "errors": m["errors"],
+                    "mean_upstream_latency_ms": round(m["latency_total_ms"] / (m["requests"] - m["errors"]), 1)
+                    if m["requests"] > m["errors"] else None
+                }
+                for name, m in self._metrics.items()
+            }
@@ -1,223 +1,308 @@
 #!/usr/bin/env python3
 """
-Simple test for Responses API with vector store - using the exact format from user's examples
+Golden-set regression runner for the Responses API with vector store
+Features:
+- Reads a golden question set (JSONL: id, question)
+- Builds each request with the same profile builder as the /chat endpoint
+- Runs questions concurrently against the live API
+- Records upstream responses into cassettes and replays them later with no network
+- Reports latency percentiles and schema validity, and diffs answers/citations against a previous report
+
+Usage:
+    python test.py --mode record                  # live run, write cassettes
+    python test.py --mode replay --compare last.json
+    python test.py --mode live --profile brief --concurrency 8
 """
 
 import os
+import sys
 import json
+import time
+import types
+import difflib
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from profiles import PROFILES, get_profile, build_api_params
+from response_decoding import get_decoder, RECOVERED, MALFORMED, EMPTY
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+DEFAULT_GOLDEN_PATH = os.path.join("golden", "maritime_golden.jsonl")
+DEFAULT_CASSETTE_DIR = "cassettes"
+CASSETTE_META = "meta.json"
 
-def test_responses_api_with_vector_store():
-    """Test the Responses API with vector store using the exact format from user examples"""
-    
-    print("🧪 Testing Responses API with Vector Store - Correct Format")
-    print("=" * 60)
-    
-    vector_store_id = os.getenv('VECTOR_STORE_ID')
-    
-    if not vector_store_id or vector_store_id == 'your-vector-store-id-here':
-        print("❌ No vector store ID configured. Please set VECTOR_STORE_ID in your .env file")
-        return
-    
-    print(f"📁 Vector Store ID: {vector_store_id}")
-    print(f"🤖 Model: gpt-4o-mini")
-    
-    # Test 1: Basic Responses API with file_search (user's exact format)
-    print("\n" + "─" * 50)
-    print("🧪 Test 1: Basic file_search with vector store")
-    print("─" * 50)
-    
-    try:
-        query = "What are the main environmental challenges facing the maritime industry?"
-        instructions = """
-        You are a maritime sustainability expert. Use the file search tool to find relevant information 
-        from the maritime documents and provide a comprehensive answer about environmental challenges.
-        """
-        
-        print(f"📝 Query: {query}")
-        print("🚀 Calling Responses API...")
-        
-        # Using the EXACT format from user's examples
-        response = client.responses.create(
-            input=query,
-            instructions=instructions,
-            model="o4-mini",
-            tools=[{
-                "type": "file_search",
-                "vector_store_ids": [vector_store_id],
-            }]
-        )
-        
-        print("✅ Success! Response received")
-        print(f"📋 Response ID: {response.id}")
-        
-        # Extract response text
-        if hasattr(response, 'output_text'):
-            print(f"📄 Response length: {len(response.output_text)} characters")
-            print(f"📄 Response: {response.output_text[:300]}...")
-        elif hasattr(response, 'output'):
-            print("📄 Found response.output, extracting content...")
-            if response.output and len(response.output) > 0:
-                content = response.output[0]
-                if hasattr(content, 'content') and content.content:
-                    text = content.content[0].text
-                    print(f"📄 Response length: {len(text)} characters")
-                    print(f"📄 Response: {text[:300]}...")
-        else:
-            print("⚠️  Could not extract response text")
-            print(f"Available attributes: {[attr for attr in dir(response) if not attr.startswith('_')]}")
-        
-    except Exception as e:
-        print(f"❌ Test 1 failed: {e}")
-        print(f"Error type: {type(e)}")
-        
-        if hasattr(e, 'response'):
-            print(f"HTTP Status: {getattr(e.response, 'status_code', 'N/A')}")
-            try:
-                error_text = getattr(e.response, 'text', '')
-                if error_text:
-                    error_data = json.loads(error_text)
-                    print(f"Error details: {json.dumps(error_data, indent=2)}")
-            except:
-                print(f"Raw error: {getattr(e.response, 'text', '')[:200]}...")
-    
-    # Test 2: Responses API with structured output + vector store
-    print("\n" + "─" * 50)
-    print("🧪 Test 2: Structured output + file_search")
-    print("─" * 50)
-    
-    try:
-        query = "How can shipping companies reduce carbon emissions?"
-        instructions = """
-        You are a maritime sustainability expert. Use the file search tool to find relevant information 
-        and provide a structured response about carbon emission reduction strategies.
-        """
-        
-        # Maritime response schema
-        schema = {
-            "type": "object",
-            "properties": {
-                "answer": {
-                    "type": "string",
-                    "description": "Main response about carbon emission reduction"
-                },
-                "source_quote": {
-                    "type": "string", 
-                    "description": "Relevant quote from source documents"
-                },
-                "source_file": {
-                    "type": "string",
-                    "description": "Name of the source file"
-                },
-                "source_quote_location": {
-                    "type": "object",
-                    "properties": {
-                        "page": {"type": "integer"},
-                        "line": {"type": "integer"}
-                    },
-                    "required": ["page", "line"],
-                    "additionalProperties": False
-                }
+
+def load_golden_set(path):
+    """Load golden questions from a JSONL file"""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "question" not in item:
+                raise ValueError(f"{path}:{line_number}: missing 'question'")
+            item.setdefault("id", f"q{line_number}")
+            questions.append(item)
+    return questions
+
+
+def cassette_key(api_params):
+    """Stable key for a request: hash of its canonical JSON"""
+    canonical = json.dumps(api_params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+
+class CassetteStore:
+    """Record/replay of upstream Responses API results, one JSON file per request"""
+
+    def __init__(self, root, profile_name):
+        self.dir = os.path.join(root, profile_name)
+
+    def path(self, api_params):
+        return os.path.join(self.dir, f"{cassette_key(api_params)}.json")
+
+    def save(self, api_params, response, latency_ms):
+        os.makedirs(self.dir, exist_ok=True)
+        usage = getattr(response, "usage", None)
+        record = {
+            "request": api_params,
+            "response": {
+                "id": response.id,
+                "output_text": getattr(response, "output_text", None),
+                "usage": {
+                    "input_tokens": getattr(usage, "input_tokens", None),
+                    "output_tokens": getattr(usage, "output_tokens", None),
+                    "total_tokens": getattr(usage, "total_tokens", None)
+                } if usage else None
             },
-            "required": ["answer", "source_quote", "source_file", "source_quote_location"],
-            "additionalProperties": False
+            "latency_ms": latency_ms,
+            "recorded_at": datetime.utcnow().isoformat()
         }
-        
-        print(f"📝 Query: {query}")
-        print("🚀 Calling Responses API with structured output...")
-        
-        response = client.responses.create(
-            input=query,
-            instructions=instructions,
-            model="o4-mini",
-            tools=[{
-                "type": "file_search",
-                "vector_store_ids": [vector_store_id],
-            }],
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": "maritime_response",
-                    "schema": schema,
-                    "strict": True
-                }
-            }
+        with open(self.path(api_params), "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+
+    def load(self, api_params):
+        """Return (response-like object, recorded latency) or raise FileNotFoundError"""
+        with open(self.path(api_params), "r", encoding="utf-8") as f:
+            record = json.load(f)
+        data = record["response"]
+        response = types.SimpleNamespace(
+            id=data["id"],
+            output_text=data.get("output_text"),
+            output=[],
+            usage=types.SimpleNamespace(**data["usage"]) if data.get("usage") else None
         )
-        
-        print("✅ Success! Structured response received")
-        print(f"📋 Response ID: {response.id}")
-        
-        # Parse structured response
-        if hasattr(response, 'output_text'):
-            try:
-                structured_data = json.loads(response.output_text)
-                print("🎯 Successfully parsed structured JSON!")
-                print(json.dumps(structured_data, indent=2))
-            except json.JSONDecodeError as e:
-                print(f"❌ Failed to parse JSON: {e}")
-                print(f"Raw response: {response.output_text[:200]}...")
-        
-    except Exception as e:
-        print(f"❌ Test 2 failed: {e}")
-        print(f"Error type: {type(e)}")
-
-def test_vector_store_info():
-    """Get basic info about the vector store"""
-    
-    print("\n" + "─" * 50)
-    print("🔍 Vector Store Information")
-    print("─" * 50)
-    
-    vector_store_id = os.getenv('VECTOR_STORE_ID')
-    
+        return response, record["latency_ms"]
+
+    def save_meta(self, vector_store_id):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(os.path.join(self.dir, CASSETTE_META), "w", encoding="utf-8") as f:
+            json.dump({"vector_store_id": vector_store_id}, f)
+
+    def load_meta(self):
+        try:
+            with open(os.path.join(self.dir, CASSETTE_META), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+
+def run_question(item, profile, vector_store_id, mode, client, cassettes):
+    """Execute one golden question and return its result row"""
+    api_params = build_api_params(profile, vector_store_id, item["question"])
+    result = {"id": item["id"], "question": item["question"]}
+
     try:
-        # Check which API to use
-        if hasattr(client, 'vector_stores'):
-            vs_client = client.vector_stores
-            api_type = "direct"
-        elif hasattr(client, 'beta') and hasattr(client.beta, 'vector_stores'):
-            vs_client = client.beta.vector_stores
-            api_type = "beta"
+        if mode == "replay":
+            response, latency_ms = cassettes.load(api_params)
         else:
-            print("❌ Vector stores not supported")
-            return
-        
-        print(f"Using {api_type} vector stores API")
-        
-        # Get vector store details
-        vector_store = vs_client.retrieve(vector_store_id)
-        print(f"✅ Vector Store: {vector_store.name}")
-        print(f"   Status: {vector_store.status}")
-        print(f"   Total files: {vector_store.file_counts.total if hasattr(vector_store.file_counts, 'total') else 'N/A'}")
-        print(f"   Completed files: {vector_store.file_counts.completed if hasattr(vector_store.file_counts, 'completed') else 'N/A'}")
-        
+            started = time.perf_counter()
+            response = client.responses.create(**api_params)
+            latency_ms = (time.perf_counter() - started) * 1000
+            if mode == "record":
+                cassettes.save(api_params, response, latency_ms)
+    except FileNotFoundError:
+        result.update(success=False, error="no cassette recorded for this request")
+        return result
     except Exception as e:
-        print(f"❌ Failed to get vector store info: {e}")
+        result.update(success=False, error=str(e))
+        return result
 
-if __name__ == "__main__":
-    # Check API key
-    if not os.environ.get("OPENAI_API_KEY"):
-        print("❌ OPENAI_API_KEY environment variable not set")
-        exit(1)
-    
-    print("🔑 API Key found")
-    
-    # Test vector store info
-    test_vector_store_info()
-    
-    # Test Responses API
-    test_responses_api_with_vector_store()
-    
+    result.update(success=True, response_id=response.id, latency_ms=round(latency_ms, 1))
+
+    decoded = get_decoder(profile["schema"]).decode(response)
+    if decoded.status == EMPTY:
+        result.update(schema_valid=False, schema_errors=["no response text"])
+        return result
+    if decoded.status == MALFORMED:
+        result.update(schema_valid=False, schema_errors=[f"invalid JSON: {decoded.errors[0]}"], answer=decoded.text)
+        return result
+
+    errors = list(decoded.errors)
+    if decoded.status == RECOVERED:
+        errors.insert(0, "JSON recovered from surrounding text")
+    result.update(schema_valid=not errors, schema_errors=errors)
+    structured_data = decoded.data
+    if isinstance(structured_data, dict):
+        result["answer"] = structured_data.get("answer")
+        result["citation"] = {
+            key: structured_data.get(key)
+            for key in ("source_file", "source_quote", "source_quote_location")
+            if key in structured_data
+        }
+    return result
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[index]
+
+
+def summarize(results, wall_seconds):
+    latencies = [r["latency_ms"] for r in results if r.get("success")]
+    checked = [r for r in results if "schema_valid" in r]
+    return {
+        "questions": len(results),
+        "succeeded": len(latencies),
+        "failed": len(results) - len(latencies),
+        "schema_valid": sum(1 for r in checked if r["schema_valid"]),
+        "schema_invalid": sum(1 for r in checked if not r["schema_valid"]),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None
+        },
+        "wall_seconds": round(wall_seconds, 2)
+    }
+
+
+def diff_reports(previous, current):
+    """Per-question answer and citation changes between two reports"""
+    before = {r["id"]: r for r in previous["results"]}
+    changes = []
+    for row in current["results"]:
+        old = before.get(row["id"])
+        if old is None:
+            changes.append({"id": row["id"], "change": "new question"})
+            continue
+        entry = {"id": row["id"]}
+        if old.get("answer") != row.get("answer"):
+            entry["answer_similarity"] = round(difflib.SequenceMatcher(None, old.get("answer") or "", row.get("answer") or "").ratio(), 3)
+        if old.get("citation") != row.get("citation"):
+            entry["citation"] = {"before": old.get("citation"), "after": row.get("citation")}
+        if old.get("schema_valid") != row.get("schema_valid"):
+            entry["schema_valid"] = {"before": old.get("schema_valid"), "after": row.get("schema_valid")}
+        if len(entry) > 1:
+            changes.append(entry)
+    for question_id in set(before) - {r["id"] for r in current["results"]}:
+        changes.append({"id": question_id, "change": "removed question"})
+    return changes
+
+
+def print_report(report, changes=None):
+    summary = report["summary"]
     print("\n" + "=" * 60)
-    print("🎉 Testing complete!")
-    print("\nIf tests pass, your Flask app should work correctly with:")
-    print("1. Vector store file search integration")
-    print("2. Structured JSON output")
-    print("3. Proper source citations from your maritime documents")
\ No newline at end of file
+    print(f"📋 Golden set: {summary['questions']} questions ({report['mode']} mode, profile '{report['profile']}')")
+    print(f"✅ Succeeded: {summary['succeeded']}   ❌ Failed: {summary['failed']}")
+    print(f"🎯 Schema valid: {summary['schema_valid']}   ⚠️  Schema invalid: {summary['schema_invalid']}")
+    latency = summary["latency_ms"]
+    print(f"⏱️  Latency ms: p50={latency['p50']} p90={latency['p90']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}")
+    print(f"⏱️  Wall time: {summary['wall_seconds']}s")
+
+    for row in report["results"]:
+        if not row.get("success"):
+            print(f"❌ {row['id']}: {row['error']}")
+        elif not row.get("schema_valid"):
+            print(f"⚠️  {row['id']}: {'; '.join(row['schema_errors'])}")
+
+    if changes is not None:
+        print("\n" + "─" * 50)
+        print(f"🔍 Changes vs previous run: {len(changes)}")
+        for change in changes:
+            print(f"   {json.dumps(change)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the maritime golden question set")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN_PATH, help="Golden question set (JSONL)")
+    parser.add_argument("--mode", choices=["live", "record", "replay"], default="replay")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="full")
+    parser.add_argument("--model", help="Override the profile's model")
+    parser.add_argument("--cassettes", default=DEFAULT_CASSETTE_DIR, help="Cassette directory")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--report", help="Write the JSON report to this path")
+    parser.add_argument("--compare", help="Previous JSON report to diff answers and citations against")
+    args = parser.parse_args(argv)
+
+    profile = get_profile(args.profile, args.model)
+    cassettes = CassetteStore(args.cassettes, profile["name"])
+    vector_store_id = os.getenv('VECTOR_STORE_ID')
+    client = None
+
+    if args.mode == "replay":
+        # Offline: fall back to the vector store the cassettes were recorded against
+        vector_store_id = vector_store_id or cassettes.load_meta().get("vector_store_id")
+    else:
+        if not os.environ.get("OPENAI_API_KEY"):
+            print("❌ OPENAI_API_KEY environment variable not set")
+            return 1
+        from openai import OpenAI
+        client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+    if not vector_store_id or vector_store_id == 'your-vector-store-id-here':
+        print("❌ No vector store ID configured. Please set VECTOR_STORE_ID in your .env file")
+        return 1
+    if args.mode == "record":
+        cassettes.save_meta(vector_store_id)
+
+    questions = load_golden_set(args.golden)
+    print(f"🧪 Running {len(questions)} golden questions ({args.mode}, concurrency {args.concurrency})")
+    print(f"📁 Vector Store ID: {vector_store_id}")
+    print(f"🤖 Model: {profile['model']}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        results = list(pool.map(
+            lambda item: run_question(item, profile, vector_store_id, args.mode, client, cassettes),
+            questions
+        ))
+    wall_seconds = time.perf_counter() - started
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "mode": args.mode,
+        "profile": profile["name"],
+        "model": profile["model"],
+        "summary": summarize(results, wall_seconds),
+        "results": results
+    }
+
+    changes = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            changes = diff_reports(json.load(f), report)
+        report["changes"] = changes
+
+    print_report(report, changes)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.report}")
+
+    return 0 if report["summary"]["failed"] == 0 and report["summary"]["schema_invalid"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
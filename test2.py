@@ -1,4 +1,7 @@
 import os
+import sys
+
+from preprocess_corpus import normalize_filename, run_pipeline
 
 def sanitize_filenames(root_dir):
     for dirpath, dirnames, filenames in os.walk(root_dir):
@@ -7,7 +10,7 @@ def sanitize_filenames(root_dir):
             if " " in name or "," in name:
                 old_path = os.path.join(dirpath, name)
                 # replace spaces with underscores, remove commas
-                new_name = name.replace(" ", "_").replace(",", "")
+                new_name = normalize_filename(name)
                 new_path = os.path.join(dirpath, new_name)
                 try:
                     os.rename(old_path, new_path)
@@ -16,8 +19,13 @@ def sanitize_filenames(root_dir):
                     print(f"Failed to rename {old_path}: {e}")
 
 if __name__ == "__main__":
-    folder = r"C:\Users\Formu\Downloads\OneDrive_2025-07-30\SustainBuddy Knowledge"
-    if os.path.isdir(folder):
+    # The corpus pipeline normalizes filenames itself, so the knowledge folder
+    # no longer needs renaming in place; pass --rename for the old behaviour.
+    folder = os.environ.get("KNOWLEDGE_DIR", r"C:\Users\Formu\Downloads\OneDrive_2025-07-30\SustainBuddy Knowledge")
+    if not os.path.isdir(folder):
+        print(f"Error: folder not found: {folder}")
+    elif "--rename" in sys.argv:
         sanitize_filenames(folder)
     else:
-        print(f"Error: folder not found: {folder}")
+        stats = run_pipeline(folder, os.environ.get("CORPUS_DIR", "corpus"))
+        print(f"Processed {stats['documents']} documents at {stats['pages_per_second']} pages/sec")
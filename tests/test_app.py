@@ -0,0 +1,99 @@
+"""app.py request handling against a fake upstream"""
+
+import os
+import json
+import types
+
+import httpx
+import openai
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("VECTOR_STORE_ID", "vs_test")
+
+import app  # noqa: E402  (needs the environment above)
+
+ANSWER = {"answer": "Yes", "source_quote": "q", "source_file": "f.pdf", "source_quote_location": {"page": 1, "line": 2}}
+
+
+class FakeResponses:
+    def __init__(self):
+        self.calls = []
+        self.error = None
+
+    def create(self, **api_params):
+        self.calls.append(api_params)
+        if self.error:
+            raise self.error
+        return types.SimpleNamespace(id=f"resp_{len(self.calls)}", output_text=json.dumps(ANSWER),
+                                     usage=types.SimpleNamespace(input_tokens=10, output_tokens=5, total_tokens=15))
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    responses = FakeResponses()
+    monkeypatch.setattr(app.client_pool, "client_factory", lambda api_key: types.SimpleNamespace(responses=responses))
+    app.client_pool._upstreams.clear()
+    monkeypatch.setattr(app, "fallback_answers", app.AnswerCache())
+    yield responses
+    app.client_pool._upstreams.clear()
+
+
+def open_breaker(upstream_calls):
+    upstream_calls.error = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+    breaker = app.client_pool.get(os.environ["OPENAI_API_KEY"]).breaker
+    while breaker.state != app.OPEN:
+        breaker.done(breaker.admit(), failed=True)
+
+
+def test_degraded_answer_does_not_hand_out_another_users_chain(upstream):
+    client = app.app.test_client()
+    first = client.post("/chat", json={"message": "What is FuelEU Maritime?"}).get_json()
+    assert first["response_id"] == "resp_1"
+
+    open_breaker(upstream)
+    degraded = client.post("/chat", json={"message": "What is FuelEU Maritime"})
+    assert degraded.status_code == 200
+    body = degraded.get_json()
+    assert body["degraded"] and body["response"] == ANSWER
+    assert body["response_id"] is None
+
+    follow_up = client.post("/chat", json={"message": "And penalties?", "previous_response_id": "resp_1"})
+    assert follow_up.status_code == 503
+
+
+def test_vector_store_refresh_is_per_tenant_and_throttled(upstream, monkeypatch):
+    store = types.SimpleNamespace(name="Maritime", status="completed", file_counts=types.SimpleNamespace(total=3, completed=3))
+    vector_stores = types.SimpleNamespace(retrieve=lambda vector_store_id: store)
+    monkeypatch.setattr(app.client_pool, "client_factory",
+                        lambda api_key: types.SimpleNamespace(responses=upstream, vector_stores=vector_stores))
+    cache = app.MetadataCache(min_refresh_interval=60.0)
+    monkeypatch.setattr(app, "metadata_cache", cache)
+    other_tenant = ("other", "vector_store", "vs_other")
+    cache.get(other_tenant, lambda: {"id": "vs_other"})
+    client = app.app.test_client()
+
+    # Nothing cached for this tenant yet: nothing to refresh, and other tenants are untouched
+    assert client.post("/vector-store-info/refresh").get_json()["refresh_scheduled"] is False
+    assert client.get("/vector-store-info").get_json()["vector_store"]["name"] == "Maritime"
+
+    throttled = client.post("/vector-store-info/refresh")
+    assert throttled.status_code == 429
+    assert 0 < int(throttled.headers["Retry-After"]) <= 61
+    assert not cache._entries[other_tenant].refresh_requested
+
+
+def test_precomputed_answer_keeps_its_warning(upstream, monkeypatch):
+    cache = app.AnswerCache()
+    monkeypatch.setattr(app, "answer_cache", cache)
+    tenant = app.tenant_registry.resolve()
+    scope = app.answer_scope(tenant.vector_store_id, app.profile_fingerprint(tenant.profile))
+    cache.put(scope, "What is FuelEU Maritime?", ANSWER, "resp_batch", "Response did not match schema: extra field")
+    cache.put(scope, "What is EEXI?", ANSWER, "resp_batch_2")
+    client = app.app.test_client()
+
+    body = client.post("/chat", json={"message": "what is fueleu maritime"}).get_json()
+    assert body["cached"] and body["response"] == ANSWER
+    assert body["warning"] == "Response did not match schema: extra field"
+    assert "warning" not in client.post("/chat", json={"message": "What is EEXI?"}).get_json()
+    assert upstream.calls == []
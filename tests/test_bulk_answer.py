@@ -0,0 +1,123 @@
+"""bulk_answer.py end to end against fake_batch_server.py, and loading its output into the answer cache"""
+
+import json
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+from openai import OpenAI
+
+import bulk_answer
+import fake_batch_server
+from answer_cache import AnswerCache, answer_scope
+from profiles import get_profile, profile_fingerprint
+
+QUESTIONS = [
+    "What is FuelEU Maritime?",
+    "Please FAIL this one",
+    "How does the EU ETS apply to shipping?",
+    "What is the CII rating?",
+    "Explain EEXI.",
+]
+
+
+@pytest.fixture
+def batch_server(monkeypatch):
+    monkeypatch.setattr(fake_batch_server, "STEP_SECONDS", 0.01)
+    server = make_server("127.0.0.1", 0, fake_batch_server.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+    thread.join()
+
+
+@pytest.fixture
+def questions_file(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text("".join(json.dumps({"id": f"q-{i}", "question": q}) + "\n" for i, q in enumerate(QUESTIONS)),
+                    encoding="utf-8")
+    return path
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+
+def run(questions_file, output, base_url, *extra):
+    return bulk_answer.main([str(questions_file), "-o", str(output), "--base-url", base_url,
+                             "--vector-store-id", "vs_test", "--poll-interval", "0.05",
+                             "--max-requests-per-batch", "2", *extra])
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def check_records(records):
+    assert [record["index"] for record in records] == list(range(len(QUESTIONS)))
+    assert [record["id"] for record in records] == [f"q-{i}" for i in range(len(QUESTIONS))]
+    assert [record["question"] for record in records] == QUESTIONS
+    for record in records:
+        if "FAIL" in record["question"]:
+            assert record["success"] is False and record["error"] == "Simulated failure"
+        else:
+            assert record["success"] is True
+            assert record["response"]["answer"] == f"Fake answer to: {record['question']}"
+            assert record["response_id"].startswith("resp_")
+            assert record["profile_fingerprint"] == profile_fingerprint(get_profile("full"))
+
+
+def test_answers_in_input_order_with_failures(batch_server, questions_file, tmp_path):
+    output = tmp_path / "answers.jsonl"
+    # A failed request makes the run exit non-zero, with the failure recorded in place
+    assert run(questions_file, output, batch_server) == 1
+    check_records(read_records(output))
+    assert not (tmp_path / "answers.jsonl.batches.json").exists()
+    assert len(fake_batch_server.batches) >= 3
+
+
+def test_resume_polls_recorded_batches_without_resubmitting(batch_server, questions_file, tmp_path):
+    output = tmp_path / "answers.jsonl"
+    client = OpenAI(api_key="sk-test", base_url=batch_server)
+    questions = bulk_answer.load_questions(str(questions_file))
+    # As left behind by a run interrupted after submitting
+    batch_ids = bulk_answer.submit_batches(client, questions, get_profile("full"), "vs_test", 2, "24h")
+    state_path = tmp_path / "answers.jsonl.batches.json"
+    state_path.write_text(json.dumps({
+        "batch_ids": batch_ids, "questions": str(questions_file),
+        "questions_sha256": bulk_answer.file_sha256(str(questions_file)), "question_count": len(questions)
+    }), encoding="utf-8")
+    submitted = len(fake_batch_server.batches)
+
+    assert run(questions_file, output, batch_server, "--resume") == 1
+    assert len(fake_batch_server.batches) == submitted
+    check_records(read_records(output))
+    assert not state_path.exists()
+
+
+def test_resume_refuses_other_questions(batch_server, questions_file, tmp_path):
+    state_path = tmp_path / "answers.jsonl.batches.json"
+    state_path.write_text(json.dumps({"batch_ids": ["batch_x"], "questions": "old.jsonl",
+                                      "questions_sha256": "0" * 64, "question_count": 5}), encoding="utf-8")
+    submitted = len(fake_batch_server.batches)
+    assert run(questions_file, tmp_path / "answers.jsonl", batch_server, "--resume") == 1
+    assert len(fake_batch_server.batches) == submitted
+    assert state_path.exists()
+
+
+def test_output_loads_into_answer_cache_with_warnings(batch_server, questions_file, tmp_path):
+    output = tmp_path / "answers.jsonl"
+    run(questions_file, output, batch_server)
+    records = read_records(output)
+    records[0]["warning"] = "Response did not match schema: 'source_file' is a required property"
+    output.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+    cache = AnswerCache()
+    assert cache.load_jsonl(str(output)) == len(QUESTIONS) - 1
+    scope = answer_scope("vs_test", profile_fingerprint(get_profile("full")))
+    assert cache.get(scope, "what is fueleu maritime")["warning"] == records[0]["warning"]
+    assert cache.get(scope, "Explain EEXI")["warning"] is None
+    assert cache.get(scope, QUESTIONS[1]) is None
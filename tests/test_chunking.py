@@ -0,0 +1,57 @@
+"""Page chunking with line citations"""
+
+import pytest
+
+from preprocess_corpus import chunk_page, split_long_line
+
+PARAGRAPH = " ".join(f"FuelEU Maritime pooling rule {i} applies to ships above 5000 GT." for i in range(60))
+
+
+def test_short_lines_chunk_on_line_boundaries():
+    page = "\n".join(f"Line {i} about the EU ETS" for i in range(1, 41))
+    chunks = chunk_page(page, 4, chunk_size=200, chunk_overlap=50)
+    assert len(chunks) > 1
+    assert all(len(chunk["text"]) <= 200 for chunk in chunks)
+    assert chunks[0]["line_start"] == 1 and chunks[-1]["line_end"] == 40
+    # Overlap: each chunk starts on a line the previous one ended with
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous["line_start"] < chunk["line_start"] <= previous["line_end"]
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(1500, 200), (300, 50), (100, 0)])
+def test_long_line_is_split_at_word_boundaries(chunk_size, chunk_overlap):
+    page = "Title\n" + PARAGRAPH + "\nFooter"
+    chunks = chunk_page(page, 2, chunk_size, chunk_overlap)
+
+    assert all(len(chunk["text"]) <= chunk_size for chunk in chunks)
+    assert all(chunk["page"] == 2 for chunk in chunks)
+    assert chunks[0]["text"].startswith("Title\n") and chunks[-1]["text"].endswith("Footer")
+
+    words = set(PARAGRAPH.split())
+    for chunk in chunks:
+        # Chunk text is verbatim page text starting at char_offset, and no word is cut in half
+        assert page[chunk["char_offset"]:].startswith(chunk["text"])
+        assert all(word in words or word in ("Title", "Footer") for word in chunk["text"].split())
+    covered = set(word for chunk in chunks for word in chunk["text"].split())
+    assert covered == words | {"Title", "Footer"}
+
+
+def test_long_line_covers_all_text_in_order():
+    pieces = split_long_line(7, 100, PARAGRAPH, 120)
+    assert all(len(text) <= 120 for _, _, text in pieces)
+    assert all(line_number == 7 for line_number, _, _ in pieces)
+    assert " ".join(text for _, _, text in pieces) == PARAGRAPH
+    for _, offset, text in pieces:
+        assert PARAGRAPH[offset - 100:].startswith(text)
+
+
+def test_line_without_spaces_is_split_mid_word():
+    line = "x" * 250
+    pieces = split_long_line(1, 0, line, 100)
+    assert [(offset, len(text)) for _, offset, text in pieces] == [(0, 100), (100, 100), (200, 50)]
+
+    page = "https://example.com/" + line
+    chunks = chunk_page(page, 1, chunk_size=120, chunk_overlap=20)
+    assert all(len(chunk["text"]) <= 120 for chunk in chunks)
+    assert all(page[chunk["char_offset"]:].startswith(chunk["text"]) for chunk in chunks)
+    assert chunks[-1]["char_offset"] + len(chunks[-1]["text"]) == len(page)
@@ -0,0 +1,42 @@
+"""sustainbuddy_client retries only what cannot have started a generation"""
+
+import httpx
+import pytest
+
+from sustainbuddy_client import SustainBuddyClient, SustainBuddyError
+
+ENVELOPE = {"success": True, "response": {"answer": "Yes"}, "response_id": "resp_1", "is_new_conversation": True}
+
+
+def client_with(handler):
+    client = SustainBuddyClient("http://test", max_retries=2, backoff=0.001, max_backoff=0.001)
+    client._http = httpx.Client(transport=httpx.MockTransport(handler))
+    return client
+
+
+def failing_then_ok(error):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            if isinstance(error, int):
+                return httpx.Response(error, json={"success": False, "error": "busy"})
+            raise error
+        return httpx.Response(200, json=ENVELOPE)
+    return handler, calls
+
+
+@pytest.mark.parametrize("error", [httpx.ConnectError("refused"), httpx.PoolTimeout("pool"), 429, 503])
+def test_retries_before_generation_started(error):
+    handler, calls = failing_then_ok(error)
+    assert client_with(handler).chat("What is CII?")["response_id"] == "resp_1"
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("error", [httpx.ReadTimeout("slow"), httpx.RemoteProtocolError("dropped"), 502, 504])
+def test_no_retry_once_request_may_be_generating(error):
+    handler, calls = failing_then_ok(error)
+    with pytest.raises(SustainBuddyError):
+        client_with(handler).chat("What is CII?")
+    assert len(calls) == 1
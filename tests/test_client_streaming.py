@@ -0,0 +1,65 @@
+"""sustainbuddy_client streaming against a real HTTP server"""
+
+import json
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from sustainbuddy_client import SustainBuddyClient, AsyncSustainBuddyClient
+
+ENVELOPE = {"success": True, "response": {"answer": "FuelEU applies from 2025."}, "response_id": "resp_1",
+            "is_new_conversation": True}
+DEGRADED = dict(ENVELOPE, response_id=None, degraded=True)
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """/chat/stream as app.py serves it: SSE, or a plain JSON envelope (degraded mode)"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if payload["message"].startswith("degraded"):
+            body, content_type = json.dumps(DEGRADED).encode("utf-8"), "application/json"
+        else:
+            body = (b'event: delta\ndata: {"delta": "FuelEU applies"}\n\n'
+                    b'event: delta\ndata: {"delta": " from 2025."}\n\n'
+                    b"event: done\ndata: " + json.dumps(ENVELOPE).encode("utf-8") + b"\n\n")
+            content_type = "text/event-stream"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def api_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_sync_stream_and_json_fallback(api_url):
+    with SustainBuddyClient(api_url) as client:
+        assert "".join(client.stream_message("What is FuelEU?")) == "FuelEU applies from 2025."
+        assert client.response_id == "resp_1"
+        assert list(client.stream_message("degraded question")) == []
+        assert client.response_id is None
+
+
+def test_async_stream_and_json_fallback(api_url):
+    async def run():
+        async with AsyncSustainBuddyClient(api_url) as client:
+            items = [item async for item in client.stream_chat("What is FuelEU?")]
+            degraded = [item async for item in client.stream_chat("degraded question")]
+        return items, degraded
+
+    items, degraded = asyncio.run(run())
+    assert [item["type"] for item in items] == ["delta", "delta", "done"]
+    assert degraded == [{"type": "done", "envelope": DEGRADED}]
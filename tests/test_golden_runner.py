@@ -0,0 +1,113 @@
+"""Golden-set runner (test.py): cassettes, replay, summaries and report diffs"""
+
+import os
+import json
+import types
+import importlib.util
+
+import pytest
+
+from profiles import get_profile, build_api_params
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Loaded by path: "import test" would pick up the standard library's test package
+_spec = importlib.util.spec_from_file_location("golden_runner", os.path.join(os.path.dirname(HERE), "test.py"))
+golden_runner = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(golden_runner)
+
+ANSWER = {"answer": "Yes", "source_quote": "q", "source_file": "f.pdf", "source_quote_location": {"page": 1, "line": 2}}
+
+
+def test_cassette_key_is_stable_and_order_independent():
+    params = {"model": "gpt-4o", "input": "What is FuelEU?", "tools": [{"type": "file_search", "vector_store_ids": ["vs_1"]}]}
+    # Pinned: a change here orphans every recorded cassette
+    assert golden_runner.cassette_key(params) == "061c1af8216be5ca60b55744"
+    assert golden_runner.cassette_key(dict(reversed(list(params.items())))) == "061c1af8216be5ca60b55744"
+    assert golden_runner.cassette_key(dict(params, input="What is FuelEU")) != "061c1af8216be5ca60b55744"
+
+
+def test_cassette_record_then_replay(tmp_path):
+    store = golden_runner.CassetteStore(str(tmp_path), "full")
+    params = build_api_params(get_profile("full"), "vs_1", "What is FuelEU?")
+    response = types.SimpleNamespace(id="resp_1", output_text=json.dumps(ANSWER),
+                                     usage=types.SimpleNamespace(input_tokens=10, output_tokens=5, total_tokens=15))
+    store.save(params, response, 123.4)
+    store.save_meta("vs_1")
+
+    replayed, latency_ms = store.load(params)
+    assert replayed.id == "resp_1" and json.loads(replayed.output_text) == ANSWER
+    assert replayed.usage.total_tokens == 15 and latency_ms == 123.4
+    assert store.load_meta() == {"vector_store_id": "vs_1"}
+    assert os.path.dirname(store.path(params)) == str(tmp_path / "full")
+    with pytest.raises(FileNotFoundError):
+        store.load(build_api_params(get_profile("full"), "vs_1", "What is FuelEU Maritime?"))
+
+
+def test_replay_from_recorded_cassettes(tmp_path, monkeypatch):
+    monkeypatch.delenv("VECTOR_STORE_ID", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    report_path = tmp_path / "report.json"
+    # Offline: the vector store comes from the cassettes' meta.json; the unrecorded question fails
+    assert golden_runner.main(["--mode", "replay", "--golden", os.path.join(HERE, "golden", "replay.jsonl"),
+                               "--cassettes", os.path.join(HERE, "cassettes"), "--report", str(report_path)]) == 1
+
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    results = {row["id"]: row for row in report["results"]}
+    assert results["fueleu"]["success"] and results["fueleu"]["schema_valid"]
+    assert results["fueleu"]["response_id"] == "resp_golden_fueleu"
+    assert results["fueleu"]["citation"]["source_file"] == "fueleu_regulation.pdf"
+    assert results["cii"]["success"] and not results["cii"]["schema_valid"]
+    assert results["unrecorded"] == {"id": "unrecorded", "question": "Which ships does the EU ETS cover?",
+                                     "success": False, "error": "no cassette recorded for this request"}
+    assert report["summary"]["latency_ms"]["max"] == 1840.5
+    assert (report["summary"]["succeeded"], report["summary"]["failed"]) == (2, 1)
+
+
+def test_summarize_percentiles():
+    results = [{"success": True, "latency_ms": float(ms), "schema_valid": ms % 10 != 0} for ms in range(1, 101)]
+    results.append({"success": False, "error": "timeout"})
+    summary = golden_runner.summarize(results, 12.345)
+
+    assert summary["latency_ms"] == {"p50": 51.0, "p90": 90.0, "p95": 95.0, "p99": 99.0, "max": 100.0}
+    assert (summary["questions"], summary["succeeded"], summary["failed"]) == (101, 100, 1)
+    assert (summary["schema_valid"], summary["schema_invalid"]) == (90, 10)
+    assert summary["wall_seconds"] == 12.35
+
+
+def test_summarize_without_successes():
+    summary = golden_runner.summarize([{"success": False, "error": "timeout"}], 1.0)
+    assert summary["latency_ms"] == {"p50": None, "p90": None, "p95": None, "p99": None, "max": None}
+
+
+def test_percentile_single_value():
+    assert golden_runner.percentile([42.0], 99) == 42.0
+    assert golden_runner.percentile([], 50) is None
+
+
+def test_diff_reports():
+    citation = {"source_file": "a.pdf", "source_quote": "q", "source_quote_location": {"page": 1, "line": 1}}
+    previous = {"results": [
+        {"id": "same", "answer": "Unchanged", "citation": citation, "schema_valid": True},
+        {"id": "reworded", "answer": "FuelEU applies to ships above 5000 GT", "citation": citation, "schema_valid": True},
+        {"id": "recited", "answer": "Same", "citation": citation, "schema_valid": True},
+        {"id": "broken", "answer": "Same", "citation": citation, "schema_valid": True},
+        {"id": "dropped", "answer": "Gone", "citation": citation, "schema_valid": True},
+    ]}
+    moved = dict(citation, source_quote_location={"page": 2, "line": 1})
+    current = {"results": [
+        {"id": "same", "answer": "Unchanged", "citation": citation, "schema_valid": True},
+        {"id": "reworded", "answer": "FuelEU applies to ships over 5000 GT", "citation": citation, "schema_valid": True},
+        {"id": "recited", "answer": "Same", "citation": moved, "schema_valid": True},
+        {"id": "broken", "answer": "Same", "citation": citation, "schema_valid": False},
+        {"id": "added", "answer": "New", "citation": citation, "schema_valid": True},
+    ]}
+    changes = {change["id"]: change for change in golden_runner.diff_reports(previous, current)}
+
+    assert set(changes) == {"reworded", "recited", "broken", "added", "dropped"}
+    assert 0.8 < changes["reworded"]["answer_similarity"] < 1.0
+    assert changes["recited"] == {"id": "recited", "citation": {"before": citation, "after": moved}}
+    assert changes["broken"] == {"id": "broken", "schema_valid": {"before": True, "after": False}}
+    assert changes["added"] == {"id": "added", "change": "new question"}
+    assert changes["dropped"] == {"id": "dropped", "change": "removed question"}
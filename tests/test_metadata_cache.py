@@ -0,0 +1,141 @@
+"""Stale-while-revalidate metadata cache: on-demand refreshes, throttling and eviction"""
+
+import time
+import types
+
+import pytest
+
+from metadata_cache import MetadataCache, detect_vector_store_api, fetch_vector_store_info
+
+
+class CountingFetch:
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+
+    def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return {"calls": self.calls}
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_first_lookup_fetches_then_serves_cached_value():
+    cache = MetadataCache(refresh_interval=300.0)
+    fetch = CountingFetch()
+    value, age, error = cache.get("vs_a", fetch)
+    assert value == {"calls": 1} and error is None and age < 1.0
+    assert cache.get("vs_a", fetch)[0] == {"calls": 1}
+    assert fetch.calls == 1
+    assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1
+
+
+def test_first_lookup_failure_raises():
+    cache = MetadataCache()
+    with pytest.raises(RuntimeError, match="upstream down"):
+        cache.get("vs_a", CountingFetch(error=ConnectionError("upstream down")))
+
+
+def test_request_refresh_revalidates_only_that_key():
+    cache = MetadataCache(refresh_interval=300.0, min_refresh_interval=0.0)
+    first, second = CountingFetch(), CountingFetch()
+    cache.get("vs_a", first)
+    cache.get("vs_b", second)
+
+    assert cache.request_refresh("vs_a") == 1
+    assert wait_for(lambda: first.calls == 2)
+    assert wait_for(lambda: cache.get("vs_a", first)[0] == {"calls": 2})
+    assert second.calls == 1
+
+
+def test_unknown_key_schedules_nothing():
+    cache = MetadataCache()
+    assert cache.request_refresh("vs_missing") == 0
+    assert cache.refresh_wait("vs_missing") == 0.0
+
+
+def test_refreshes_within_min_interval_are_throttled():
+    cache = MetadataCache(refresh_interval=300.0, min_refresh_interval=60.0)
+    fetch = CountingFetch()
+    cache.get("vs_a", fetch)
+
+    assert 59.0 < cache.refresh_wait("vs_a") <= 60.0
+    assert cache.request_refresh("vs_a") == 0
+    assert cache.stats["refreshes_throttled"] == 1
+    time.sleep(0.1)
+    assert fetch.calls == 1
+
+
+def test_pending_refresh_requests_coalesce():
+    cache = MetadataCache(refresh_interval=300.0, min_refresh_interval=0.0)
+    fetch = CountingFetch()
+    cache.get("vs_a", fetch)
+    entry = cache._entries["vs_a"]
+    with entry.lock:
+        # Held lock keeps the refresher from running while the requests pile up
+        assert cache.request_refresh("vs_a") == 1
+        cache.min_refresh_interval = 60.0
+        assert cache.refresh_wait("vs_a") == 0.0
+        assert cache.request_refresh("vs_a") == 1
+    assert wait_for(lambda: fetch.calls == 2)
+    time.sleep(0.1)
+    assert fetch.calls == 2
+
+
+def test_failed_refresh_keeps_value_and_is_throttled():
+    cache = MetadataCache(refresh_interval=300.0, min_refresh_interval=0.0)
+    fetch = CountingFetch()
+    cache.get("vs_a", fetch)
+    fetch.error = ConnectionError("upstream down")
+
+    assert cache.request_refresh("vs_a") == 1
+    assert wait_for(lambda: cache.stats["refresh_errors"] == 1)
+    value, _, error = cache.get("vs_a", fetch)
+    assert value == {"calls": 1} and error == "upstream down"
+
+    cache.min_refresh_interval = 60.0
+    assert cache.request_refresh("vs_a") == 0
+
+
+def test_idle_entries_are_evicted_instead_of_refreshed():
+    cache = MetadataCache(refresh_interval=300.0, min_refresh_interval=0.0, max_idle=0.2)
+    removed, active = CountingFetch(), CountingFetch()
+    cache.get(("old-tenant", "vector_store", "vs_old"), removed)
+    cache.get(("acme", "vector_store", "vs_acme"), active)
+
+    time.sleep(0.25)
+    cache.get(("acme", "vector_store", "vs_acme"), active)
+    cache.request_refresh()
+    assert wait_for(lambda: cache.stats["evictions"] == 1)
+    assert list(cache._entries) == [("acme", "vector_store", "vs_acme")]
+    assert removed.calls == 1
+
+
+def test_max_idle_defaults_to_several_refresh_intervals():
+    assert MetadataCache(refresh_interval=300.0).max_idle == 1200.0
+
+
+def test_detects_vector_store_api_flavour():
+    stores = object()
+    assert detect_vector_store_api(types.SimpleNamespace(vector_stores=stores)) == (stores, "direct")
+    assert detect_vector_store_api(types.SimpleNamespace(beta=types.SimpleNamespace(vector_stores=stores))) == (stores, "beta")
+    assert detect_vector_store_api(types.SimpleNamespace()) == (None, None)
+
+
+def test_fetch_vector_store_info():
+    store = types.SimpleNamespace(name="Maritime", status="completed",
+                                  file_counts=types.SimpleNamespace(total=3, completed=2))
+    vs_client = types.SimpleNamespace(retrieve=lambda vector_store_id: store)
+    assert fetch_vector_store_info(vs_client, "direct", "vs_a") == {
+        "id": "vs_a", "name": "Maritime", "status": "completed", "api_type": "direct",
+        "file_counts": {"total": 3, "completed": 2}
+    }
@@ -0,0 +1,51 @@
+"""Corpus cache identity and invalidation"""
+
+import json
+import os
+
+import pytest
+
+from preprocess_corpus import run_pipeline
+
+docx = pytest.importorskip("docx")
+
+
+def write_docx(path, lines=60):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    document = docx.Document()
+    for i in range(lines):
+        document.add_paragraph(f"Line {i} about FuelEU Maritime pooling and penalties " * 3)
+    document.save(path)
+
+
+def corpus_rows(output_dir):
+    with open(os.path.join(output_dir, "corpus.jsonl"), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_identical_files_keep_their_own_identity(tmp_path):
+    write_docx(str(tmp_path / "kb" / "a" / "Same File.docx"))
+    write_docx(str(tmp_path / "kb" / "b" / "Same File.docx"))
+    output_dir = str(tmp_path / "out")
+
+    run_pipeline(str(tmp_path / "kb"), output_dir, workers=2)
+    rows = corpus_rows(output_dir)
+
+    assert {row["doc_id"] for row in rows} == {"a/Same_File.docx", "b/Same_File.docx"}
+    assert len({row["chunk_id"] for row in rows}) == len(rows)
+    assert all(row["chunk_id"].startswith(row["doc_id"] + "#") for row in rows)
+
+
+def test_chunking_change_rebuilds_cached_documents(tmp_path):
+    write_docx(str(tmp_path / "kb" / "doc.docx"))
+    output_dir = str(tmp_path / "out")
+
+    first = run_pipeline(str(tmp_path / "kb"), output_dir, workers=1)
+    assert run_pipeline(str(tmp_path / "kb"), output_dir, workers=1)["cached_documents"] == 1
+    rebuilt = run_pipeline(str(tmp_path / "kb"), output_dir, workers=1, chunk_size=500)
+
+    assert rebuilt["extracted_documents"] == 1
+    assert rebuilt["total_chunks"] > first["total_chunks"]
+    with open(os.path.join(output_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert (manifest["chunk_size"], manifest["chunk_overlap"]) == (500, 200)
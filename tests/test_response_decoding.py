@@ -0,0 +1,139 @@
+"""Decoding upstream responses: statuses, extraction paths, schema checks and streamed answers"""
+
+import json
+import types
+
+import pytest
+
+from profiles import get_profile
+from response_decoding import (ResponseDecoder, StreamedFieldText, compile_schema, get_decoder,
+                               OK, SCHEMA_MISMATCH, RECOVERED, MALFORMED, EMPTY)
+
+SCHEMA = get_profile("full")["schema"]
+ANSWER = {"answer": "Yes", "source_quote": "q", "source_file": "f.pdf", "source_quote_location": {"page": 1, "line": 2}}
+
+
+class SDKResponse:
+    """Stand-in for the SDK's Response class (extraction paths are cached per class)"""
+
+    def __init__(self, output_text=None, output=()):
+        self.output_text = output_text
+        self.output = list(output)
+
+
+def message(text):
+    return types.SimpleNamespace(type="message", content=[types.SimpleNamespace(type="output_text", text=text)])
+
+
+@pytest.mark.parametrize("text, status", [
+    (json.dumps(ANSWER), OK),
+    (json.dumps(dict(ANSWER, source_file=None)), SCHEMA_MISMATCH),
+    ("Here is the answer: " + json.dumps(ANSWER) + " Hope this helps!", RECOVERED),
+    ("I cannot answer that.", MALFORMED),
+    ('{"answer": "cut off', MALFORMED),
+    ("", EMPTY),
+    (None, EMPTY),
+])
+def test_decode_statuses(text, status):
+    decoded = ResponseDecoder(SCHEMA).decode(SDKResponse(text))
+    assert decoded.status == status
+    if status in (OK, RECOVERED):
+        assert decoded.data == ANSWER and not decoded.errors
+        assert json.loads(decoded.json_text) == ANSWER
+    if status == SCHEMA_MISMATCH:
+        assert decoded.errors == ["$.source_file: expected string, got NoneType"]
+    if status == MALFORMED:
+        assert decoded.text == text and decoded.data is None and len(decoded.errors) == 1
+
+
+def test_recovered_json_text_is_the_embedded_object_only():
+    text = 'Sure! {"answer": "Yes {braces} inside", "source_quote": "q", "source_file": "f.pdf", ' \
+           '"source_quote_location": {"page": 1, "line": 2}} trailing {"answer": "other"}'
+    decoded = ResponseDecoder(SCHEMA).decode(SDKResponse(text))
+    assert decoded.status == RECOVERED
+    assert decoded.json_text.startswith('{"answer": "Yes {braces} inside"') and decoded.json_text.endswith("}}")
+    assert decoded.data["answer"] == "Yes {braces} inside"
+
+
+def test_decode_batch_dict_body():
+    # Batch API output: plain dicts, tool call before the message
+    body = {"id": "resp_1", "output": [
+        {"type": "file_search_call", "queries": ["FuelEU"]},
+        {"type": "message", "content": [{"type": "output_text", "text": json.dumps(ANSWER), "annotations": []}]}
+    ]}
+    decoded = ResponseDecoder(SCHEMA).decode(body)
+    assert decoded.status == OK and decoded.data == ANSWER
+    assert decoded.path == "output[].content[].text"
+    assert ResponseDecoder(SCHEMA).decode({"id": "resp_2", "output": []}).status == EMPTY
+
+
+def test_extraction_path_cached_per_type_and_reprobed_when_empty():
+    decoder = ResponseDecoder(SCHEMA)
+    assert decoder.decode(SDKResponse(json.dumps(ANSWER))).path == "output_text"
+    assert decoder._path_by_type[SDKResponse] == 0
+
+    # Same class, but output_text is empty this time: the cached path is re-probed, not trusted
+    fallback = SDKResponse("", [types.SimpleNamespace(type="file_search_call"), message(json.dumps(ANSWER))])
+    decoded = decoder.decode(fallback)
+    assert decoded.status == OK and decoded.path == "output[].content[].text"
+    assert decoder._path_by_type[SDKResponse] == 1
+
+    assert decoder.decode(SDKResponse(json.dumps(ANSWER))).path == "output_text"
+    assert decoder._path_by_type[SDKResponse] == 0
+
+
+def test_get_decoder_is_shared_per_schema():
+    assert get_decoder(SCHEMA) is get_decoder(SCHEMA)
+    assert get_decoder(get_profile("brief")["schema"]) is not get_decoder(SCHEMA)
+
+
+def test_compile_schema_rejects_bool_for_integer_and_number():
+    errors = compile_schema({"type": "object", "properties": {"page": {"type": "integer"}, "score": {"type": "number"}}})
+    assert errors({"page": 3, "score": 0.5}) == []
+    assert errors({"page": 3, "score": 1}) == []
+    assert errors({"page": True, "score": False}) == ["$.page: expected integer, got bool",
+                                                      "$.score: expected number, got bool"]
+    assert errors({"page": 1.5}) == ["$.page: expected integer, got float"]
+
+
+def test_compile_schema_additional_properties():
+    closed = compile_schema(SCHEMA)
+    assert closed(ANSWER) == []
+    assert closed(dict(ANSWER, confidence="high")) == ["$: unexpected property 'confidence'"]
+    assert closed(dict(ANSWER, source_quote_location={"page": 1, "line": 2, "column": 3})) == \
+        ["$.source_quote_location: unexpected property 'column'"]
+
+    open_schema = compile_schema({"type": "object", "properties": {"answer": {"type": "string"}}, "required": ["answer"]})
+    assert open_schema({"answer": "Yes", "confidence": "high"}) == []
+    assert open_schema({"confidence": "high"}) == ["$: missing required property 'answer'"]
+
+
+def test_compile_schema_arrays_and_top_level_type():
+    errors = compile_schema({"type": "array", "items": {"type": "string"}})
+    assert errors(["a", "b"]) == []
+    assert errors(["a", 1]) == ["$[]: expected string, got int"]
+    assert compile_schema(SCHEMA)(["not", "an", "object"]) == ["$: expected object, got list"]
+
+ANSWERS = [
+    "FuelEU Maritime applies from 1 January 2025.",
+    'Quotes " and backslashes \\ and\nnewlines',
+    "Non-ASCII: é, ü and a ship 🚢",
+    ""
+]
+
+
+@pytest.mark.parametrize("answer", ANSWERS)
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("chunk", [1, 3, 7])
+def test_answer_text_from_fragments(answer, ensure_ascii, chunk):
+    text = json.dumps({"answer": answer, "source_quote": 'with "answer": "inside"', "source_file": "f.pdf"},
+                      ensure_ascii=ensure_ascii)
+    extractor = StreamedFieldText("answer")
+    streamed = "".join(extractor.feed(text[i:i + chunk]) for i in range(0, len(text), chunk))
+    assert streamed == answer
+
+
+def test_no_output_before_field_starts():
+    extractor = StreamedFieldText("answer")
+    assert extractor.feed('{"ans') == ""
+    assert extractor.feed('wer": "Yes') == "Yes"
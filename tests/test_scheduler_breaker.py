@@ -0,0 +1,154 @@
+"""Circuit breaker accounting for scheduled upstream calls"""
+
+import time
+import types
+import threading
+
+import openai
+import httpx
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN
+from scheduler import UpstreamScheduler, SchedulerBusyError
+
+
+class FakeResponses:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+
+    def create(self, **api_params):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return types.SimpleNamespace(id="resp_test", usage=types.SimpleNamespace(total_tokens=100))
+
+
+def fake_client(delay=0.0, error=None):
+    return types.SimpleNamespace(responses=FakeResponses(delay, error))
+
+
+API_PARAMS = {"model": "gpt-4o", "input": "What is FuelEU Maritime?"}
+
+
+def test_queue_wait_is_not_a_slow_upstream_call():
+    """Healthy upstream, queueing behind max_in_flight=1: total time exceeds the slow threshold, upstream time does not"""
+    scheduler = UpstreamScheduler(max_in_flight=1, max_wait=10.0)
+    breaker = CircuitBreaker(min_calls=3, slow_call_seconds=0.15, slow_call_rate=0.5, open_seconds=60.0)
+    client = fake_client(delay=0.1)
+
+    threads = [threading.Thread(target=scheduler.create, args=(client, API_PARAMS, "interactive", breaker))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = breaker.snapshot()
+    assert snapshot["state"] == CLOSED
+    assert snapshot["slow_call_rate"] == 0.0
+    assert snapshot["stats"]["successes"] == 5
+
+
+def test_scheduler_busy_bypasses_breaker():
+    scheduler = UpstreamScheduler(max_in_flight=1, max_wait=0.05)
+    breaker = CircuitBreaker(min_calls=1, slow_call_seconds=0.01)
+    held = scheduler.acquire("interactive")
+    try:
+        with pytest.raises(SchedulerBusyError):
+            scheduler.create(fake_client(), API_PARAMS, "interactive", breaker)
+    finally:
+        scheduler.release(held)
+
+    snapshot = breaker.snapshot()
+    assert snapshot["calls_in_window"] == 0
+    assert snapshot["stats"] == {"rejected": 0, "opened": 0, "failures": 0, "successes": 0}
+
+
+def test_upstream_failures_still_open_breaker():
+    scheduler = UpstreamScheduler()
+    breaker = CircuitBreaker(min_calls=3, failure_rate=0.5, open_seconds=60.0)
+    error = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+    client = fake_client(error=error)
+
+    for _ in range(3):
+        with pytest.raises(openai.APIConnectionError):
+            scheduler.create(client, API_PARAMS, "interactive", breaker)
+
+    assert breaker.state == OPEN
+    # The slot is released even though the call failed
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+class FakeStreamingResponses:
+    def __init__(self, events, error=None):
+        self.events = events
+        self.error = error
+
+    def create(self, stream=False, **api_params):
+        def events():
+            yield from self.events
+            if self.error:
+                raise self.error
+        return events()
+
+
+def test_mid_stream_failure_is_recorded_by_breaker():
+    scheduler = UpstreamScheduler()
+    breaker = CircuitBreaker(min_calls=1, failure_rate=0.5, open_seconds=60.0)
+    delta = types.SimpleNamespace(type="response.output_text.delta", delta='{"answer": "Fuel')
+    client = types.SimpleNamespace(responses=FakeStreamingResponses([delta], error=httpx.ReadError("connection dropped")))
+
+    stream = scheduler.open_stream(client, API_PARAMS, "interactive", breaker)
+    with pytest.raises(httpx.ReadError):
+        for _ in stream:
+            pass
+
+    assert breaker.snapshot()["stats"]["failures"] == 1
+    assert breaker.state == OPEN
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+def test_completed_stream_is_a_success():
+    scheduler = UpstreamScheduler()
+    breaker = CircuitBreaker(min_calls=1)
+    completed = types.SimpleNamespace(type="response.completed",
+                                      response=types.SimpleNamespace(usage=types.SimpleNamespace(total_tokens=50)))
+    client = types.SimpleNamespace(responses=FakeStreamingResponses([completed]))
+
+    assert [event.type for event in scheduler.open_stream(client, API_PARAMS, "interactive", breaker)] == ["response.completed"]
+    assert breaker.snapshot()["stats"]["successes"] == 1
+    assert scheduler.metrics()["tokens_last_minute"] == 50
+
+
+def test_timings_separate_queue_wait_from_upstream_time():
+    scheduler = UpstreamScheduler(max_in_flight=1, max_wait=10.0)
+    held = scheduler.acquire("interactive")
+    timings = {}
+    worker = threading.Thread(target=scheduler.create, args=(fake_client(delay=0.05), API_PARAMS, "shadow"),
+                              kwargs={"timings": timings})
+    worker.start()
+    time.sleep(0.2)
+    scheduler.release(held)
+    worker.join()
+
+    assert timings["queue_ms"] >= 150
+    assert 40 <= timings["upstream_ms"] < 150
+
+
+def test_open_breaker_rejects_before_queueing_on_saturated_scheduler():
+    """Hung calls hold every slot: an open breaker must fail fast, not wait out max_wait as SchedulerBusyError"""
+    scheduler = UpstreamScheduler(max_in_flight=1, max_wait=5.0)
+    breaker = CircuitBreaker(min_calls=1, failure_rate=0.5, open_seconds=60.0)
+    breaker.done(breaker.admit(), failed=True)
+    assert breaker.state == OPEN
+    held = scheduler.acquire("interactive")
+    try:
+        for open_call in (scheduler.create, scheduler.open_stream):
+            started = time.monotonic()
+            with pytest.raises(CircuitOpenError):
+                open_call(fake_client(), API_PARAMS, "interactive", breaker)
+            assert time.monotonic() - started < 0.5
+        assert scheduler.metrics()["classes"]["interactive"]["queued"] == 0
+    finally:
+        scheduler.release(held)
@@ -0,0 +1,82 @@
+"""Serving speculated follow-ups"""
+
+import json
+import time
+import types
+
+from circuit_breaker import CircuitBreaker
+from profiles import get_profile
+from scheduler import UpstreamScheduler
+from speculation import Speculator
+
+PROFILE = get_profile("full")
+ANSWER = {"answer": "Yes", "source_quote": "q", "source_file": "f.pdf", "source_quote_location": {"page": 1, "line": 2}}
+
+
+class FakeResponses:
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = []
+
+    def create(self, **api_params):
+        self.calls.append(api_params)
+        time.sleep(self.delay)
+        return types.SimpleNamespace(id=f"resp_spec_{len(self.calls)}", output_text=json.dumps(ANSWER),
+                                     usage=types.SimpleNamespace(total_tokens=100))
+
+
+def speculating(question, scheduler, delay=0.0):
+    """Speculator that has learned 'What is FuelEU?' -> question and speculated it on resp_1"""
+    speculator = Speculator(min_count=1, max_wait=5.0)
+    upstream = types.SimpleNamespace(scheduler=scheduler, breaker=CircuitBreaker(),
+                                     client=types.SimpleNamespace(responses=FakeResponses(delay)))
+    speculator.remember("default", "resp_0", "What is FuelEU?")
+    speculator.observe("default", "resp_0", question)
+    assert speculator.speculate("default", upstream, PROFILE, "vs_1", "What is FuelEU?", "resp_1") == 1
+    return speculator, upstream
+
+
+def test_exact_normalized_match_is_served():
+    speculator, _ = speculating("Does FuelEU apply to my ship?", UpstreamScheduler(), delay=0.1)
+    decoded, response_id = speculator.take("resp_1", "  does fueleu apply to my ship ")
+    assert response_id == "resp_spec_1"
+    assert speculator.metrics()["hits"] == 1
+
+
+def test_similar_but_different_question_is_not_served():
+    speculator, _ = speculating("Does FuelEU apply to my ship?", UpstreamScheduler())
+    assert speculator.take("resp_1", "Does FuelEU not apply to my ship?") is None
+    assert speculator.metrics()["hits"] == 0
+
+
+def test_speculation_still_queued_is_not_waited_on():
+    scheduler = UpstreamScheduler(max_in_flight=1, max_wait=5.0)
+    held = scheduler.acquire("interactive")
+    try:
+        speculator, upstream = speculating("Does FuelEU apply to my ship?", scheduler)
+        time.sleep(0.05)
+        started = time.monotonic()
+        assert speculator.take("resp_1", "Does FuelEU apply to my ship?") is None
+        assert time.monotonic() - started < 0.5
+        assert speculator.metrics()["missed_queued"] == 1
+    finally:
+        scheduler.release(held)
+
+
+def test_speculation_cancelled_while_queued_never_goes_upstream():
+    scheduler = UpstreamScheduler(max_in_flight=1, max_wait=5.0)
+    held = scheduler.acquire("interactive")
+    speculator, upstream = speculating("Does FuelEU apply to my ship?", scheduler)
+    # The worker is already blocked in the scheduler, so future.cancel() alone cannot stop it
+    time.sleep(0.05)
+    assert speculator.take("resp_1", "Does FuelEU apply to my ship?") is None
+    scheduler.release(held)
+
+    speculator._executor.shutdown(wait=True)
+    assert upstream.client.responses.calls == []
+    assert scheduler.metrics()["in_flight"] == 0
+    assert speculator.metrics()["failed"] == 0
+
+
+def test_default_wait_is_short():
+    assert Speculator().max_wait <= 3.0
@@ -0,0 +1,143 @@
+"""Tenant registry resolution, hot reload and the pooled upstream clients"""
+
+import os
+import json
+import types
+
+import pytest
+
+from tenants import Tenant, TenantRegistry, TenantNotFoundError, ClientPool
+
+
+def write_registry(path, tenants, mtime=None):
+    path.write_text(json.dumps({"tenants": tenants}), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+TENANTS = {
+    "acme": {"api_keys": ["acme-key"], "hosts": ["Chat.Acme-Maritime.com"], "vector_store_id": "vs_acme",
+             "openai_api_key": "sk-acme", "priority": "partner"},
+    "default": {"vector_store_id": "vs_default", "openai_api_key": "sk-default"},
+}
+
+
+@pytest.fixture
+def registry_file(tmp_path):
+    path = tmp_path / "tenants.json"
+    write_registry(path, TENANTS, mtime=1_000_000)
+    return path
+
+
+def test_resolves_by_api_key_then_host_then_default(registry_file):
+    registry = TenantRegistry(str(registry_file))
+    assert registry.resolve(api_key="acme-key").name == "acme"
+    assert registry.resolve(api_key="acme-key", host="other.example.com").name == "acme"
+    assert registry.resolve(host="chat.acme-maritime.com:443").name == "acme"
+    assert registry.resolve(api_key="unknown-key", host="CHAT.ACME-MARITIME.COM").name == "acme"
+    assert registry.resolve(api_key="unknown-key", host="other.example.com").name == "default"
+    assert registry.resolve().name == "default"
+
+
+def test_unmatched_request_without_default_tenant(tmp_path):
+    path = tmp_path / "tenants.json"
+    write_registry(path, {"acme": TENANTS["acme"]})
+    with pytest.raises(TenantNotFoundError):
+        TenantRegistry(str(path)).resolve(api_key="unknown-key")
+
+
+def test_without_registry_file_uses_default_factory():
+    tenant = Tenant("env", "vs_env", {}, "sk-env")
+    assert TenantRegistry(default_factory=lambda: tenant).resolve(api_key="acme-key") is tenant
+
+
+def test_reloads_when_the_file_changes(registry_file):
+    registry = TenantRegistry(str(registry_file), reload_interval=0)
+    assert registry.resolve(api_key="acme-key").vector_store_id == "vs_acme"
+
+    tenants = dict(TENANTS, acme=dict(TENANTS["acme"], vector_store_id="vs_acme_v2", api_keys=["acme-key-2"]))
+    write_registry(registry_file, tenants, mtime=1_000_010)
+
+    assert registry.resolve(api_key="acme-key-2").vector_store_id == "vs_acme_v2"
+    assert registry.resolve(api_key="acme-key").name == "default"
+
+
+def test_reload_is_rate_limited(registry_file):
+    registry = TenantRegistry(str(registry_file), reload_interval=3600)
+    registry.resolve()
+    write_registry(registry_file, {"default": dict(TENANTS["default"], vector_store_id="vs_new")}, mtime=1_000_010)
+    assert registry.resolve(api_key="acme-key").name == "acme"
+
+
+@pytest.mark.parametrize("contents", [
+    "{not json",
+    json.dumps({"tenants": {"broken": {"openai_api_key": "sk-broken"}}}),
+    json.dumps({"tenants": {"broken": {"vector_store_id": "vs_b", "openai_api_key": "sk-b", "priority": "urgent"}}}),
+])
+def test_bad_reload_keeps_the_previous_tenants(registry_file, contents):
+    registry = TenantRegistry(str(registry_file), reload_interval=0)
+    registry_file.write_text(contents, encoding="utf-8")
+    os.utime(registry_file, (1_000_010, 1_000_010))
+
+    assert registry.resolve(api_key="acme-key").vector_store_id == "vs_acme"
+    assert registry.resolve().name == "default"
+
+
+def test_missing_file_keeps_the_previous_tenants(registry_file):
+    registry = TenantRegistry(str(registry_file), reload_interval=0)
+    registry_file.unlink()
+    assert registry.resolve(api_key="acme-key").name == "acme"
+
+
+@pytest.mark.parametrize("tenant_priority, requested, expected", [
+    ("interactive", None, "interactive"),
+    ("interactive", "bulk", "bulk"),
+    ("partner", "interactive", "partner"),
+    ("partner", "bulk", "bulk"),
+    ("bulk", "interactive", "bulk"),
+    ("bulk", "partner", "bulk"),
+    ("partner", "urgent", "urgent"),
+])
+def test_request_priority_can_only_opt_down(tenant_priority, requested, expected):
+    tenant = Tenant("acme", "vs_acme", {}, "sk-acme", priority=tenant_priority)
+    assert tenant.request_priority(requested) == expected
+
+
+def test_upstream_latency_metric():
+    registry = TenantRegistry()
+    registry.record("acme", 100.0)
+    registry.record("acme", 300.0)
+    registry.record("acme", success=False)
+    assert registry.metrics() == {"acme": {"requests": 3, "errors": 1, "mean_upstream_latency_ms": 200.0}}
+
+
+class CountingFactory:
+    def __init__(self, make):
+        self.make = make
+        self.calls = []
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.make()
+
+
+def test_client_pool_shares_one_upstream_per_key():
+    clients = CountingFactory(lambda: types.SimpleNamespace(vector_stores=object()))
+    schedulers = CountingFactory(lambda: types.SimpleNamespace(metrics=lambda: {"in_flight": 0}))
+    breakers = CountingFactory(lambda: types.SimpleNamespace(snapshot=lambda: {"state": "closed"}))
+    pool = ClientPool(clients, schedulers, breakers)
+
+    first = pool.get("sk-acme")
+    assert pool.get("sk-acme") is first
+    second = pool.get("sk-other")
+    assert second is not first
+    assert first.vs_api_type == "direct"
+
+    assert [kwargs for _, kwargs in clients.calls] == [{"api_key": "sk-acme"}, {"api_key": "sk-other"}]
+    assert len(schedulers.calls) == 2
+    assert [args for args, _ in breakers.calls] == [(f"openai-{ClientPool.fingerprint('sk-acme')}",),
+                                                    (f"openai-{ClientPool.fingerprint('sk-other')}",)]
+
+    # Metrics are keyed by a fingerprint, never the API key itself
+    assert set(pool.metrics()) == {ClientPool.fingerprint("sk-acme"), ClientPool.fingerprint("sk-other")}
+    assert "sk-acme" not in json.dumps(pool.breakers())
@@ -0,0 +1,48 @@
+"""Traffic journal across worker processes and its replay linkage"""
+
+import os
+
+from replay_traffic import load_journal, group_conversations
+from traffic_capture import TrafficJournal
+
+
+def record(journal, arrived, previous_response_id, response_id, stream=False):
+    journal.record(arrived, f"Question at {arrived}?", previous_response_id, response_id, "default", None,
+                   120.0, 200, "ok", stream=stream)
+
+
+def test_conversations_link_across_worker_files(tmp_path, monkeypatch):
+    path = str(tmp_path / "traffic.jsonl")
+    worker_a, worker_b = TrafficJournal(path), TrafficJournal(path)
+
+    # Turns of one conversation land on different workers, as behind a load balancer
+    monkeypatch.setattr(os, "getpid", lambda: 101)
+    record(worker_a, 1000.0, None, "resp_1")
+    record(worker_a, 1001.0, None, "resp_other")
+    worker_a.flush()
+    monkeypatch.setattr(os, "getpid", lambda: 202)
+    record(worker_b, 1002.0, "resp_1", "resp_2", stream=True)
+    record(worker_b, 1003.0, "resp_before_capture", "resp_3")
+    worker_b.flush()
+    monkeypatch.setattr(os, "getpid", lambda: 101)
+    record(worker_a, 1004.0, "resp_2", "resp_4")
+    worker_a.flush()
+
+    assert sorted(os.listdir(tmp_path)) == ["traffic.101.jsonl", "traffic.202.jsonl"]
+    conversations = group_conversations(load_journal([path]))
+
+    assert [[turn["depth"] for turn in turns] for turns in conversations] == [[0, 1, 2], [0], [None]]
+    assert [turn["stream"] for turn in conversations[0]] == [False, True, False]
+    assert all("resp_" not in str(value) for turns in conversations for turn in turns for value in turn.values())
+
+
+def test_rotation_is_per_worker_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "traffic.jsonl")
+    journal = TrafficJournal(path, max_bytes=1, backup_count=2)
+    monkeypatch.setattr(os, "getpid", lambda: 7)
+    for i in range(3):
+        record(journal, 1000.0 + i, None, f"resp_{i}")
+        journal.flush()
+
+    assert sorted(os.listdir(tmp_path)) == ["traffic.7.jsonl", "traffic.7.jsonl.1", "traffic.7.jsonl.2"]
+    assert [r["ts"] for r in load_journal([path])] == [1000.0, 1001.0, 1002.0]
@@ -0,0 +1,172 @@
+"""
+Opt-in capture of live /chat and /chat/stream traffic for realistic load replay (replay_traffic.py)
+Features:
+- One JSONL record per request: arrival time, hashes of the response id it continued and the
+  one it produced (conversation linkage), message hash and length (or redacted text), tenant,
+  priority, streaming, latency, HTTP status and outcome
+- No API keys, client addresses or raw response ids are recorded
+- Buffered in memory and written by a background thread in batches, never on the request path
+- Safe with several server worker processes: records carry no per-process state (replay links
+  conversations across all files) and each process writes its own file, <root>.<pid><ext>
+- Size-based rotation per file (file, file.1, ... file.N), like logging's RotatingFileHandler
+
+Configuration (environment):
+- TRAFFIC_CAPTURE_PATH: journal path, e.g. traffic_capture.jsonl (written as traffic_capture.<pid>.jsonl);
+  capture is disabled unless set
+- TRAFFIC_CAPTURE_TEXT: record redacted message text instead of a hash (default off)
+- TRAFFIC_CAPTURE_MAX_MB / TRAFFIC_CAPTURE_BACKUPS: rotation size and files kept (default 100 / 5)
+- TRAFFIC_CAPTURE_FLUSH_SECONDS: buffer flush interval (default 1)
+"""
+
+import os
+import re
+import time
+import atexit
+import hashlib
+import logging
+import threading
+
+from response_decoding import dumps
+
+logger = logging.getLogger(__name__)
+
+# Records held in memory before new ones are dropped (only reached if writes keep failing)
+MAX_BUFFERED_RECORDS = 100000
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+
+
+def message_hash(message):
+    """Stable, non-reversible identity of a message (equal messages share a hash)"""
+    return hashlib.sha256(message.encode("utf-8")).hexdigest()[:16]
+
+
+def request_outcome(status, envelope):
+    """Outcome label for a /chat reply (or /chat/stream final event), from its HTTP status and JSON body"""
+    if envelope.get("degraded"):
+        return "degraded"
+    if status == 200 and envelope.get("success") is False:
+        # /chat/stream failures after the 200 headers arrive as an error event
+        return "stream_error"
+    if status == 200:
+        return "cached" if envelope.get("cached") else "speculated" if envelope.get("speculated") else "ok"
+    return {400: "bad_request", 401: "unknown_tenant", 503: "busy"}.get(status, "error")
+
+
+def redact(message):
+    """Message text with e-mail addresses and phone numbers removed"""
+    return _PHONE.sub("<phone>", _EMAIL.sub("<email>", message))
+
+
+def journal_path(path):
+    """File this process writes for the configured journal path: traffic.jsonl -> traffic.<pid>.jsonl"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+class TrafficJournal:
+    """Buffered, rotating JSONL journal of /chat request metadata
+
+    Holds no cross-request state, so every server worker process can run its own
+    journal: each writes journal_path(path) for its pid, resolved at write time so
+    journals created before a pre-fork server forks its workers still split per worker.
+    """
+
+    def __init__(self, path, store_text=False, max_bytes=100 * 1024 * 1024, backup_count=5, flush_interval=1.0):
+        self.path = path
+        self.store_text = store_text
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._buffer = []
+        self._writer = None
+        self._writer_pid = None
+        self.stats = {"recorded": 0, "dropped": 0, "written": 0, "rotations": 0, "write_errors": 0}
+        atexit.register(self.flush)
+
+    def record(self, arrived, message, previous_response_id, response_id, tenant, priority, latency_ms, status, outcome,
+               stream=False):
+        """Queue one request record; returns immediately"""
+        entry = {
+            "ts": round(arrived, 3),
+            # Hashed response ids link turns into conversations at replay time, across worker files
+            "previous_sha": message_hash(previous_response_id) if previous_response_id else None,
+            "response_sha": message_hash(response_id) if response_id else None,
+            "tenant": tenant,
+            "priority": priority,
+            "stream": stream,
+            "message_sha": message_hash(message),
+            "message_chars": len(message),
+            "latency_ms": round(latency_ms, 1),
+            "status": status,
+            "outcome": outcome
+        }
+        if self.store_text:
+            entry["message"] = redact(message)
+
+        with self._lock:
+            if len(self._buffer) >= MAX_BUFFERED_RECORDS:
+                self.stats["dropped"] += 1
+                return
+            self._buffer.append(entry)
+            self.stats["recorded"] += 1
+            # A writer thread started before a fork does not exist in the child: start one per process
+            if self._writer_pid != os.getpid():
+                self._writer_pid = os.getpid()
+                self._writer = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _rotate(self, path):
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+        self.stats["rotations"] += 1
+
+    def flush(self):
+        """Write buffered records in one append to this process's journal file"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        data = b"".join(dumps(entry) + b"\n" for entry in batch)
+        path = journal_path(self.path)
+        with self._write_lock:
+            try:
+                if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+                    self._rotate(path)
+                with open(path, "ab") as f:
+                    f.write(data)
+                self.stats["written"] += len(batch)
+            except OSError as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"Failed to write traffic journal {path}: {e}")
+                with self._lock:
+                    # Keep the batch for the next flush, oldest first
+                    self._buffer[:0] = batch[:max(0, MAX_BUFFERED_RECORDS - len(self._buffer))]
+
+
+def create_traffic_journal():
+    """Build a TrafficJournal from the environment, or None when capture is disabled"""
+    path = os.environ.get("TRAFFIC_CAPTURE_PATH")
+    if not path:
+        return None
+    return TrafficJournal(
+        path,
+        store_text=os.environ.get("TRAFFIC_CAPTURE_TEXT", "").lower() in ("1", "true", "yes"),
+        max_bytes=int(float(os.environ.get("TRAFFIC_CAPTURE_MAX_MB", 100)) * 1024 * 1024),
+        backup_count=int(os.environ.get("TRAFFIC_CAPTURE_BACKUPS", 5)),
+        flush_interval=float(os.environ.get("TRAFFIC_CAPTURE_FLUSH_SECONDS", 1))
+    )